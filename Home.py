@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from src.services.auth import check_authentication
+from src.common.resources import registry
 from collections import defaultdict
 
 st.set_page_config(page_title="Contracts Management", layout="wide")
@@ -36,10 +37,21 @@ def non_identiy():
     st.write("Dear user, it appears that you do not have an assigned role on the platform. This might restrict your access to certain features. Please contact the support team to have the appropriate role assigned. Thank you!")
     st.write("pricing@tradingsolutions.com")
 
+def show_quota_usage():
+    # Llamadas a Google del proceso (acumuladas desde que arrancó), solo para admin
+    from src.common.quota import limiter
+
+    with st.expander("Google API usage"):
+        usage = limiter.metrics.snapshot()
+        if usage:
+            st.table(pd.DataFrame.from_dict(usage, orient="index").round(1))
+        else:
+            st.caption("No calls yet.")
+
 col1, col2, col3 = st.columns([1, 2, 1])
 
 with col2:
-    st.image("resources/logo_trading.png", width=800)
+    st.image(registry.get("logo"), width=800)
 
 check_authentication()
 role = identity_role(st.experimental_user.email)
@@ -58,6 +70,8 @@ else:
     if role in pages_by_role:
         with st.sidebar:
             page = st.radio("Go to", pages_by_role[role])
+            if role == "admin":
+                show_quota_usage()
 
         if page == "Contracts Management":
             import src.views.Contracts_Management as cm
@@ -70,3 +84,18 @@ else:
         elif page == "New Request":
             import src.views.New_Request as nr
             nr.show(role)
+
+def start_background_services():
+    # Se importan aquí y no arriba: traen utils y todo lo que utils importa, y eso no debe
+    # demorar la primera página
+    from src.services.quotation_jobs import get_write_queue
+    from src.services.client_directory import get_client_directory
+
+    # Las escrituras que quedaron pendientes en el diario (p. ej. antes de un reinicio) se retoman al arrancar
+    get_write_queue()
+    # El directorio de clientes (compartido por New Request y Contracts) se carga en segundo plano
+    get_client_directory().prewarm()
+
+# Fuentes y plantilla del PDF se cargan en segundo plano una vez pintada la primera página
+registry.prewarm()
+start_background_services()
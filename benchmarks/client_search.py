@@ -0,0 +1,91 @@
+# Selectbox de clientes y puertos con listas largas (5k clientes, 40k puertos). Compara lo que
+# costaba cada rerun con la lista completa (armar las opciones y serializar el mensaje del
+# selectbox que va al navegador) con search_select: una búsqueda en SearchIndex de
+# src/common/search_index.py y un selectbox con las SEARCH_LIMIT mejores coincidencias.
+# También mide agregar un cliente con with_item contra reconstruir el índice.
+#
+#   python -m benchmarks.client_search
+
+import random
+import statistics
+import time
+from streamlit.proto.Selectbox_pb2 import Selectbox
+from src.common.search_index import SearchIndex, normalize
+
+SEARCH_LIMIT = 10
+SIZES = {"clientes": 5_000, "puertos": 40_000}
+QUERIES = 200
+REPEATS = 5
+FIXED_OPTIONS = [" ", "+ Add New"]
+
+SYLLABLES = ["ca", "ro", "san", "ta", "ge", "na", "mar", "sé", "lo", "pau", "bue", "nos", "ai", "res", "qui", "to"]
+
+def synthetic_names(count, seed):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+                 for _ in range(rng.randint(1, 3))]
+        names.add(" ".join(words) + rng.choice(["", " S.A.S.", " Ltda", " Port"]))
+    return sorted(names)
+
+def queries_for(names, seed):
+    # Lo que escribe un usuario: el comienzo de un nombre, a veces sin tildes o con un error
+    rng = random.Random(seed)
+    queries = []
+    for name in rng.sample(names, QUERIES):
+        query = normalize(name)[:rng.randint(3, 10)]
+        if rng.random() < 0.3 and len(query) > 4:
+            j = rng.randrange(1, len(query) - 1)
+            query = query[:j] + query[j + 1] + query[j] + query[j + 2:]
+        queries.append(query)
+    return queries
+
+def selectbox_bytes(options):
+    proto = Selectbox(label="Who is your client?*", default=0)
+    proto.options[:] = options
+    return len(proto.SerializeToString())
+
+def full_list_render(names):
+    options = FIXED_OPTIONS + [name for name in names if name not in FIXED_OPTIONS]
+    return selectbox_bytes(options)
+
+def search_render(index, query):
+    options = FIXED_OPTIONS + [name for name in index.search(query, SEARCH_LIMIT) if name not in FIXED_OPTIONS]
+    return selectbox_bytes(options)
+
+def per_call_ms(fn, args):
+    times = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), max(times)
+
+def main():
+    for label, count in SIZES.items():
+        names = synthetic_names(count, seed=count)
+        queries = queries_for(names, seed=count + 1)
+
+        start = time.perf_counter()
+        index = SearchIndex(names)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        full_ms, _ = per_call_ms(lambda _: full_list_render(names), range(REPEATS))
+        full_bytes = full_list_render(names)
+        search_ms, search_max = per_call_ms(lambda q: index.search(q, SEARCH_LIMIT), queries)
+        render_ms, _ = per_call_ms(lambda q: search_render(index, q), queries)
+        search_bytes = statistics.median(search_render(index, q) for q in queries)
+
+        # Un cliente nuevo: copia con with_item contra reconstruir el índice entero
+        add_ms, _ = per_call_ms(lambda i: index.with_item(f"Cliente nuevo {i}"), range(REPEATS))
+        rebuild_ms, _ = per_call_ms(lambda i: SearchIndex(names + [f"Cliente nuevo {i}"]), range(REPEATS))
+
+        print(f"{label}: {count} nombres, índice armado en {build_ms:.0f} ms")
+        print(f"  lista completa: {full_ms:.2f} ms y {full_bytes / 1024:.0f} KiB por rerun")
+        print(f"  búsqueda:       {search_ms:.3f} ms (máx. {search_max:.3f} ms), {render_ms:.3f} ms con el selectbox, "
+              f"{search_bytes / 1024:.1f} KiB por rerun")
+        print(f"  agregar:        with_item {add_ms:.2f} ms, reconstruir {rebuild_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
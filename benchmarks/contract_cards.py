@@ -0,0 +1,88 @@
+# Tiempo de preparar las tarjetas de contratos de una selección (36 contratos, ~400 filas):
+# el recorrido anterior por contrato (groupby + pivot_table con lambda por grupo) contra
+# prepare_contract_cards de src/services/contract_cards.py, que arma todas las tablas de costos
+# de una vez. Verifica que las tablas, los campos y las notas sean los mismos.
+#
+#   python -m benchmarks.contract_cards
+
+import time
+import numpy as np
+import pandas as pd
+from src.services.contract_cards import COST_COLUMNS, COST_ORDER, TRADUCCIONES, capitalizar_notas, contract_fields, prepare_contract_cards
+from src.services.prices import normalize_prices
+
+CONTRACTS = 36
+TIPOS = ["20' Dry", "40' Dry", "40' HC", "40' Reefer"]
+PRICES = ["1.234", "850", "$2.100,50", "INCLUIDO", "", "Pendiente", None]
+REPEATS = 5
+
+def synthetic_selection(seed=11):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for c in range(CONTRACTS):
+        linea = ["MSC", "MAERSK", "CMA CGM", "HAPAG"][c % 4]
+        for tipo in TIPOS[:rng.integers(1, len(TIPOS) + 1)]:
+            for _ in range(rng.integers(3, 7)):
+                row = {
+                    "Línea": linea, "No CONTRATO": f"C-{c:03d}", "TIPO CONT": tipo,
+                    "COMMODITIES": "GENERAL", "FECHA FIN FLETE": pd.Timestamp("2030-01-31"),
+                    "DÍAS ORIGEN": "", "FDO": "14", "NOTAS": "SUJETO A ESPACIO\nvalidez 30 días",
+                }
+                row.update({col: PRICES[rng.integers(0, len(PRICES))] for col in COST_COLUMNS})
+                rows.append(row)
+    return normalize_prices(pd.DataFrame(rows), COST_COLUMNS)
+
+def legacy_cards(contratos_vigentes):
+    # El bucle que corría la página por cada tarjeta en cada rerun
+    cards = []
+    for (linea, contrato_id), contrato_rows in contratos_vigentes.groupby(["Línea", "No CONTRATO"]):
+        contrato_info = contrato_rows.iloc[0]
+        tabla_pivot = None
+        validos = contrato_rows.dropna(subset=COST_COLUMNS, how="all")
+        if not validos.empty:
+            tabla_pivot = validos.pivot_table(
+                index=[], columns="TIPO CONT", values=COST_COLUMNS,
+                aggfunc=lambda x: x.iloc[0] if not x.empty else "Pendiente", fill_value=pd.NA,
+            )
+            tabla_pivot.rename_axis("CONCEPT", inplace=True)
+            tabla_pivot = tabla_pivot.reindex(COST_ORDER)
+            tabla_pivot.index = tabla_pivot.index.map(lambda x: TRADUCCIONES.get(x, x))
+            tabla_pivot.index = tabla_pivot.index.map(lambda x: x.capitalize() if isinstance(x, str) else x)
+            tabla_pivot.dropna(how="all", inplace=True)
+            tabla_pivot = tabla_pivot.astype(str)
+            tabla_pivot = tabla_pivot.loc[~(tabla_pivot.apply(lambda x: x.astype(str).str.strip()).eq("").all(axis=1))]
+            tabla_pivot.dropna(axis=1, how="all", inplace=True)
+        cards.append({
+            "linea": linea,
+            "contrato_id": contrato_id,
+            "fields": contract_fields(contrato_info.to_dict()),
+            "tabla_pivot": tabla_pivot,
+            "notas": capitalizar_notas(contrato_info.get("NOTAS", "")).replace("\n", "  \n"),
+        })
+    return cards
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn(*args)
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+def main():
+    selection = synthetic_selection()
+    legacy_ms, legacy = timed(legacy_cards, selection)
+    batch_ms, batch = timed(prepare_contract_cards, selection)
+
+    assert len(legacy) == len(batch)
+    for old, new in zip(legacy, batch):
+        assert (old["linea"], old["contrato_id"], old["fields"], old["notas"]) == \
+               (new["linea"], new["contrato_id"], new["fields"], new["notas"])
+        assert old["tabla_pivot"].index.tolist() == new["tabla_pivot"].index.tolist()
+        assert old["tabla_pivot"].columns.tolist() == new["tabla_pivot"].columns.tolist()
+        assert (old["tabla_pivot"].to_numpy() == new["tabla_pivot"].to_numpy()).all()
+
+    print(f"{len(selection)} filas, {len(batch)} contratos")
+    print(f"por contrato: {legacy_ms:.1f} ms")
+    print(f"en bloque:    {batch_ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Tiempo por rerun de los selectbox en cascada de Contracts Management sobre una hoja sintética
+# de 200k filas: máscaras booleanas sobre toda la tabla (como antes) contra el índice
+# POL -> POD -> COMMODITIES -> TIPO CONT de src/services/contracts_index.py. Verifica además
+# que las opciones y las filas elegidas sean las mismas en ambos caminos.
+#
+#   python -m benchmarks.contracts_index
+
+import time
+import numpy as np
+import pandas as pd
+from src.services.contracts_index import ContractsIndex
+
+ROWS = 200_000
+PORTS = 300
+COMMODITIES = ["GENERAL", "SCRAP", "FOOD", "CHEMICALS", "PAPER", "WOOD"]
+TIPOS = ["20' Dry", "40' Dry", "40' HC", "40' Reefer"]
+RERUNS = 50
+
+def synthetic_contracts(rows=ROWS, seed=7):
+    rng = np.random.default_rng(seed)
+    ports = np.array([f"PORT{i:03d}" for i in range(PORTS)])
+    return pd.DataFrame({
+        "POL": ports[rng.integers(0, 40, rows)],
+        "POD": ports[rng.integers(0, PORTS, rows)],
+        "COMMODITIES": np.array(COMMODITIES)[rng.integers(0, len(COMMODITIES), rows)],
+        "TIPO CONT": np.array(TIPOS)[rng.integers(0, len(TIPOS), rows)],
+        "FLETE": rng.integers(500, 5000, rows).astype(str),
+    })
+
+def masked_rerun(df, pol, pod, commodities, tipos):
+    # Lo que hacía la página en cada rerun
+    pols = df["POL"].unique().tolist()
+    pods = df[df["POL"] == pol]["POD"].unique().tolist()
+    route = df[(df["POL"] == pol) & (df["POD"] == pod)]
+    commodity_options = route["COMMODITIES"].dropna().unique().tolist()
+    tipo_options = df[
+        (df["POL"] == pol) & (df["POD"] == pod) & (df["COMMODITIES"].isin(commodities))
+    ]["TIPO CONT"].dropna().unique().tolist()
+    contratos = df[(df["POL"] == pol) & (df["POD"] == pod) & (df["COMMODITIES"].isin(commodities)) & (df["TIPO CONT"].isin(tipos))]
+    return pols, pods, commodity_options, tipo_options, contratos
+
+def index_rerun(index, pol, pod, commodities, tipos):
+    return (
+        index.pols(),
+        index.pods(pol),
+        index.commodities(pol, pod),
+        index.container_types(pol, pod, commodities),
+        index.select(pol, pod, commodities, tipos),
+    )
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    for _ in range(RERUNS):
+        result = fn(*args)
+    return (time.perf_counter() - start) / RERUNS * 1000, result
+
+def main():
+    df = synthetic_contracts()
+    start = time.perf_counter()
+    index = ContractsIndex(df)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    pol = index.pols()[0]
+    pod = index.pods(pol)[0]
+    commodities = index.commodities(pol, pod)[:2]
+    tipos = index.container_types(pol, pod, commodities)[:2]
+    args = (pol, pod, commodities, tipos)
+
+    masked_ms, masked = timed(masked_rerun, df, *args)
+    index_ms, indexed = timed(index_rerun, index, *args)
+
+    assert masked[:4] == indexed[:4]
+    assert masked[4].index.equals(indexed[4].index)
+
+    print(f"{len(df):,} filas, índice armado en {build_ms:.0f} ms")
+    print(f"máscaras: {masked_ms:.2f} ms por rerun")
+    print(f"índice:   {index_ms:.3f} ms por rerun")
+
+if __name__ == "__main__":
+    main()
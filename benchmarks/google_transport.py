@@ -0,0 +1,110 @@
+# Cuenta conexiones TCP y renovaciones de token en una sesión simulada de 100 requests contra
+# un servidor HTTP local que hace de Google. Compara el esquema anterior (credenciales y
+# clientes nuevos en cada rerun) con los clientes compartidos de src/common/clients.py.
+#
+#   python -m benchmarks.google_transport
+
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from google.auth import _helpers
+from google.auth.credentials import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from googleapiclient.discovery import build_from_document
+from src.common.clients import authorized_session, build_service, discovery_document, pooled_adapter
+
+RERUNS = 10
+SHEETS_CALLS = 5
+GSPREAD_CALLS = 3
+DRIVE_CALLS = 2
+TOKEN_LIFETIME = 3600
+
+class StandInCredentials(Credentials):
+
+    def __init__(self, counter):
+        super().__init__()
+        self.counter = counter
+
+    def refresh(self, request):
+        self.counter["refreshes"] += 1
+        self.token = f"token-{self.counter['refreshes']}"
+        self.expiry = _helpers.utcnow() + timedelta(seconds=TOKEN_LIFETIME)
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        with self.server.lock:
+            self.server.requests += 1
+        body = json.dumps({}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = _reply
+
+    def log_message(self, *args):
+        pass
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+def run_calls(endpoint, sheets, drive, gspread_session):
+    for _ in range(SHEETS_CALLS):
+        sheets.spreadsheets().values().get(spreadsheetId="sheet", range="A1:B2").execute()
+    for _ in range(GSPREAD_CALLS):
+        gspread_session.get(f"{endpoint}v4/spreadsheets/sheet").raise_for_status()
+    for _ in range(DRIVE_CALLS):
+        drive.files().list(q="trashed = false").execute()
+
+def per_rerun_clients(endpoint):
+    # Como antes: credenciales, build() y gspread.authorize en cada rerun de la página
+    counter = {"refreshes": 0}
+    for _ in range(RERUNS):
+        sheets_creds, drive_creds = StandInCredentials(counter), StandInCredentials(counter)
+        sheets = build_from_document(discovery_document("sheets", "v4"), credentials=sheets_creds,
+                                     client_options={"api_endpoint": endpoint})
+        drive = build_from_document(discovery_document("drive", "v3"), credentials=drive_creds,
+                                    client_options={"api_endpoint": endpoint})
+        run_calls(endpoint, sheets, drive, AuthorizedSession(sheets_creds))
+    return counter["refreshes"]
+
+def shared_clients(endpoint):
+    counter = {"refreshes": 0}
+    adapter = pooled_adapter()
+    sheets_session = authorized_session(StandInCredentials(counter), adapter)
+    drive_session = authorized_session(StandInCredentials(counter), adapter)
+    sheets = build_service("sheets", "v4", sheets_session, api_endpoint=endpoint)
+    drive = build_service("drive", "v3", drive_session, api_endpoint=endpoint)
+    for _ in range(RERUNS):
+        run_calls(endpoint, sheets, drive, sheets_session)
+    return counter["refreshes"]
+
+def main():
+    for name, scenario in (("clientes por rerun", per_rerun_clients), ("clientes compartidos", shared_clients)):
+        server = StandInServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint = f"http://127.0.0.1:{server.server_port}/"
+        refreshes = scenario(endpoint)
+        server.shutdown()
+        print(f"{name}: {server.requests} requests, {server.connections} conexiones TCP, {refreshes} renovaciones de token")
+
+if __name__ == "__main__":
+    main()
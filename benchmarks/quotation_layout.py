@@ -0,0 +1,80 @@
+# Notas de 5k palabras y una tabla de 200 recargos en el overlay de la cotización. Compara el
+# wrapping anterior (stringWidth sobre una línea que crece con cada palabra, cuadrático) con
+# wrap_items de src/services/quotation_layout.py, verifica que salgan las mismas líneas, y
+# mide el overlay completo con la tabla y las notas repartidas en páginas de continuación.
+#
+#   python -m benchmarks.quotation_layout
+
+import io
+import random
+import time
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from src.common.resources import registry
+from src.services.cotizacion import draw_overlay
+from src.services.quotation_layout import wrap_items
+
+WORDS = 5_000
+ROWS = 200
+MAX_WIDTH = 500
+FONT = ("OpenSauce", 9)
+REPEATS = 5
+
+COMMERCIAL = {"name": "Ana Pérez", "position": "Commercial", "tel": "+57 300 000 0000", "email": "ana@example.com"}
+
+def synthetic_quotation(seed=1):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 10))) for _ in range(WORDS)]
+    return {
+        "request_id": "Q0042",
+        "surcharges": {f"Surcharge {i}": {"20' Dry": {"sale": float(i)}} for i in range(ROWS)},
+        "additional_surcharges": [],
+        "Notes": "\n".join(", ".join(words[i:i + 7]) for i in range(0, WORDS, 7)),
+        "Details": {},
+    }
+
+def legacy_wrap(items, separator, font_name, font_size, max_width):
+    # Lo que hacía draw_overlay: mide la línea entera cada vez que agrega una palabra
+    lines, line = [], ""
+    for item in items:
+        candidate = line + (separator if line else "") + item
+        if stringWidth(candidate, font_name, font_size) <= max_width:
+            line = candidate
+        else:
+            lines.append(line)
+            line = item
+    lines.append(line)
+    return lines
+
+def timed(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+def draw(data):
+    c = canvas.Canvas(io.BytesIO(), pagesize=letter)
+    pages = draw_overlay(c, data, COMMERCIAL)
+    c.save()
+    return pages
+
+def main():
+    registry.get("fonts")
+    data = synthetic_quotation()
+    items = [w.strip() for w in ",".join(data["Notes"].splitlines()).split(",")]
+
+    legacy_ms, legacy_lines = timed(lambda: legacy_wrap(items, ", ", *FONT, MAX_WIDTH))
+    linear_ms, lines = timed(lambda: wrap_items(items, ", ", *FONT, MAX_WIDTH))
+    assert lines == legacy_lines
+
+    overlay_ms, pages = timed(lambda: draw(data))
+
+    print(f"{len(items)} palabras en {len(lines)} líneas, {ROWS} filas de recargos")
+    print(f"wrapping anterior: {legacy_ms:.1f} ms")
+    print(f"wrap_items:        {linear_ms:.1f} ms")
+    print(f"overlay completo:  {overlay_ms:.0f} ms en {pages} páginas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Cotizaciones por segundo al generar el PDF de una cotización de ejemplo: el camino anterior
+# (overlay.pdf en disco, plantilla parseada de nuevo, merge_page, quotation.pdf escrito y vuelto
+# a leer) contra render_quotation de src/services/cotizacion.py (todo en memoria, plantilla
+# cargada una vez y overlay estampado como Form XObject). Verifica que las páginas y el texto
+# extraído sean los mismos.
+#
+#   python -m benchmarks.quotation_pdf
+
+import io
+import os
+import tempfile
+import time
+import PyPDF2
+from src.common.resources import TEMPLATE_PATH
+from src.services.cotizacion import create_overlay, render_quotation
+
+QUOTATIONS = 30
+
+COMMERCIAL = {"name": "Ana Pérez", "position": "Commercial", "tel": "+57 300 000 0000", "email": "ana@example.com"}
+
+SAMPLE = {
+    "request_id": "Q0001",
+    "validity": "31/01/2027",
+    "customer_name": "Compras",
+    "incoterm": "FOB",
+    "pol": "Shanghai",
+    "pod": "Cartagena",
+    "client": "Acme S.A.S.",
+    "surcharges": {"Freight": {"20' Dry": {"sale": 1250.0}, "40' HC": {"sale": 2100.0}}, "Origin": {"20' Dry": {"sale": 150.0}}},
+    "additional_surcharges": [{"concept": "BL fee", "sale": 75.0}],
+    "insurance_sale": 0,
+    "Notes": "Subject to space and equipment availability.\nRates valid for general cargo.",
+    "Details": {"Transit Time": "32", "Route": "Direct"},
+}
+
+def legacy_render(data, workdir):
+    overlay_path = os.path.join(workdir, "overlay.pdf")
+    output_path = os.path.join(workdir, "quotation.pdf")
+    create_overlay(data, overlay_path, COMMERCIAL)
+
+    template_pdf = PyPDF2.PdfReader(TEMPLATE_PATH)
+    overlay_pdf = PyPDF2.PdfReader(overlay_path)
+    output = PyPDF2.PdfWriter()
+    for page_number in range(len(template_pdf.pages)):
+        template_page = template_pdf.pages[page_number]
+        if page_number < len(overlay_pdf.pages):
+            template_page.merge_page(overlay_pdf.pages[page_number])
+        output.add_page(template_page)
+    with open(output_path, "wb") as f:
+        output.write(f)
+    with open(output_path, "rb") as f:
+        return f.read()
+
+def per_second(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(QUOTATIONS):
+        result = fn()
+    return QUOTATIONS / (time.perf_counter() - start), result
+
+def page_texts(pdf_bytes):
+    return [page.extract_text() for page in PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages]
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy_rate, legacy = per_second(lambda: legacy_render(SAMPLE, workdir))
+    current_rate, current = per_second(lambda: render_quotation(SAMPLE, COMMERCIAL))
+
+    assert page_texts(legacy) == page_texts(current)
+
+    print(f"{len(page_texts(current))} páginas por cotización")
+    print(f"en disco + merge_page: {legacy_rate:.1f} cotizaciones/s")
+    print(f"en memoria + estampa:  {current_rate:.1f} cotizaciones/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+import gspread
+import httplib2
+import requests
+import streamlit as st
+from functools import lru_cache
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from requests.adapters import HTTPAdapter
+from src.common.quota import QuotaLimiter, RETRY_STATUS, bucket_for, limiter, parse_retry_after
+from typing import Dict, Optional
+
+SHEETS_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive"]
+POOL_CONNECTIONS = 4
+POOL_SIZE = 16
+HTTP_TIMEOUT = 60
+IDEMPOTENT = {"GET", "HEAD"}
+
+@lru_cache(maxsize=None)
+def discovery_document(service: str, version: str) -> Dict:
+    # Documento de discovery que viene con googleapiclient: nunca se descarga, y se
+    # parsea una sola vez por proceso
+    document = get_static_doc(service, version)
+    if document is None:
+        raise ValueError(f"No hay documento de discovery local para {service} {version}")
+    return json.loads(document)
+
+def pooled_adapter() -> HTTPAdapter:
+    return HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_SIZE)
+
+def _rate_limited(response: requests.Response) -> bool:
+    # Drive avisa de cuota agotada con 403 userRateLimitExceeded / rateLimitExceeded
+    return response.status_code == 429 or (
+        response.status_code == 403 and "ateLimitExceeded" in response.text
+    )
+
+class QuotaSession(AuthorizedSession):
+    # Toda llamada a Sheets/Drive (gspread y googleapiclient) pasa por el limitador de cuota.
+    # Los 429 se reintentan siempre, porque Google no aplicó nada; los 5xx y errores de
+    # conexión solo en lecturas, para no duplicar escrituras
+
+    def __init__(self, credentials, quota: QuotaLimiter = limiter, **kwargs):
+        super().__init__(credentials, **kwargs)
+        self.quota = quota
+
+    def request(self, method, url, *args, **kwargs):
+        bucket = bucket_for(method, url)
+        if bucket is None:
+            return super().request(method, url, *args, **kwargs)
+
+        retry_errors = method.upper() in IDEMPOTENT
+        max_attempts = self.quota.policy.max_attempts
+        attempt = 0
+        while True:
+            self.quota.acquire(bucket)
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not retry_errors or attempt + 1 >= max_attempts:
+                    raise
+                self.quota.backoff(bucket, attempt)
+                attempt += 1
+                continue
+
+            limited = _rate_limited(response)
+            retryable = limited or (retry_errors and response.status_code in RETRY_STATUS)
+            if not retryable or attempt + 1 >= max_attempts:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.quota.backoff(bucket, attempt, response.status_code, retry_after)
+            attempt += 1
+
+def authorized_session(credentials, adapter: HTTPAdapter, quota: QuotaLimiter = limiter) -> AuthorizedSession:
+    # AuthorizedSession renueva el token antes de que venza y reintenta una vez ante un 401
+    session = QuotaSession(credentials, quota)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class SessionHttp:
+    # Interfaz de httplib2.Http que espera googleapiclient, sobre una AuthorizedSession:
+    # así la API de Sheets, la de Drive y gspread comparten conexiones y token
+
+    def __init__(self, session: AuthorizedSession, timeout: float = HTTP_TIMEOUT):
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None, connection_type=None):
+        # Sin redirecciones: las subidas resumibles responden 308 y googleapiclient lo maneja
+        response = self.session.request(
+            method, uri, data=body, headers=headers, allow_redirects=False, timeout=self.timeout
+        )
+        info = dict(response.headers)
+        info["status"] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, response.content
+
+    def close(self) -> None:
+        pass
+
+def build_service(service: str, version: str, session: AuthorizedSession, api_endpoint: Optional[str] = None):
+    client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+    return build_from_document(
+        discovery_document(service, version), http=SessionHttp(session), client_options=client_options
+    )
+
+class GoogleClients:
+    # Credenciales y clientes de Google compartidos por todo el proceso. Cada cliente se crea
+    # la primera vez que se usa, y se guarda cuánto tardó. Todas las sesiones montan el mismo
+    # adapter, así que hay un único pool de conexiones TCP
+
+    def __init__(self):
+        # Reentrante: crear un cliente puede pedir otro (p. ej. gspread pide las credenciales)
+        self._lock = threading.RLock()
+        self._clients: Dict[str, object] = {}
+        self._timings: Dict[str, float] = {}
+        self.adapter = pooled_adapter()
+
+    def _get(self, name: str, factory):
+        if name in self._clients:
+            return self._clients[name]
+        with self._lock:
+            if name not in self._clients:
+                start = time.perf_counter()
+                self._clients[name] = factory()
+                self._timings[name] = time.perf_counter() - start
+        return self._clients[name]
+
+    def timings(self) -> Dict[str, float]:
+        return dict(self._timings)
+
+    @property
+    def sheets_creds(self) -> Credentials:
+        return self._get("sheets_creds", lambda: Credentials.from_service_account_info(
+            st.secrets["google_sheets_credentials"], scopes=SHEETS_SCOPES
+        ))
+
+    @property
+    def drive_creds(self) -> Credentials:
+        return self._get("drive_creds", lambda: Credentials.from_service_account_info(
+            st.secrets["google_drive_credentials"], scopes=DRIVE_SCOPES
+        ))
+
+    @property
+    def sheets_session(self) -> AuthorizedSession:
+        return self._get("sheets_session", lambda: authorized_session(self.sheets_creds, self.adapter))
+
+    @property
+    def drive_session(self) -> AuthorizedSession:
+        # Drive usa otra cuenta de servicio: otra sesión (otro token) sobre el mismo pool
+        return self._get("drive_session", lambda: authorized_session(self.drive_creds, self.adapter))
+
+    @property
+    def gspread(self) -> gspread.Client:
+        return self._get("gspread", lambda: gspread.Client(auth=self.sheets_creds, session=self.sheets_session))
+
+    @property
+    def sheets(self):
+        return self._get("sheets", lambda: build_service("sheets", "v4", self.sheets_session))
+
+    @property
+    def drive(self):
+        return self._get("drive", lambda: build_service("drive", "v3", self.drive_session))
+
+@st.cache_resource
+def get_clients() -> GoogleClients:
+    return GoogleClients()
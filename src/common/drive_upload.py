@@ -0,0 +1,155 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
+from typing import Callable, Dict, List, Optional, Set
+from src.common.quota import limiter
+
+CHUNK_SIZE = 5 * 1024 * 1024
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 5
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+PENDING = "pending"
+UPLOADING = "uploading"
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+class UploadProgress:
+    # Estado compartido entre los hilos de subida; la página solo lo lee con snapshot()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: Dict[str, Dict] = {}
+
+    def register(self, name: str, size: int, status: str = PENDING) -> None:
+        with self._lock:
+            self._files[name] = {"size": size, "sent": 0, "status": status, "error": None}
+
+    def update(self, name: str, sent: Optional[int] = None, status: Optional[str] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            entry = self._files[name]
+            if sent is not None:
+                entry["sent"] = sent
+            if status is not None:
+                entry["status"] = status
+            if error is not None:
+                entry["error"] = error
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._files.items()}
+
+    def fraction(self) -> float:
+        files = [f for f in self.snapshot().values() if f["status"] != SKIPPED]
+        total = sum(f["size"] for f in files)
+        if not total:
+            return 1.0 if all(f["status"] == DONE for f in files) else 0.0
+        return sum(f["size"] if f["status"] == DONE else f["sent"] for f in files) / total
+
+def list_existing_names(service, folder_id: str) -> Set[str]:
+    names = set()
+    page_token = None
+    while True:
+        response = service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            fields="nextPageToken, files(name)",
+            pageSize=1000,
+            pageToken=page_token,
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True,
+        ).execute()
+        names.update(f["name"] for f in response.get("files", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return names
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUS
+    # ConnectionError, TimeoutError y los errores de socket son OSError
+    return isinstance(error, OSError)
+
+def upload_file(service, folder_id: str, file_path: str, progress: UploadProgress,
+                chunk_size: int = CHUNK_SIZE, max_attempts: int = MAX_ATTEMPTS) -> str:
+    # Sesión resumible por archivo: ante un error se reintenta el mismo request, y
+    # googleapiclient consulta al servidor cuántos bytes recibió antes de seguir
+    name = os.path.basename(file_path)
+    media = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True)
+    request = service.files().create(
+        body={"name": name, "parents": [folder_id]},
+        media_body=media,
+        fields="id",
+        supportsAllDrives=True,
+    )
+    progress.update(name, status=UPLOADING)
+    attempts = 0
+    response = None
+    while response is None:
+        try:
+            status, response = request.next_chunk()
+            attempts = 0
+            if status is not None:
+                progress.update(name, sent=status.resumable_progress)
+        except Exception as e:
+            attempts += 1
+            if attempts >= max_attempts or not _retryable(e):
+                raise
+            limiter.backoff("drive", attempts - 1)
+    progress.update(name, sent=os.path.getsize(file_path), status=DONE)
+    return response.get("id")
+
+def upload_directory(service_factory: Callable[[], object], folder_id: str, directory: str,
+                     service=None, progress: Optional[UploadProgress] = None, max_workers: int = MAX_WORKERS,
+                     on_tick: Optional[Callable[[UploadProgress], None]] = None,
+                     remove_uploaded: bool = True) -> UploadProgress:
+    # Se llama a service_factory una vez por hilo. Un servicio sobre httplib2 no es thread-safe y
+    # necesitaría uno propio por hilo; el de src/common/clients.py va sobre una AuthorizedSession
+    # (requests, con pool de conexiones) y la factory puede devolver siempre el mismo
+    local = threading.local()
+
+    def worker_service():
+        if not hasattr(local, "service"):
+            local.service = service_factory()
+        return local.service
+
+    progress = progress or UploadProgress()
+    existing = list_existing_names(service or service_factory(), folder_id)
+
+    paths: List[str] = []
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            if file_name.startswith("."):
+                continue
+            file_path = os.path.join(root, file_name)
+            if file_name in existing:
+                progress.register(file_name, os.path.getsize(file_path), SKIPPED)
+            else:
+                progress.register(file_name, os.path.getsize(file_path))
+                paths.append(file_path)
+
+    def run(file_path: str) -> None:
+        name = os.path.basename(file_path)
+        try:
+            upload_file(worker_service(), folder_id, file_path, progress)
+        except Exception as e:
+            progress.update(name, status=FAILED, error=str(e))
+            return
+        if remove_uploaded:
+            try:
+                os.remove(file_path)
+            except OSError as e:
+                progress.update(name, error=f"No se pudo eliminar el archivo local: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="drive-upload") as executor:
+        pending = {executor.submit(run, path) for path in paths}
+        while pending:
+            # on_tick corre siempre en el hilo que llama, nunca en los de subida
+            _, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            if on_tick:
+                on_tick(progress)
+    if on_tick:
+        on_tick(progress)
+    return progress
@@ -1,20 +1,10 @@
 import streamlit as st
-import pandas as pd
 import gspread
-from google.oauth2.service_account import Credentials
 from typing import List, Optional
+from src.common.clients import get_clients
 
-@st.cache_resource(ttl=100_000)
 def get_gsheet_client() -> gspread.Client:
-    creds_info = st.secrets["google_sheets_credentials"]
-    creds = Credentials.from_service_account_info(
-        creds_info,
-        scopes=[
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ]
-    )
-    return gspread.authorize(creds)
+    return get_clients().gspread
 
 def open_spreadsheet(secret_key: str) -> gspread.Spreadsheet:
     client = get_gsheet_client()
@@ -37,26 +27,3 @@ def get_or_create_worksheet(
         if headers:
             ws.append_row(headers)
     return ws
-
-@st.cache_data(ttl=1_800)
-def load_all_records(
-    secret_key: str,
-    sheet_name: str,
-    create_if_missing: bool = False,
-    headers: Optional[List[str]] = None
-) -> pd.DataFrame:
-    try:
-        ss = open_spreadsheet(secret_key)
-        if create_if_missing:
-            ws = get_or_create_worksheet(ss, sheet_name, headers=headers)
-        else:
-            ws = ss.worksheet(sheet_name)
-        data = ws.get_all_records()
-        return pd.DataFrame(data)
-    except gspread.exceptions.SpreadsheetNotFound:
-        st.error(f"Spreadsheet {secret_key} no encontrado.")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Error cargando '{sheet_name}': {e}")
-        return pd.DataFrame()
-
@@ -0,0 +1,139 @@
+import os
+import re
+import sqlite3
+import threading
+import uuid
+import gspread
+from typing import Callable, Dict, List, Optional, Set
+
+from src.common.google_sheets import open_spreadsheet, get_or_create_worksheet
+
+class SqliteCounterBackend:
+    # Contador local (un solo host). BEGIN IMMEDIATE serializa a los escritores entre procesos:
+    # leer el valor y avanzarlo pasa dentro de la misma transacción
+
+    def __init__(self, path: str = os.path.join(".cache", "counters.sqlite3")):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def reserve(self, name: str, block_size: int, seed: Optional[Callable[[], int]] = None) -> int:
+        # Devuelve la base del bloque reservado: los IDs son base + 1 ... base + block_size
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+            base = row[0] if row else (seed() if seed else 0)
+            conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", (name, base + block_size))
+            conn.execute("COMMIT")
+            return base
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+RESERVATION_HEADERS = ["name", "seed", "size", "token"]
+_UPDATED_ROW = re.compile(r"![A-Z]+(\d+)")
+
+class ReservationCursor:
+    # Lo que ya se leyó del registro para un nombre: hasta qué fila, la semilla (la de la
+    # primera fila del nombre) y la suma de los tamaños reservados hasta esa fila
+
+    def __init__(self):
+        self.row = 0
+        self.seed: Optional[int] = None
+        self.total = 0
+
+    def advance(self, rows: List[List], name: str, first_row: int) -> int:
+        # `rows` empieza en `first_row` y termina en la fila propia: devuelve la base de su bloque
+        seed, total, base = self.seed, self.total, None
+        for i, row in enumerate(rows):
+            if not row or row[0] != name:
+                continue
+            row = list(row) + ["", ""]
+            if seed is None:
+                seed = int(row[1]) if str(row[1]).strip() else 0
+            if i == len(rows) - 1:
+                base = seed + total
+            total += int(row[2])
+        if base is None:
+            raise RuntimeError(f"No se encontró la reserva de '{name}'")
+        # El cursor solo avanza si se pudo calcular el bloque
+        self.row, self.seed, self.total = first_row + len(rows) - 1, seed, total
+        return base
+
+class SheetReservationBackend:
+    # Reservas en Google Sheets (compartidas entre hosts). La API no tiene escrituras
+    # condicionales, pero sí serializa los values.append: cada reserva agrega su propia fila
+    # (nombre, semilla, tamaño) y el bloque sale de las filas del mismo nombre que quedaron
+    # antes. La semilla que vale es la de la primera fila, así que todos calculan lo mismo.
+    # Cada proceso recuerda hasta dónde leyó el registro: una reserva solo lee las filas que
+    # se agregaron desde la anterior
+
+    def __init__(self, secret_key: str = "time_sheet_id", sheet_name: str = "id_reservations"):
+        self.secret_key = secret_key
+        self.sheet_name = sheet_name
+        self._ws = None
+        self._lock = threading.Lock()
+        self._seeded: Set[str] = set()
+        self._cursors: Dict[str, ReservationCursor] = {}
+
+    def _worksheet(self) -> gspread.Worksheet:
+        if self._ws is None:
+            ss = open_spreadsheet(self.secret_key)
+            try:
+                self._ws = get_or_create_worksheet(ss, self.sheet_name, headers=RESERVATION_HEADERS, rows=100, cols=4)
+            except gspread.exceptions.APIError:
+                # Otro proceso la creó a la vez
+                self._ws = ss.worksheet(self.sheet_name)
+        return self._ws
+
+    def reserve(self, name: str, block_size: int, seed: Optional[Callable[[], int]] = None) -> int:
+        with self._lock:
+            ws = self._worksheet()
+            seed_value = ""
+            # Una vez que el nombre tiene filas en el registro ya no hace falta volver a buscarlo
+            if name not in self._seeded and name not in ws.col_values(1):
+                seed_value = seed() if seed else 0
+            response = ws.append_row(
+                [name, seed_value, block_size, uuid.uuid4().hex],
+                value_input_option="RAW", insert_data_option="INSERT_ROWS", table_range="A1",
+            )
+            match = _UPDATED_ROW.search(response["updates"]["updatedRange"])
+            if not match:
+                raise RuntimeError(f"Respuesta inesperada al reservar IDs: {response}")
+            cursor = self._cursors.setdefault(name, ReservationCursor())
+            first_row = cursor.row + 1
+            base = cursor.advance(ws.get(f"A{first_row}:C{match.group(1)}"), name, first_row)
+            self._seeded.add(name)
+            return base
+
+class IdAllocator:
+    # Reserva bloques de IDs en el backend y los reparte localmente entre los hilos del proceso
+
+    def __init__(self, backend, name: str = "quotation", block_size: int = 5,
+                 seed: Optional[Callable[[], int]] = None):
+        self.backend = backend
+        self.name = name
+        self.block_size = block_size
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                base = self.backend.reserve(self.name, self.block_size, self.seed)
+                self._next, self._end = base + 1, base + self.block_size + 1
+            value = self._next
+            self._next += 1
+            return value
@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Cuota de Sheets: 60 lecturas y 60 escrituras por minuto por usuario (la cuenta de servicio).
+# Drive permite mucho más, pero también se limita para no competir con las subidas
+LIMITS = {
+    "sheets_read": (60, 20),
+    "sheets_write": (60, 20),
+    "drive": (600, 50),
+}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 32.0
+SLOW_WAIT = 1.0
+# Lo máximo que se espera un reintento en el hilo de una página; si Google pide más (p. ej. un
+# Retry-After largo) se corta y se muestra el error. Los hilos de fondo sí esperan lo que haga falta
+UI_MAX_WAIT = 5.0
+
+class QuotaWaitTooLong(RuntimeError):
+
+    def __init__(self, bucket: str, delay: float):
+        super().__init__(f"Google ({bucket}) pidió esperar {delay:.0f} s antes de reintentar; inténtalo de nuevo en un momento")
+        self.bucket = bucket
+        self.delay = delay
+
+def on_script_thread() -> bool:
+    return get_script_run_ctx(suppress_warning=True) is not None
+
+class TokenBucket:
+    # Se recarga de forma continua a `per_minute` fichas por minuto, hasta `burst` fichas
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        # Toma una ficha (aunque quede en negativo) y devuelve cuánto hay que esperar por ella;
+        # así los hilos que esperan salen en orden y sin volver a competir
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self) -> float:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+class RetryPolicy:
+    # Backoff exponencial con jitter completo; un Retry-After del servidor manda si es mayor
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS, base: float = BASE_DELAY, cap: float = MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        backoff = random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+        if retry_after is not None:
+            return max(min(retry_after, self.cap * 4), backoff)
+        return backoff
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class QuotaMetrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = {}
+
+    def add(self, bucket: str, **values: float) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(bucket, {
+                "requests": 0, "throttled": 0, "throttled_seconds": 0.0,
+                "retries": 0, "rate_limited": 0, "backoff_seconds": 0.0,
+            })
+            for name, value in values.items():
+                counters[name] += value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {bucket: dict(counters) for bucket, counters in self._counters.items()}
+
+class QuotaLimiter:
+    # Punto único por el que pasan las llamadas a Google: una ficha del bucket de su API antes
+    # de salir, y el tiempo que se esperó queda en las métricas
+
+    def __init__(self, limits: Dict = LIMITS, policy: Optional[RetryPolicy] = None, ui_max_wait: float = UI_MAX_WAIT):
+        self.buckets = {name: TokenBucket(per_minute, burst) for name, (per_minute, burst) in limits.items()}
+        self.policy = policy or RetryPolicy()
+        self.ui_max_wait = ui_max_wait
+        self.metrics = QuotaMetrics()
+
+    def acquire(self, bucket: str) -> None:
+        waited = self.buckets[bucket].acquire()
+        self.metrics.add(bucket, requests=1)
+        if waited > 0:
+            self.metrics.add(bucket, throttled=1, throttled_seconds=waited)
+            if waited >= SLOW_WAIT:
+                print(f"⏳ Cuota de Google ({bucket}): se esperó {waited:.1f} s antes de llamar")
+
+    def backoff(self, bucket: str, attempt: int, status: Optional[int] = None,
+                retry_after: Optional[float] = None) -> None:
+        delay = self.policy.delay(attempt, retry_after)
+        reason = f"respondió {status}" if status else "falló"
+        if delay > self.ui_max_wait and on_script_thread():
+            self.metrics.add(bucket, rate_limited=int(status == 429))
+            print(f"⏳ Google ({bucket}) {reason}: pide esperar {delay:.1f} s, no se espera en la página")
+            raise QuotaWaitTooLong(bucket, delay)
+        self.metrics.add(bucket, retries=1, rate_limited=int(status == 429), backoff_seconds=delay)
+        print(f"⏳ Google ({bucket}) {reason}: reintento {attempt + 1} en {delay:.1f} s")
+        time.sleep(delay)
+
+def bucket_for(method: str, url: str) -> Optional[str]:
+    if "sheets.googleapis.com" in url:
+        return "sheets_read" if method.upper() == "GET" else "sheets_write"
+    if "/drive/" in url:
+        return "drive"
+    return None
+
+limiter = QuotaLimiter()
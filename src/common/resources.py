@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+FONT_FILES = {
+    "OpenSauce": "resources/fonts/OpenSauceSans-Regular.ttf",
+    "OpenSauceBold": "resources/fonts/OpenSauceSans-Bold.ttf",
+}
+TEMPLATE_PATH = "resources/documents/Quotations forms.pdf"
+LOGO_PATH = "resources/logo_trading.png"
+
+class ResourceRegistry:
+    # Recursos pesados (fuentes, plantilla, logo) que se cargan una sola vez por proceso,
+    # la primera vez que alguien los pide, y se guardan junto con lo que tardó la carga
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._values: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._timings: Dict[str, float] = {}
+        self._prewarm_started = False
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        if name in self._values:
+            return self._values[name]
+        with self._locks[name]:
+            if name not in self._values:
+                start = time.perf_counter()
+                self._values[name] = self._loaders[name]()
+                self._timings[name] = time.perf_counter() - start
+        return self._values[name]
+
+    def loaded(self, name: str) -> bool:
+        return name in self._values
+
+    def timings(self) -> Dict[str, float]:
+        return dict(self._timings)
+
+    def prewarm(self, names: Optional[Iterable[str]] = None) -> None:
+        with self._lock:
+            if self._prewarm_started:
+                return
+            self._prewarm_started = True
+            names = list(names or self._loaders)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️ No se pudo precargar el recurso '{name}': {e}")
+            loaded = ", ".join(f"{n}={t * 1000:.0f} ms" for n, t in self.timings().items())
+            print(f"⏱️ Recursos precargados: {loaded}")
+
+        threading.Thread(target=run, name="resource-prewarm", daemon=True).start()
+
+def _load_fonts() -> Dict[str, bool]:
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    registered = {}
+    for font_name, font_path in FONT_FILES.items():
+        if os.path.exists(font_path):
+            pdfmetrics.registerFont(TTFont(font_name, font_path))
+            registered[font_name] = True
+        else:
+            print(f"⚠️ Advertencia: La fuente '{font_name}' no se encontró. Se usará 'Helvetica' como alternativa.")
+            registered[font_name] = False
+    return registered
+
+def _load_template():
+    import io
+    import PyPDF2
+
+    with open(TEMPLATE_PATH, "rb") as f:
+        return PyPDF2.PdfReader(io.BytesIO(f.read()))
+
+def _load_logo() -> bytes:
+    with open(LOGO_PATH, "rb") as f:
+        return f.read()
+
+registry = ResourceRegistry()
+registry.register("fonts", _load_fonts)
+registry.register("template", _load_template)
+registry.register("logo", _load_logo)
@@ -0,0 +1,97 @@
+import re
+from collections import defaultdict
+from typing import Iterable, List, Set
+
+import numpy as np
+import unidecode
+
+# Candidatos por trigramas que se re-ordenan con las bonificaciones de prefijo
+CANDIDATES_PER_RESULT = 4
+
+def normalize(s) -> str:
+    # Sin tildes, minúsculas y espacios colapsados: "  São  Paulo " -> "sao paulo"
+    return re.sub(r'\s+', ' ', unidecode.unidecode(str(s).strip())).lower()
+
+def _trigrams(text: str, complete: bool = True) -> Set[str]:
+    # Trigramas por palabra con relleno al inicio ("  c", " ca", "car", ...). Si la última
+    # palabra todavía se está escribiendo no se rellena al final, así "carta" es prefijo de "cartagena"
+    words = re.findall(r"[a-z0-9]+", text)
+    grams = set()
+    for i, word in enumerate(words):
+        padded = "  " + word + (" " if complete or i < len(words) - 1 else "")
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+class SearchIndex:
+    # Índice invertido de trigramas sobre una lista de nombres, para buscar en el servidor y
+    # mandar al navegador solo las mejores coincidencias. Tolera tildes, mayúsculas y errores
+    # de tipeo. Se comparte entre sesiones sin lock porque nunca se modifica: agregar un nombre
+    # devuelve un índice nuevo
+
+    def __init__(self, items: Iterable[str]):
+        self.items = list(items)
+        self._members = set(self.items)
+        self._keys = [normalize(item) for item in self.items]
+        postings = defaultdict(list)
+        sizes = np.zeros(len(self.items), dtype=np.int32)
+        for i, key in enumerate(self._keys):
+            grams = _trigrams(key)
+            sizes[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._sizes = sizes
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._members
+
+    def with_item(self, item: str) -> "SearchIndex":
+        # Copia con un nombre más, sin reconstruir: solo se copian las listas de nombres y las
+        # posting lists de los trigramas del nombre nuevo; las demás se comparten con este índice
+        key = normalize(item)
+        grams = _trigrams(key)
+        i = len(self.items)
+        index = SearchIndex.__new__(SearchIndex)
+        index.items = self.items + [item]
+        index._members = self._members | {item}
+        index._keys = self._keys + [key]
+        index._sizes = np.append(self._sizes, np.int32(len(grams)))
+        index._postings = dict(self._postings)
+        for gram in grams:
+            ids = self._postings.get(gram)
+            index._postings[gram] = np.array([i], dtype=np.int32) if ids is None else np.append(ids, np.int32(i))
+        return index
+
+    def _bonus(self, i: int, query: str) -> float:
+        key = self._keys[i]
+        if key == query:
+            return 2.0
+        if key.startswith(query):
+            return 1.0
+        if f" {query}" in key:
+            return 0.5
+        return 0.25 if query in key else 0.0
+
+    def search(self, query: str, limit: int = 10) -> List[str]:
+        query = normalize(query)
+        if not query:
+            return []
+        grams = _trigrams(query, complete=not query[-1].isalnum())
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return []
+
+        # Similitud de Jaccard entre los trigramas de la consulta y los de cada nombre; solo se
+        # recorren los nombres que comparten algún trigrama, no la lista completa
+        ids, counts = np.unique(np.concatenate(hits), return_counts=True)
+        scores = counts / (len(grams) + self._sizes[ids] - counts)
+        if len(ids) > limit * CANDIDATES_PER_RESULT:
+            top = np.argpartition(-scores, limit * CANDIDATES_PER_RESULT - 1)[:limit * CANDIDATES_PER_RESULT]
+            ids, scores = ids[top], scores[top]
+
+        ranked = sorted(zip(ids.tolist(), scores.tolist()),
+                        key=lambda hit: (-(hit[1] + self._bonus(hit[0], query)), self._keys[hit[0]]))
+        return [self.items[i] for i, _ in ranked[:limit]]
@@ -0,0 +1,123 @@
+import random
+import threading
+from googleapiclient.errors import HttpError
+from typing import Any, Dict, List, Optional, Tuple
+from src.common.quota import QuotaWaitTooLong, limiter
+
+# Los sheetId de cada pestaña no cambian: se piden una vez por proceso y spreadsheet
+_sheet_ids: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+def _cell(value: Any) -> Dict:
+    # Equivalente a value_input_option="RAW" de gspread: los números se guardan como números
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)) and value == value:
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": "" if value is None else str(value)}}
+
+def _row_data(rows: List[List[Any]]) -> List[Dict]:
+    return [{"values": [_cell(v) for v in row]} for row in rows]
+
+class SheetWriteBatch:
+    # Acumula las filas de una acción (p. ej. finalizar una cotización) y las envía con un
+    # solo spreadsheets.batchUpdate por spreadsheet, manteniendo el destino de cada pestaña
+
+    def __init__(self, service, max_attempts: int = 5):
+        self.service = service
+        self.max_attempts = max_attempts
+        self.api_calls = 0
+        # Spreadsheets ya guardados; si flush falla a mitad, el resto sigue pendiente
+        self.sent: List[str] = []
+        self._pending: Dict[str, Dict[str, Dict]] = {}
+
+    def add(self, spreadsheet_id: str, sheet_name: str, rows: List[List[Any]],
+            headers: Optional[List[str]] = None, new_sheet_rows: int = 1000) -> None:
+        tabs = self._pending.setdefault(spreadsheet_id, {})
+        tab = tabs.setdefault(sheet_name, {"rows": [], "headers": headers, "new_sheet_rows": new_sheet_rows})
+        tab["rows"].extend(rows)
+        if headers and not tab["headers"]:
+            tab["headers"] = headers
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._pending)
+
+    def _execute(self, request) -> Dict:
+        self.api_calls += 1
+        return request.execute()
+
+    def _sheet_ids_for(self, spreadsheet_id: str) -> Dict[str, int]:
+        with _lock:
+            cached = _sheet_ids.get(spreadsheet_id)
+        if cached is not None:
+            return cached
+        metadata = self._execute(self.service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id, fields="sheets.properties(sheetId,title)"
+        ))
+        ids = {s["properties"]["title"]: s["properties"]["sheetId"] for s in metadata.get("sheets", [])}
+        with _lock:
+            _sheet_ids[spreadsheet_id] = ids
+        return ids
+
+    def _requests(self, spreadsheet_id: str, tabs: Dict[str, Dict]) -> Tuple[List[Dict], Dict[str, int]]:
+        ids = dict(self._sheet_ids_for(spreadsheet_id))
+        created = {}
+        requests = []
+        for sheet_name, tab in tabs.items():
+            rows = tab["rows"]
+            if sheet_name not in ids:
+                # La pestaña se crea en la misma llamada; el sheetId lo elegimos nosotros
+                # para poder referenciarlo en el appendCells que va a continuación
+                sheet_id = random.randint(1, 2**31 - 1)
+                while sheet_id in ids.values():
+                    sheet_id = random.randint(1, 2**31 - 1)
+                ids[sheet_name] = created[sheet_name] = sheet_id
+                width = max([len(tab["headers"] or [])] + [len(r) for r in rows] + [26])
+                requests.append({"addSheet": {"properties": {
+                    "sheetId": sheet_id,
+                    "title": sheet_name,
+                    "gridProperties": {"rowCount": tab["new_sheet_rows"], "columnCount": width},
+                }}})
+                if tab["headers"]:
+                    rows = [tab["headers"]] + rows
+            requests.append({"appendCells": {
+                "sheetId": ids[sheet_name],
+                "rows": _row_data(rows),
+                "fields": "userEnteredValue",
+            }})
+        return requests, created
+
+    def _flush_spreadsheet(self, spreadsheet_id: str, tabs: Dict[str, Dict]) -> None:
+        attempts = 0
+        while attempts < self.max_attempts:
+            try:
+                requests, created = self._requests(spreadsheet_id, tabs)
+                self._execute(self.service.spreadsheets().batchUpdate(
+                    spreadsheetId=spreadsheet_id, body={"requests": requests}
+                ))
+                with _lock:
+                    _sheet_ids.setdefault(spreadsheet_id, {}).update(created)
+                return
+            except Exception as e:
+                attempts += 1
+                # Si alguien borró o renombró una pestaña, el sheetId guardado ya no sirve
+                with _lock:
+                    _sheet_ids.pop(spreadsheet_id, None)
+                # Solo se registra: el lote también se envía desde el hilo de la cola, fuera del script
+                print(f"⚠️ Intento {attempts}/{self.max_attempts}: Error al guardar en Google Sheets ({', '.join(tabs)}): {e}")
+                # Un 429 que llega hasta aquí ya agotó los reintentos del transporte, y una espera
+                # larga cortada en la página no se reintenta desde acá
+                exhausted = isinstance(e, QuotaWaitTooLong) or (isinstance(e, HttpError) and e.resp.status == 429)
+                if attempts == self.max_attempts or exhausted:
+                    print(f"⚠️ Se alcanzó el máximo de intentos. No se pudo guardar en {', '.join(tabs)}.")
+                    raise
+                limiter.backoff("sheets_write", attempts - 1)
+
+    def flush(self) -> int:
+        # Devuelve el número de llamadas a la API hechas por este lote
+        for spreadsheet_id in list(self._pending):
+            self._flush_spreadsheet(spreadsheet_id, self._pending[spreadsheet_id])
+            del self._pending[spreadsheet_id]
+            self.sent.append(spreadsheet_id)
+        return self.api_calls
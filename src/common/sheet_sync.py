@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+import gspread
+from gspread.utils import a1_to_rowcol, numericise_all, to_records
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.common.google_sheets import open_spreadsheet
+from src.common.single_flight import StaleWhileRevalidate
+
+SNAPSHOT_DIR = os.path.join(".cache", "sheets")
+BLOCK_ROWS = 500
+REFRESH_INTERVAL = 300
+FULL_RESYNC_INTERVAL = 6 * 3600
+SNAPSHOT_META_KEY = b"sheet_snapshot"
+
+def _block_hash(rows: List[List[str]]) -> str:
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _pad(rows: List[List[str]], width: int) -> List[List[str]]:
+    return [(list(row) + [""] * width)[:width] for row in rows]
+
+class SheetSnapshot:
+    # Copia local de una pestaña: valores crudos (strings) + hash por bloque de BLOCK_ROWS filas
+
+    def __init__(self, header: List[str], rows: List[List[str]], cursor: int = 0,
+                 synced_at: float = 0.0, full_synced_at: float = 0.0):
+        self.header = header
+        self.rows = rows
+        self.cursor = cursor
+        self.synced_at = synced_at
+        self.full_synced_at = full_synced_at
+        self.hashes = [
+            _block_hash(rows[i:i + BLOCK_ROWS]) for i in range(0, len(rows), BLOCK_ROWS)
+        ]
+        self.revision = _block_hash([header] + [[h] for h in self.hashes])
+        self._frames: Dict[Tuple[str, ...], pd.DataFrame] = {}
+
+    def to_frame(self, raw_columns: Iterable[str] = ()) -> pd.DataFrame:
+        # Las columnas de `raw_columns` quedan como texto: numericise lee "1.234,50" como 1.2345
+        raw_columns = tuple(raw_columns)
+        frame = self._frames.get(raw_columns)
+        if frame is None:
+            wanted = {c.strip() for c in raw_columns}
+            ignore = [i + 1 for i, name in enumerate(self.header) if str(name).strip() in wanted]
+            values = [numericise_all(row, ignore=ignore) for row in self.rows]
+            frame = self._frames[raw_columns] = pd.DataFrame(to_records(self.header, values), columns=self.header)
+        return frame
+
+def _snapshot_path(secret_key: str, sheet_name: str) -> str:
+    safe_name = "".join(c if c.isalnum() else "_" for c in sheet_name)
+    return os.path.join(SNAPSHOT_DIR, f"{secret_key}__{safe_name}.arrow")
+
+def read_snapshot(secret_key: str, sheet_name: str) -> Optional[SheetSnapshot]:
+    path = _snapshot_path(secret_key, sheet_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        meta = json.loads(table.schema.metadata[SNAPSHOT_META_KEY])
+        columns = [column.to_pylist() for column in table.columns]
+        rows = [list(r) for r in zip(*columns)] if columns else []
+        return SheetSnapshot(meta["header"], rows, meta.get("cursor", 0),
+                             meta.get("synced_at", 0.0), meta.get("full_synced_at", 0.0))
+    except (OSError, ValueError, KeyError, pa.ArrowException) as e:
+        print(f"⚠️ Snapshot corrupto para '{sheet_name}', se descargará de nuevo: {e}")
+        return None
+
+def write_snapshot(secret_key: str, sheet_name: str, snapshot: SheetSnapshot) -> None:
+    # Una columna de texto por columna de la hoja; los nombres reales van en la metadata
+    # porque los encabezados pueden venir vacíos o repetidos
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(secret_key, sheet_name)
+    columns = [list(c) for c in zip(*snapshot.rows)] if snapshot.rows else [[] for _ in snapshot.header]
+    table = pa.table(
+        {f"c{i}": pa.array(column, type=pa.string()) for i, column in enumerate(columns)},
+        metadata={SNAPSHOT_META_KEY: json.dumps({
+            "header": snapshot.header,
+            "revision": snapshot.revision,
+            "cursor": snapshot.cursor,
+            "synced_at": snapshot.synced_at,
+            "full_synced_at": snapshot.full_synced_at,
+        }, ensure_ascii=False)},
+    )
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def full_sync(ws: gspread.Worksheet) -> SheetSnapshot:
+    values = ws.get_all_values()
+    header = values[0] if values else []
+    now = time.time()
+    return SheetSnapshot(header, _pad(values[1:], len(header)), 0, now, now)
+
+def delta_sync(ws: gspread.Worksheet, snapshot: SheetSnapshot, key_column: str = "A") -> SheetSnapshot:
+    if not snapshot.header or time.time() - snapshot.full_synced_at > FULL_RESYNC_INTERVAL:
+        return full_sync(ws)
+
+    # Fila 1 = encabezado, los datos empiezan en la fila 2 de la hoja. Se vuelve a leer el
+    # último bloque completo (filas nuevas o editadas al final) más la fila anterior a él
+    num_blocks = len(snapshot.hashes)
+    tail_block = max(num_blocks - 1, 0)
+    tail_start = tail_block * BLOCK_ROWS
+    seam = 1 if tail_start > 0 else 0
+    ranges = ["1:1", f"{tail_start + 2 - seam}:{max(ws.row_count, tail_start + 2)}"]
+
+    # Filas insertadas o borradas antes del último bloque desplazan todo lo que sigue: se lee
+    # la columna clave de esas filas y se compara con la copia local
+    if tail_start > 0:
+        ranges.append(f"{key_column}2:{key_column}{tail_start + 1}")
+
+    # Se revisa además un bloque antiguo por sincronización (rotando) para detectar ediciones
+    check_block = snapshot.cursor % num_blocks if num_blocks > 1 else None
+    if check_block is not None and check_block != tail_block:
+        start = check_block * BLOCK_ROWS
+        ranges.append(f"{start + 2}:{start + BLOCK_ROWS + 1}")
+
+    result = ws.batch_get(ranges)
+    header = list(result[0][0]) if result[0] else []
+    if header != snapshot.header:
+        return full_sync(ws)
+
+    width = len(header)
+    tail = _pad(result[1], width)
+    if seam:
+        # La fila anterior al bloque tiene que seguir igual y en el mismo lugar
+        if not tail or tail[0] != snapshot.rows[tail_start - 1]:
+            return full_sync(ws)
+        tail = tail[1:]
+
+        key_index = a1_to_rowcol(f"{key_column}1")[1] - 1
+        keys = [row[0] if row else "" for row in result[2]]
+        keys += [""] * (tail_start - len(keys))
+        if keys != [row[key_index] for row in snapshot.rows[:tail_start]]:
+            return full_sync(ws)
+
+    rows = snapshot.rows[:tail_start]
+    if check_block is not None and check_block != tail_block:
+        start = check_block * BLOCK_ROWS
+        end = start + BLOCK_ROWS
+        block = _pad(result[-1], width)
+        # Sheets corta las filas vacías del final del rango; el bloque tiene que seguir completo
+        block += [[""] * width for _ in range(BLOCK_ROWS - len(block))]
+        if _block_hash(block) != snapshot.hashes[check_block]:
+            # Las claves de las filas anteriores al último bloque ya se compararon, así que el
+            # bloque no se desplazó y se reemplaza solo. La excepción es una racha de claves
+            # iguales que cruza uno de sus bordes: ahí un borrado y una inserción del mismo
+            # largo mueven filas entre bloques sin cambiar ninguna clave
+            around = keys + [row[key_index] for row in tail[:1]]
+            if (start > 0 and around[start - 1] == around[start]) or (end < len(around) and around[end - 1] == around[end]):
+                return full_sync(ws)
+            rows = rows[:start] + block + rows[end:]
+
+    rows = rows + tail
+    next_cursor = (check_block + 1) if check_block is not None else 0
+    return SheetSnapshot(header, rows, next_cursor, time.time(), snapshot.full_synced_at)
+
+# Copia en memoria por hoja: vencida se sigue sirviendo mientras una sola sincronización la
+# renueva en segundo plano; sin copia, las sesiones que llegan juntas esperan la misma
+_snapshots = StaleWhileRevalidate(ttl=REFRESH_INTERVAL, name="sheet-sync")
+
+def sync_sheet(secret_key: str, sheet_name: str) -> SheetSnapshot:
+    ws = open_spreadsheet(secret_key).worksheet(sheet_name)
+    current = _snapshots.peek((secret_key, sheet_name)) or read_snapshot(secret_key, sheet_name)
+    snapshot = delta_sync(ws, current) if current else full_sync(ws)
+    write_snapshot(secret_key, sheet_name, snapshot)
+    return snapshot
+
+def get_snapshot(secret_key: str, sheet_name: str) -> SheetSnapshot:
+    key = (secret_key, sheet_name)
+    if _snapshots.peek(key) is None:
+        # La copia en disco cuenta desde su última sincronización, no desde que se leyó
+        snapshot = read_snapshot(secret_key, sheet_name)
+        if snapshot is not None:
+            _snapshots.seed(key, snapshot, snapshot.synced_at)
+    return _snapshots.get(key, lambda: sync_sheet(secret_key, sheet_name))
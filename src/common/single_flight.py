@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    # Las llamadas concurrentes con la misma clave esperan el resultado de una sola ejecución
+    # en vez de repetirla (p. ej. todas las sesiones pidiendo la misma hoja a la vez)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if leader:
+            return self._run(key, call, fn)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do_in_background(self, key: Hashable, fn: Callable[[], Any], name: str = "single-flight") -> bool:
+        # Lanza fn en un hilo salvo que ya haya una ejecución en curso para la clave
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+
+        def run():
+            try:
+                self._run(key, call, fn)
+            except Exception as e:
+                print(f"⚠️ Error actualizando {key} en segundo plano: {e}")
+
+        threading.Thread(target=run, name=name, daemon=True).start()
+        return True
+
+class StaleWhileRevalidate:
+    # Valores en memoria con TTL. Si hay un valor vencido se sigue sirviendo mientras un solo
+    # hilo lo renueva en segundo plano; si no hay ninguno, los que llegan juntos esperan una
+    # única carga. Si la carga falla no se guarda nada y el próximo pedido lo vuelve a intentar
+
+    def __init__(self, ttl: float, name: str = "stale-refresh"):
+        self.ttl = ttl
+        self.name = name
+        self._values: Dict[Hashable, Tuple[Any, float]] = {}
+        self._flight = SingleFlight()
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = loader()
+        self._values[key] = (value, time.time())
+        return value
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        entry = self._values.get(key)
+        if entry is None:
+            return self._flight.do(key, lambda: self._load(key, loader))
+        value, loaded_at = entry
+        if time.time() - loaded_at > self.ttl:
+            self._flight.do_in_background(key, lambda: self._load(key, loader), name=self.name)
+        return value
+
+    def peek(self, key: Hashable) -> Any:
+        entry = self._values.get(key)
+        return entry[0] if entry else None
+
+    def seed(self, key: Hashable, value: Any, loaded_at: float) -> None:
+        # Valor que ya existía en otro lado (p. ej. en disco) y su antigüedad real; no pisa uno cargado
+        self._values.setdefault(key, (value, loaded_at))
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._values.clear()
+        else:
+            self._values.pop(key, None)
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from typing import BinaryIO, List, Tuple
+
+SPOOL_DIR = "temp_uploads"
+CHUNK_SIZE = 1024 * 1024
+MAX_SESSION_BYTES = 200 * 1024 * 1024
+MAX_SESSION_FILES = 100
+SESSION_TTL = 6 * 3600
+GC_INTERVAL = 15 * 60
+BLOBS = ".blobs"
+LAST_SEEN = ".last_seen"
+
+class SpoolQuotaExceeded(Exception):
+    pass
+
+class SpoolStore:
+    # Archivos adjuntos por sesión: <root>/<session_id>/<nombre>. El contenido se guarda una
+    # sola vez en <root>/.blobs/<sha256> y cada sesión solo tiene enlaces duros a esos blobs
+
+    def __init__(self, root: str = SPOOL_DIR, max_session_bytes: int = MAX_SESSION_BYTES,
+                 max_session_files: int = MAX_SESSION_FILES, session_ttl: int = SESSION_TTL):
+        self.root = root
+        self.max_session_bytes = max_session_bytes
+        self.max_session_files = max_session_files
+        self.session_ttl = session_ttl
+        self.blobs_dir = os.path.join(root, BLOBS)
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+    def session_dir(self, session_id: str) -> str:
+        path = os.path.join(self.root, session_id)
+        os.makedirs(path, exist_ok=True)
+        # Marca de actividad para la limpieza; la subida a Drive ignora los archivos ocultos
+        with open(os.path.join(path, LAST_SEEN), "a"):
+            os.utime(os.path.join(path, LAST_SEEN))
+        return path
+
+    def files(self, session_id: str) -> List[str]:
+        path = os.path.join(self.root, session_id)
+        if not os.path.isdir(path):
+            return []
+        return [os.path.join(path, name) for name in os.listdir(path) if not name.startswith(".")]
+
+    def usage(self, session_id: str) -> Tuple[int, int]:
+        files = self.files(session_id)
+        return sum(os.path.getsize(f) for f in files), len(files)
+
+    def _spool_blob(self, fileobj: BinaryIO) -> Tuple[str, int]:
+        # Copia por bloques calculando el hash al vuelo; nunca se carga el archivo entero en memoria
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.blobs_dir, f"{uuid.uuid4().hex}.tmp")
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+        try:
+            with open(tmp_path, "wb") as out:
+                while True:
+                    chunk = fileobj.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            blob_path = os.path.join(self.blobs_dir, digest.hexdigest())
+            if os.path.exists(blob_path):
+                # Se renueva el mtime para que la limpieza no lo borre antes de enlazarlo
+                os.utime(blob_path)
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, blob_path)
+            return blob_path, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save(self, session_id: str, fileobj: BinaryIO, name: str) -> str:
+        session_path = self.session_dir(session_id)
+        target = os.path.join(session_path, os.path.basename(name))
+        blob_path, size = self._spool_blob(fileobj)
+
+        if os.path.exists(target) and os.path.samefile(target, blob_path):
+            return target
+
+        used_bytes, used_files = self.usage(session_id)
+        replaced = os.path.getsize(target) if os.path.exists(target) else 0
+        if used_bytes - replaced + size > self.max_session_bytes or used_files + (0 if replaced else 1) > self.max_session_files:
+            raise SpoolQuotaExceeded(
+                f"Se superó el límite de adjuntos por sesión ({self.max_session_files} archivos, "
+                f"{self.max_session_bytes // (1024 * 1024)} MB)."
+            )
+
+        tmp_link = f"{target}.{uuid.uuid4().hex}.tmp"
+        os.link(blob_path, tmp_link)
+        os.replace(tmp_link, target)
+        return target
+
+    def remove(self, session_id: str, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.root, session_id, os.path.basename(name)))
+        except FileNotFoundError:
+            pass
+
+    def clear(self, session_id: str) -> None:
+        shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+
+    def collect_garbage(self) -> None:
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name == BLOBS or not os.path.isdir(path):
+                continue
+            marker = os.path.join(path, LAST_SEEN)
+            last_seen = os.path.getmtime(marker if os.path.exists(marker) else path)
+            if now - last_seen > self.session_ttl:
+                shutil.rmtree(path, ignore_errors=True)
+
+        # Un blob con un solo enlace ya no pertenece a ninguna sesión
+        for name in os.listdir(self.blobs_dir):
+            path = os.path.join(self.blobs_dir, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_nlink == 1 and now - stat.st_mtime > GC_INTERVAL:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def start_gc(self, interval: int = GC_INTERVAL) -> None:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.collect_garbage()
+                except Exception as e:
+                    print(f"⚠️ Error limpiando adjuntos abandonados: {e}")
+
+        threading.Thread(target=loop, name="spool-gc", daemon=True).start()
+
+@st.cache_resource
+def get_spool_store() -> SpoolStore:
+    store = SpoolStore()
+    store.start_gc()
+    return store
+
+def current_session_id() -> str:
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        return ctx.session_id
+    if "spool_session_id" not in st.session_state:
+        st.session_state["spool_session_id"] = uuid.uuid4().hex
+    return st.session_state["spool_session_id"]
@@ -0,0 +1,275 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.common.quota import RetryPolicy
+
+QUEUE_PATH = os.path.join(".cache", "write_queue.sqlite3")
+BATCH_SIZE = 20
+POLL_INTERVAL = 2.0
+MAX_ATTEMPTS = 8
+# Un trabajo en RUNNING sin renovar hace más que esto es de un proceso que murió a mitad de
+# camino. Mientras el handler corre, un hilo renueva la concesión cada HEARTBEAT_SECONDS
+LEASE_SECONDS = 600
+HEARTBEAT_SECONDS = LEASE_SECONDS / 4
+# Trabajos fallidos que se listan para reintentar a mano
+MAX_LISTED_FAILED = 50
+
+QUEUED = "queued"
+RUNNING = "running"
+RETRY = "retry"
+DONE = "done"
+FAILED = "failed"
+
+class Job:
+
+    def __init__(self, id: str, kind: str, payload: Dict, state: Dict, status: str,
+                 attempts: int, error: Optional[str], created_at: float, updated_at: float):
+        self.id = id
+        self.kind = kind
+        self.payload = payload
+        self.state = state
+        self.status = status
+        self.attempts = attempts
+        self.error = error
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> "Job":
+        id, kind, payload, state, status, attempts, error, created_at, updated_at = row
+        return cls(id, kind, json.loads(payload), json.loads(state), status, attempts, error, created_at, updated_at)
+
+# Handler: recibe los trabajos de un mismo tipo tomados en una pasada y devuelve los que
+# fallaron con su error; los demás quedan en DONE. Si lanza una excepción fallan todos
+Handler = Callable[[List[Job]], Dict[str, str]]
+
+_COLUMNS = "id, kind, payload, state, status, attempts, error, created_at, updated_at"
+
+class WriteQueue:
+    # Diario local (SQLite en modo WAL, synchronous=FULL) de escrituras pendientes hacia
+    # Sheets/Drive. Encolar solo espera el fsync del diario; un hilo lo vacía en segundo plano
+    # y los trabajos sobreviven a reinicios. El estado de cada trabajo se puede consultar por id
+
+    def __init__(self, path: str = QUEUE_PATH, batch_size: int = BATCH_SIZE,
+                 poll_interval: float = POLL_INTERVAL, max_attempts: int = MAX_ATTEMPTS,
+                 policy: Optional[RetryPolicy] = None):
+        self.path = path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.policy = policy or RetryPolicy(base=5.0, cap=600.0)
+        self._handlers: Dict[str, Handler] = {}
+        self._wakeup = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT '{}',
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, next_attempt_at)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    def enqueue(self, job_id: str, kind: str, payload: Dict) -> bool:
+        # El id es la clave de idempotencia: encolar dos veces el mismo trabajo no lo duplica.
+        # Devuelve False si ya existía
+        now = time.time()
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False, default=str), QUEUED, now, now),
+            )
+            added = cur.rowcount == 1
+        finally:
+            conn.close()
+        self._wakeup.set()
+        return added
+
+    def get(self, job_id: str) -> Optional[Job]:
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return Job.from_row(row) if row else None
+        finally:
+            conn.close()
+
+    def save_state(self, job: Job) -> None:
+        # Progreso parcial (carpeta creada, archivos subidos, hojas escritas) para que un
+        # reintento no repita lo que ya se hizo
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(job.state, ensure_ascii=False), time.time(), job.id),
+            )
+        finally:
+            conn.close()
+
+    def failed(self, kind: Optional[str] = None, limit: int = MAX_LISTED_FAILED) -> List[Job]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE status = ? AND (? IS NULL OR kind = ?) ORDER BY updated_at DESC LIMIT ?",
+                (FAILED, kind, kind, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [Job.from_row(r) for r in rows]
+
+    def requeue(self, job_id: str) -> bool:
+        # Vuelve a encolar un trabajo fallido conservando su progreso (job.state). Solo toca
+        # trabajos en FAILED, así que un doble clic no interrumpe uno que ya está corriendo
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, next_attempt_at = 0, updated_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, FAILED),
+            )
+            requeued = cur.rowcount == 1
+        finally:
+            conn.close()
+        self._wakeup.set()
+        return requeued
+
+    def _renew(self, jobs: List[Job]) -> None:
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?",
+                [(time.time(), job.id, RUNNING) for job in jobs],
+            )
+        finally:
+            conn.close()
+
+    def _heartbeat(self, jobs: List[Job], stop: threading.Event) -> None:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                self._renew(jobs)
+            except Exception as e:
+                print(f"⚠️ No se pudo renovar la concesión de {len(jobs)} trabajos: {e}")
+
+    def _claim(self) -> List[Job]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ? AND updated_at < ?",
+                (RETRY, RUNNING, now - LEASE_SECONDS),
+            )
+            row = conn.execute(
+                "SELECT kind FROM jobs WHERE status IN (?, ?) AND next_attempt_at <= ? ORDER BY created_at LIMIT 1",
+                (QUEUED, RETRY, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return []
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE kind = ? AND status IN (?, ?) AND next_attempt_at <= ? "
+                "ORDER BY created_at LIMIT ?",
+                (row[0], QUEUED, RETRY, now, self.batch_size),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(RUNNING, now, r[0]) for r in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        jobs = [Job.from_row(r) for r in rows]
+        for job in jobs:
+            job.status = RUNNING
+            job.attempts += 1
+        return jobs
+
+    def _finish(self, jobs: List[Job], errors: Dict[str, str]) -> None:
+        now = time.time()
+        updates = []
+        for job in jobs:
+            error = errors.get(job.id)
+            if error is None:
+                updates.append((DONE, None, 0, now, job.id))
+            elif job.attempts >= self.max_attempts:
+                updates.append((FAILED, error, 0, now, job.id))
+            else:
+                updates.append((RETRY, error, now + self.policy.delay(job.attempts - 1), now, job.id))
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                updates,
+            )
+        finally:
+            conn.close()
+
+    def drain(self) -> int:
+        # Una pasada: toma un grupo de trabajos del mismo tipo y se lo da a su handler
+        jobs = self._claim()
+        if not jobs:
+            return 0
+        handler = self._handlers.get(jobs[0].kind)
+        if handler is None:
+            errors = {job.id: f"No hay handler para '{job.kind}'" for job in jobs}
+        else:
+            # Un handler largo (muchos adjuntos, esperas por cuota) no debe perder sus trabajos
+            # ante otro proceso que los crea abandonados
+            stop = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(jobs, stop), name="write-queue-heartbeat", daemon=True).start()
+            try:
+                errors = handler(jobs)
+            except Exception as e:
+                errors = {job.id: str(e) for job in jobs}
+            finally:
+                stop.set()
+        for job_id, error in errors.items():
+            print(f"⚠️ Trabajo {job_id} falló: {error}")
+        self._finish(jobs, errors)
+        return len(jobs)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        def loop():
+            while True:
+                try:
+                    if self.drain():
+                        continue
+                except Exception as e:
+                    print(f"⚠️ Error vaciando la cola de escrituras: {e}")
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+        threading.Thread(target=loop, name="write-queue", daemon=True).start()
@@ -0,0 +1,130 @@
+import gspread
+import threading
+import time
+import streamlit as st
+from typing import List, Optional, Set
+
+from src.common.search_index import SearchIndex, normalize
+from src.common.sheet_sync import get_snapshot
+from src.common.single_flight import SingleFlight
+
+SHEET_NAME = "clientes"
+REFRESH_TTL = 3600
+# Tras una carga fallida no se vuelve a intentar hasta pasado este tiempo
+RETRY_AFTER = 30
+
+class DirectoryUnavailable(RuntimeError):
+
+    def __init__(self):
+        super().__init__("La lista de clientes no se pudo cargar desde Google Sheets; inténtalo de nuevo en un momento")
+
+def fetch_clients() -> List[str]:
+    # La copia local de sheet_sync: al arrancar se lee del disco (compartida entre procesos) y
+    # después se renueva por bloques en segundo plano, sin pedir la fecha de modificación a Drive
+    try:
+        snapshot = get_snapshot("time_sheet_id", SHEET_NAME)
+    except gspread.exceptions.WorksheetNotFound:
+        return []
+    return [row[0] for row in snapshot.rows if row]
+
+class ClientDirectory:
+    # Clientes compartidos por todas las sesiones. Los duplicados se detectan con el nombre
+    # normalizado (sin tildes, mayúsculas ni espacios de más) en un set. Un cliente nuevo se
+    # agrega en memoria sin volver a leer la hoja, y `version` sube con cada cambio para que las
+    # sesiones sepan cuándo rehacer lo que calcularon a partir de la lista. La hoja se vuelve a
+    # leer cada `ttl` segundos en segundo plano
+
+    def __init__(self, loader=fetch_clients, ttl: float = REFRESH_TTL):
+        self._loader = loader
+        self.ttl = ttl
+        self.version = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._loaded_at: Optional[float] = None
+        self._failed_at = 0.0
+        # Las listas y el índice se reemplazan, nunca se modifican: quien ya tiene uno no lo ve cambiar
+        self._names: List[str] = []
+        self._keys: Set[str] = set()
+        self._index = SearchIndex([])
+        # Agregados que la hoja todavía no refleja (p. ej. siguen en la cola de escrituras)
+        self._pending: List[str] = []
+
+    def _load(self) -> None:
+        names = self._loader()
+        keys = {normalize(name) for name in names}
+        with self._lock:
+            self._pending = [name for name in self._pending if normalize(name) not in keys]
+            names = names + self._pending
+            if names != self._names:
+                self._names = names
+                self._keys = keys | {normalize(name) for name in self._pending}
+                self._index = SearchIndex(names)
+                self.version += 1
+            self._loaded_at = time.time()
+
+    def load(self) -> None:
+        # La primera carga espera a la hoja y propaga el error; después, si venció, se renueva
+        # en segundo plano mientras se sigue usando la lista que hay
+        if self._loaded_at is None:
+            try:
+                self._flight.do(SHEET_NAME, self._load)
+            except Exception:
+                self._failed_at = time.time()
+                raise
+        elif time.time() - self._loaded_at > self.ttl:
+            self._flight.do_in_background(SHEET_NAME, self._load, name="client-directory")
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded_at is None and time.time() - self._failed_at < RETRY_AFTER:
+            return
+        try:
+            self.load()
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el directorio de clientes: {e}")
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def _require_loaded(self) -> None:
+        # Sin ninguna carga no se sabe si un cliente existe: responder "no está" haría que se
+        # agregue otra vez a la hoja
+        self._ensure_loaded()
+        if not self.loaded:
+            raise DirectoryUnavailable()
+
+    def prewarm(self) -> None:
+        if self._loaded_at is None:
+            self._flight.do_in_background(SHEET_NAME, self._load, name="client-directory")
+
+    def names(self) -> List[str]:
+        self._ensure_loaded()
+        return self._names
+
+    def search_index(self) -> SearchIndex:
+        self._ensure_loaded()
+        return self._index
+
+    def __contains__(self, name: str) -> bool:
+        self._require_loaded()
+        return normalize(name) in self._keys
+
+    def add(self, name: str) -> bool:
+        # Devuelve False si ya había un cliente con el mismo nombre normalizado
+        key = normalize(name)
+        if not key:
+            return False
+        self._require_loaded()
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._keys = self._keys | {key}
+            self._names = self._names + [name]
+            self._index = self._index.with_item(name)
+            self._pending.append(name)
+            self.version += 1
+        return True
+
+@st.cache_resource
+def get_client_directory() -> ClientDirectory:
+    return ClientDirectory()
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+from src.services.prices import PENDING, price_columns
+
+CONTRACT_KEYS = ["Línea", "No CONTRATO"]
+
+COST_COLUMNS = ["ORIGEN", "FLETE", "DESTINO", "TOTAL FLETE Y ORIGEN", "HBL", "Switch", "TOTAL FLETE, ORIGEN Y DESTINO", "TOTAL FLETE, ORIGEN Y SWITCH O HBL"]
+
+COST_ORDER = ["ORIGEN", "FLETE", "TOTAL FLETE Y ORIGEN", "DESTINO", "HBL", "Switch", "TOTAL FLETE, ORIGEN Y DESTINO", "TOTAL FLETE, ORIGEN Y SWITCH O HBL"]
+
+TRADUCCIONES = {
+    "ORIGEN": "ORIGIN",
+    "FLETE": "FREIGHT",
+    "DESTINO": "DESTINATION",
+    "TOTAL FLETE Y ORIGEN": "TOTAL FREIGHT AND ORIGIN",
+    "HBL": "HBL",
+    "Switch": "SWITCH",
+    "TOTAL FLETE, ORIGEN Y DESTINO": "TOTAL FREIGHT, ORIGIN AND DESTINATION",
+    "TOTAL FLETE, ORIGEN Y SWITCH O HBL": "TOTAL FREIGHT, ORIGIN AND SWITCH OR HBL"
+}
+
+CONCEPT_LABELS = {concept: TRADUCCIONES[concept].capitalize() for concept in COST_COLUMNS}
+CONCEPT_ORDER = [CONCEPT_LABELS[concept] for concept in COST_ORDER]
+
+def get_valid_value(primary, fallback):
+    if pd.notna(primary) and str(primary).strip():
+        return primary
+    elif pd.notna(fallback) and str(fallback).strip():
+        return fallback
+    else:
+        return ""
+
+def capitalizar_notas(notas):
+    lineas = str(notas).split("\n")
+    lineas_transformadas = [
+        linea.capitalize() if linea.isupper() else linea
+        for linea in lineas
+    ]
+    return "\n".join(lineas_transformadas)
+
+def contract_fields(contrato_info: Dict) -> Dict:
+    fecha_fin = contrato_info.get("FECHA FIN FLETE", "")
+    return {
+        "Shipping Line": contrato_info.get("Línea", ""),
+        "Commodities": contrato_info.get("COMMODITIES", ""),
+        "HS Code": contrato_info.get("HS CODES", ""),
+        "Shipper": contrato_info.get("SHIPPER", ""),
+        "Free Days in Origin": get_valid_value(contrato_info.get("DÍAS ORIGEN", ""), contrato_info.get("FDO", "")),
+        "Free Days in Destination": get_valid_value(contrato_info.get("DÍAS DESTINO APROBADOS", ""), contrato_info.get("FDD", "")),
+        "Transit Time": contrato_info.get("TT", ""),
+        "Route": contrato_info.get("RUTA", ""),
+        "Suitable Food": contrato_info.get("APTO ALIMENTO", ""),
+        "Valid to": fecha_fin.strftime("%Y-%m-%d") if pd.notnull(fecha_fin) and fecha_fin != "" else "",
+        "Registered": contrato_info.get("Estado", ""),
+        "Empty Pickup": contrato_info.get("EMPTY PICKUP", ""),
+    }
+
+def _unstack_costs(primeros: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    costos = primeros[columns]
+    costos.columns = pd.Index(COST_COLUMNS, name="CONCEPT")
+    tabla = costos.stack(future_stack=True).unstack("TIPO CONT")
+    return tabla.rename(index=CONCEPT_LABELS, level="CONCEPT")
+
+def _cost_tables(contratos: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, np.ndarray]:
+    # Una fila por (Línea, No CONTRATO, CONCEPT) y una columna por TIPO CONT: texto para
+    # mostrar, y valor/estado ya normalizados (normalize_prices) para la cotización
+    group_keys = CONTRACT_KEYS + ["TIPO CONT"]
+    validos = contratos.dropna(subset=COST_COLUMNS, how="all").dropna(subset=group_keys)
+    primeros = validos.drop_duplicates(subset=group_keys).set_index(group_keys)
+
+    tabla = _unstack_costs(primeros, COST_COLUMNS).dropna(how="all")
+
+    # Celdas de tipos de contenedor que el contrato no tiene quedan vacías; las que sí
+    # tiene pero vienen sin valor se muestran como "<NA>", igual que antes
+    presentes = pd.Series(True, index=primeros.index).unstack("TIPO CONT", fill_value=False)
+    presentes = presentes.reindex(columns=tabla.columns, fill_value=False)
+    presentes = presentes.reindex(tabla.index.droplevel("CONCEPT")).to_numpy(dtype=bool)
+
+    valores = tabla.to_numpy(dtype=object)
+    vacios = tabla.isna().to_numpy()
+    texto = np.where(vacios, np.where(presentes, "<NA>", ""), valores.astype(str))
+
+    en_blanco = (np.char.strip(texto.astype(str)) == "").all(axis=1)
+    texto = pd.DataFrame(texto[~en_blanco], index=tabla.index[~en_blanco], columns=tabla.columns)
+
+    value_cols, status_cols = zip(*(price_columns(c) for c in COST_COLUMNS))
+    precios = _unstack_costs(primeros, list(value_cols)).reindex(index=texto.index, columns=texto.columns)
+    estados = _unstack_costs(primeros, list(status_cols)).reindex(index=texto.index, columns=texto.columns)
+
+    return texto, precios.astype("float64"), estados.astype(object).fillna(PENDING), presentes[~en_blanco]
+
+def prepare_contract_cards(contratos_vigentes: pd.DataFrame) -> List[Dict]:
+    contratos = contratos_vigentes.dropna(subset=CONTRACT_KEYS)
+    primeros = contratos.drop_duplicates(subset=CONTRACT_KEYS).sort_values(CONTRACT_KEYS, kind="stable")
+    tablas, precios, estados, presentes = _cost_tables(contratos)
+
+    partes = {}
+    if not tablas.empty:
+        contrato_de_fila = tablas.index.droplevel("CONCEPT")
+        codigos, claves = pd.factorize(contrato_de_fila)
+        for i, clave in enumerate(claves):
+            filas = codigos == i
+            columnas = presentes[filas].any(axis=0)
+            conceptos = tablas.index[filas].get_level_values("CONCEPT")
+            orden = [conceptos.get_loc(c) for c in CONCEPT_ORDER if c in conceptos]
+            partes[clave] = tuple(
+                frame.iloc[filas, columnas].droplevel(CONTRACT_KEYS).iloc[orden].rename_axis("CONCEPT")
+                for frame in (tablas, precios, estados)
+            )
+
+    cards = []
+    for contrato_info in primeros.to_dict("records"):
+        clave = (contrato_info["Línea"], contrato_info["No CONTRATO"])
+        tabla_pivot, costos, estados = partes.get(clave, (None, None, None))
+        notas = contrato_info.get("NOTAS", "")
+        cards.append({
+            "linea": clave[0],
+            "contrato_id": clave[1],
+            "info": contrato_info,
+            "fields": contract_fields(contrato_info),
+            "tabla_pivot": tabla_pivot,
+            "costos": costos,
+            "estados": estados,
+            "available_cargo_types": tabla_pivot.columns.tolist() if tabla_pivot is not None else [],
+            "notas": capitalizar_notas(notas if pd.notna(notas) else "").replace("\n", "  \n"),
+        })
+    return cards
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from typing import Dict, List, Tuple
+
+from src.common.sheet_sync import get_snapshot
+from src.common.config import SHEETS
+from src.services.contract_cards import COST_COLUMNS
+from src.services.prices import normalize_prices
+
+LEVELS = ["POL", "POD", "COMMODITIES", "TIPO CONT"]
+
+def prepare_contracts(df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
+    contratos_df = df1.copy()
+    tarifas_scrap = df2.copy()
+
+    for df in (contratos_df, tarifas_scrap):
+        df.columns = df.columns.str.strip()
+
+    contratos_df["POL"] = contratos_df["POL"].astype(str)
+    contratos_df["POD"] = contratos_df["POD"].astype(str)
+    tarifas_scrap["POL"] = tarifas_scrap["POL"].astype(str)
+    tarifas_scrap["POD"] = tarifas_scrap["POD"].astype(str)
+
+    contratos_df['FECHA FIN FLETE'] = contratos_df['FECHA FIN FLETE'].str.strip()
+    contratos_df['FECHA FIN FLETE'] = pd.to_datetime(contratos_df['FECHA FIN FLETE'], format='%d/%m/%Y', errors='coerce')
+    tarifas_scrap['FECHA FIN FLETE'] = pd.to_datetime(tarifas_scrap['FECHA FIN FLETE'], format='%d/%m/%Y', errors='coerce')
+
+    common_columns = list(set(contratos_df.columns) & set(tarifas_scrap.columns))
+
+    merged_df = pd.merge(contratos_df, tarifas_scrap, on=common_columns, how="outer").reset_index(drop=True)
+    return normalize_prices(merged_df, COST_COLUMNS)
+
+class ContractsIndex:
+    # POL -> POD -> COMMODITIES -> TIPO CONT -> posiciones de fila en `frame`
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.tree: Dict[str, Dict[str, Dict[str, Dict[str, np.ndarray]]]] = {}
+
+        if frame.empty or not set(LEVELS).issubset(frame.columns):
+            return
+
+        # groupby().indices no respeta el orden de aparición; se reordena por la primera fila
+        # para que las opciones salgan igual que con unique()
+        routes = frame.groupby(["POL", "POD"]).indices
+        for pol, pod in sorted(routes, key=lambda k: routes[k][0]):
+            self.tree.setdefault(pol, {}).setdefault(pod, {})
+
+        groups = frame.groupby(LEVELS).indices
+        for pol, pod, commodity, tipo in sorted(groups, key=lambda k: groups[k][0]):
+            self.tree[pol][pod].setdefault(commodity, {})[tipo] = groups[(pol, pod, commodity, tipo)]
+
+        self._tipos = frame["TIPO CONT"].to_numpy()
+
+    def pols(self) -> List[str]:
+        return list(self.tree)
+
+    def pods(self, pol: str) -> List[str]:
+        return list(self.tree.get(pol, {}))
+
+    def commodities(self, pol: str, pod: str) -> List[str]:
+        return list(self.tree.get(pol, {}).get(pod, {}))
+
+    def _positions(self, pol: str, pod: str, commodities: List[str], tipos=None) -> np.ndarray:
+        by_commodity = self.tree.get(pol, {}).get(pod, {})
+        chunks = [
+            positions
+            for commodity in commodities
+            for tipo, positions in by_commodity.get(commodity, {}).items()
+            if tipos is None or tipo in tipos
+        ]
+        if not chunks:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(chunks))
+
+    def container_types(self, pol: str, pod: str, commodities: List[str]) -> List[str]:
+        positions = self._positions(pol, pod, commodities)
+        return pd.unique(self._tipos[positions]).tolist() if len(positions) else []
+
+    def select(self, pol: str, pod: str, commodities: List[str], tipos: List[str]) -> pd.DataFrame:
+        return self.frame.iloc[self._positions(pol, pod, commodities, set(tipos))]
+
+@st.cache_resource(max_entries=4)
+def _build_contracts_index(revisions: Tuple[str, ...], _frames: Tuple[pd.DataFrame, ...]) -> ContractsIndex:
+    return ContractsIndex(prepare_contracts(*_frames))
+
+def load_contracts_index() -> ContractsIndex:
+    # El índice se reconstruye solo cuando cambia la revisión de alguna de las hojas
+    try:
+        snapshots = [get_snapshot(*SHEETS[name]) for name in ("mejoras_q2", "tarifas_scrap_expo")]
+    except Exception as e:
+        st.error(f"Error cargando los contratos: {e}")
+        return ContractsIndex(pd.DataFrame())
+    revisions = tuple(snap.revision for snap in snapshots)
+    # Los costos llegan como texto y los interpreta normalize_prices
+    frames = tuple(snap.to_frame(raw_columns=COST_COLUMNS) for snap in snapshots)
+    return _build_contracts_index(revisions, frames)
@@ -1,33 +1,39 @@
+import functools
+import io
 import json
+import multiprocessing
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import PyPDF2
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
 from reportlab.platypus import Table, TableStyle
 import streamlit as st
-from reportlab.pdfbase.ttfonts import TTFont
 import os
-from reportlab.pdfbase import pdfmetrics
 from datetime import date
 from src.services.auth import user_data
+from src.common.resources import TEMPLATE_PATH, registry
+from src.services.quotation_layout import ContinuationPages, fit_lines, fit_table, wrap_items
 
-font_path = "resources/fonts/OpenSauceSans-Regular.ttf"
-font_bold = "resources/fonts/OpenSauceSans-Bold.ttf"
+RENDER_WORKERS = 4
+TABLE_FLOOR = 215
+NOTES_FLOOR = 40
 
-if os.path.exists(font_path):
-    pdfmetrics.registerFont(TTFont("OpenSauce", font_path))
-else:
-    print("⚠️ Advertencia: La fuente 'Open Sauce' no se encontró. Se usará 'Helvetica' como alternativa.")
-
-if os.path.exists(font_bold):
-    pdfmetrics.registerFont(TTFont("OpenSauceBold", font_bold))
-else:
-    print("⚠️ Advertencia: La fuente 'Open Sauce Bold' no se encontró. Se usará 'Helvetica' como alternativa.")
+_template_lock = threading.Lock()
 
+def create_overlay(data, overlay, commercial_data=None):
+    if commercial_data is None:
+        commercial_data = user_data()
+    c = canvas.Canvas(overlay, pagesize=letter)
+    draw_overlay(c, data, commercial_data)
+    c.save()
 
-def create_overlay(data, overlay_path):
-
-    commercial_data = user_data()
-    c = canvas.Canvas(overlay_path, pagesize=letter)
+def draw_overlay(c, data, commercial_data):
+    registry.get("fonts")
 
     fecha = date.today()
     fecha_str = fecha.strftime("%d/%m/%Y")
@@ -95,10 +101,10 @@ def create_overlay(data, overlay_path):
         ]
         table_data.append(row)
 
-    
-    col_widths = [80, 140, 120, 85]
 
-    table = Table(table_data, colWidths=col_widths)
+    pages = ContinuationPages(c, f"Quotation {data.get('request_id', '')}")
+
+    col_widths = [80, 140, 120, 85]
 
     style = TableStyle([
         ('FONTNAME', (0,0), (-1,-1), 'OpenSauce'),
@@ -108,12 +114,14 @@ def create_overlay(data, overlay_path):
         ('TOPPADDING', (0,0), (-1,-1), 3),
         ('BOTTOMPADDING', (0,0), (-1,-1), 5),
     ])
-    table.setStyle(style)
 
-    x = 100
-    y = 425
-    table_width, table_height = table.wrapOn(c, 0, 0)
-    table.drawOn(c, x, y - table_height)
+    # En la primera página la tabla va entre y=425 y el TOTAL; el resto pasa a continuación
+    if table_data:
+        table = Table(table_data, colWidths=col_widths)
+        table.setStyle(style)
+        rest_table, _ = fit_table(c, table, 100, 425, TABLE_FLOOR)
+    else:
+        rest_table = None
 
     c.setFont("OpenSauceBold", 10)
     c.drawString(400, 200, f"TOTAL ${total_sale} USD")
@@ -160,39 +168,179 @@ def create_overlay(data, overlay_path):
     font_size = 9
 
     words = [w.strip() for w in notes_separated.split(",")]
-    line = ""
+    lines = wrap_items(words, ", ", font_name, font_size, max_width)
+    rest_lines = fit_lines(c, lines, x, y, NOTES_FLOOR, font_size * 1.2)
+
+    # Lo que no cupo en la primera página: primero el resto de la tabla, luego las notas
+    pages.flow_table(rest_table, 100)
+    pages.flow_lines(rest_lines, x, font_size * 1.2, font_name, font_size)
+
+    return 1 + pages.count
+
+def load_template(template_path):
+    # La plantilla por defecto vive en el registro de recursos (se carga una vez, o antes
+    # en segundo plano); las páginas nunca se modifican (se estampa sobre la copia que crea
+    # PdfWriter.add_page)
+    if template_path == TEMPLATE_PATH:
+        return registry.get("template")
+    return _load_other_template(template_path)
+
+@functools.lru_cache(maxsize=4)
+def _load_other_template(template_path):
+    with open(template_path, "rb") as f:
+        return PyPDF2.PdfReader(io.BytesIO(f.read()))
+
+def _add_stream(output, data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return output._add_object(stream)
+
+def _stamp(output, page, overlay_page, name):
+    # Equivale a page.merge_page(overlay_page) pero sin parsear el contenido de la plantilla:
+    # el overlay se agrega como Form XObject (con sus propios recursos, sin choques de nombres)
+    # y el contenido original se envuelve en q/Q con streams aparte
+    contents = overlay_page["/Contents"]
+    streams = contents if isinstance(contents, ArrayObject) else [contents]
+    form = DecodedStreamObject()
+    form.set_data(b"\n".join(stream.get_object().get_data() for stream in streams))
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): overlay_page.mediabox,
+        NameObject("/Resources"): overlay_page["/Resources"].clone(output),
+    })
+
+    # Copias superficiales: las copias de una misma página pueden compartir el diccionario
+    # de recursos, y cada una lleva su propio overlay
+    resources = DictionaryObject(page["/Resources"])
+    xobjects = DictionaryObject(resources.get("/XObject", DictionaryObject()))
+    xobjects[NameObject(name)] = output._add_object(form)
+    resources[NameObject("/XObject")] = xobjects
+    page[NameObject("/Resources")] = resources
+
+    original = page.raw_get("/Contents")
+    original = list(original.get_object()) if isinstance(original.get_object(), ArrayObject) else [original]
+    page[NameObject("/Contents")] = ArrayObject(
+        [_add_stream(output, b"q\n")]
+        + original
+        + [_add_stream(output, f"\nQ\nq {name} Do Q\n".encode())]
+    )
+
+def _append_quotation(output, template_pdf, overlay_pages, index=0):
+    # La primera página del overlay se estampa sobre la primera de la plantilla; las de
+    # continuación (tablas o notas largas) van como páginas propias justo después
+    for page_number in range(len(template_pdf.pages)):
+        page = output.add_page(template_pdf.pages[page_number])
+        if page_number == 0 and overlay_pages:
+            _stamp(output, page, overlay_pages[0], f"/QuotationOverlay{index}")
+            for continuation in overlay_pages[1:]:
+                output.add_page(continuation)
+
+def merge_pdfs(template_path, overlay):
+    overlay_pdf = PyPDF2.PdfReader(overlay)
+    output = PyPDF2.PdfWriter()
 
-    for word in words:
-        sep = ", " if line != "" else ""
-        test_line = line + sep + word
-        if c.stringWidth(test_line, font_name, font_size) <= max_width:
-            line = test_line
-        else:
-            c.drawString(x, y, line)
-            y -= font_size * 1.2 
-            line = word
+    # PdfReader resuelve objetos de forma perezosa y no es seguro entre hilos
+    with _template_lock:
+        _append_quotation(output, load_template(template_path), overlay_pdf.pages)
 
-    if line:
-        c.drawString(x, y, line)
+    buffer = io.BytesIO()
+    output.write(buffer)
+    return buffer.getvalue()
 
-    c.save()
+def render_quotation(data, commercial_data, template_path=TEMPLATE_PATH):
+    # No depende de la sesión de Streamlit: se puede ejecutar en otro proceso
+    overlay = io.BytesIO()
+    create_overlay(data, overlay, commercial_data)
+    overlay.seek(0)
+    return merge_pdfs(template_path, overlay)
 
-def merge_pdfs(template_path, overlay_path, output_path):
-    template_pdf = PyPDF2.PdfReader(template_path)
-    overlay_pdf = PyPDF2.PdfReader(overlay_path)
-    output = PyPDF2.PdfWriter()
+def generate_quotation(data, template_path=TEMPLATE_PATH):
+    return render_quotation(data, user_data(), template_path)
 
-    for page_number in range(len(template_pdf.pages)):
-        template_page = template_pdf.pages[page_number]
-        if page_number < len(overlay_pdf.pages):
-            overlay_page = overlay_pdf.pages[page_number]
-            template_page.merge_page(overlay_page)
-        output.add_page(template_page)
-    
-    with open(output_path, "wb") as f_out:
-        output.write(f_out)
+@st.cache_resource
+def get_render_pool():
+    # reportlab es CPU-bound; "spawn" evita hacer fork de un servidor con hilos
+    workers = min(RENDER_WORKERS, os.cpu_count() or 1)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
 
-def generate_quotation(data, template_path="resources/documents/Quotations forms.pdf", output_path="resources/documents/quotation.pdf", overlay_path="resources/documents/overlay.pdf"):
-    create_overlay(data, overlay_path)
-    merge_pdfs(template_path, overlay_path, output_path)
-    return output_path
+def generate_quotations(quotations, template_path=TEMPLATE_PATH):
+    # Cada cotización se renderiza en su propio buffer; el orden de salida es el de entrada
+    commercial_data = user_data()
+    pool = get_render_pool()
+    try:
+        futures = [pool.submit(render_quotation, data, commercial_data, template_path) for data in quotations]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        get_render_pool.clear()
+        raise
+
+def _quotation_file_name(data, used):
+    name = f"quotation_{data.get('request_id') or 'draft'}.pdf"
+    counter = 1
+    while name in used:
+        counter += 1
+        name = f"quotation_{data.get('request_id') or 'draft'}_{counter}.pdf"
+    used.add(name)
+    return name
+
+def _write_zip(sink, quotations, commercial_data, template_path):
+    # Se escribe cada PDF apenas está listo; como mucho hay 2 * RENDER_WORKERS en memoria
+    pool = get_render_pool()
+    window = 2 * RENDER_WORKERS
+    used = set()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        pending = []
+        try:
+            for data in quotations:
+                pending.append((data, pool.submit(render_quotation, data, commercial_data, template_path)))
+                if len(pending) >= window:
+                    done, future = pending.pop(0)
+                    archive.writestr(_quotation_file_name(done, used), future.result())
+            for done, future in pending:
+                archive.writestr(_quotation_file_name(done, used), future.result())
+        except BrokenProcessPool:
+            get_render_pool.clear()
+            raise
+
+def _write_merged(sink, quotations, commercial_data, template_path):
+    # Un solo canvas (una página de overlay por cotización) y una sola plantilla: las
+    # fuentes e imágenes de la plantilla quedan compartidas entre todas las copias
+    overlay = io.BytesIO()
+    c = canvas.Canvas(overlay, pagesize=letter)
+    page_counts = []
+    for data in quotations:
+        page_counts.append(draw_overlay(c, data, commercial_data))
+        c.showPage()
+    c.save()
+    overlay.seek(0)
+    overlay_pdf = PyPDF2.PdfReader(overlay)
+
+    output = PyPDF2.PdfWriter()
+    with _template_lock:
+        template_pdf = load_template(template_path)
+        start = 0
+        for index, count in enumerate(page_counts):
+            _append_quotation(output, template_pdf, overlay_pdf.pages[start:start + count], index)
+            start += count
+    output.write(sink)
+
+def export_quotations(quotations, file_format="zip", template_path=TEMPLATE_PATH):
+    # Devuelve un archivo abierto en modo lectura (lo acepta st.download_button). El archivo
+    # temporal se borra enseguida y desaparece al cerrarlo
+    commercial_data = user_data()
+    with tempfile.NamedTemporaryFile(suffix=f".{file_format}", delete=False) as sink:
+        path = sink.name
+        try:
+            if file_format == "zip":
+                _write_zip(sink, quotations, commercial_data, template_path)
+            elif file_format == "pdf":
+                _write_merged(sink, quotations, commercial_data, template_path)
+            else:
+                raise ValueError(f"Formato de exportación no soportado: {file_format}")
+        except BaseException:
+            os.unlink(path)
+            raise
+    export = open(path, "rb")
+    os.unlink(path)
+    return export
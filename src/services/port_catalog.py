@@ -0,0 +1,217 @@
+import hashlib
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from typing import Dict, List, Optional, Tuple
+
+from src.common.search_index import SearchIndex
+
+PORTS_CSV = "resources/data/output_port_world.csv"
+CITIES_CSV = "resources/data/cities_world.csv"
+SNAPSHOT_DIR = os.path.join(".cache", "catalogs")
+
+# (csv, columna país, columna nombre, columna código)
+CATALOGS = {
+    "ports": (PORTS_CSV, "country", "port name", "port code"),
+    "cities": (CITIES_CSV, "Country", "City", None),
+}
+
+SOURCE_HASH_KEY = b"source_sha256"
+BUILD_MS_KEY = b"csv_build_ms"
+
+class PortCatalog:
+    # Puertos (o ciudades) en columnas, ordenados por país: los de `countries[i]` son
+    # names[offsets[i]:offsets[i + 1]], sin repetidos y en el orden del CSV. Es de solo lectura
+    # y se comparte entre sesiones. Guarda además todas las filas (con repetidos) para el mapa
+    # de códigos y para el snapshot binario
+
+    def __init__(self, countries: List[str], country_ids: np.ndarray, names: np.ndarray,
+                 first: np.ndarray, codes: Optional[np.ndarray] = None):
+        self.country_ids = country_ids
+        self.all_names = names
+        self.first = first
+        self.all_codes = codes
+        self.names = names[first]
+        self.offsets = np.searchsorted(country_ids[first], np.arange(len(countries) + 1))
+        self._countries = countries
+        self._country_positions = {country: i for i, country in enumerate(countries)}
+        self._codes: Optional[Dict[str, Tuple[str, str]]] = None
+        self._ports: Dict[str, List[str]] = {}
+        self._port_positions: Dict[str, Dict[str, int]] = {}
+        self._search_indexes: Dict[str, SearchIndex] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, country_column: str, name_column: str,
+                   code_column: Optional[str] = None) -> "PortCatalog":
+        rows = df.dropna(subset=[country_column, name_column])
+        countries = rows[country_column].astype(str).to_numpy()
+        names = rows[name_column].astype(str).to_numpy()
+        codes = None
+        if code_column is not None:
+            # Un código repetido se queda con la última fila del archivo
+            code_values = rows[code_column].where(rows[code_column].notna(), None)
+            codes = code_values.mask(code_values.duplicated(keep="last"), None).to_numpy(dtype=object)
+
+        # Orden estable por país: dentro de cada país se conserva el orden del archivo
+        order = np.argsort(countries, kind="stable")
+        countries, names = countries[order], names[order]
+        if codes is not None:
+            codes = codes[order]
+        first = ~pd.DataFrame({"country": countries, "name": names}).duplicated().to_numpy()
+
+        unique_countries, country_ids = np.unique(countries, return_inverse=True)
+        return cls(unique_countries.tolist(), country_ids.astype(np.int32), names, first, codes)
+
+    @classmethod
+    def from_csv(cls, path: str, country_column: str, name_column: str,
+                 code_column: Optional[str] = None) -> "PortCatalog":
+        columns = [c for c in (country_column, name_column, code_column) if c]
+        return cls.from_frame(pd.read_csv(path, usecols=columns), country_column, name_column, code_column)
+
+    def to_table(self) -> pa.Table:
+        columns = {
+            "country": pa.DictionaryArray.from_arrays(pa.array(self.country_ids), pa.array(self._countries)),
+            "name": pa.array(self.all_names, type=pa.string()),
+            "first": pa.array(self.first),
+        }
+        if self.all_codes is not None:
+            columns["code"] = pa.array(self.all_codes, type=pa.string())
+        return pa.table(columns)
+
+    @classmethod
+    def from_table(cls, table: pa.Table) -> "PortCatalog":
+        country = table.column("country").combine_chunks()
+        codes = None
+        if "code" in table.column_names:
+            codes = table.column("code").to_numpy(zero_copy_only=False)
+        return cls(
+            country.dictionary.to_pylist(),
+            country.indices.to_numpy(zero_copy_only=False),
+            table.column("name").to_numpy(zero_copy_only=False),
+            table.column("first").to_numpy(zero_copy_only=False),
+            codes,
+        )
+
+    def countries(self) -> List[str]:
+        return self._countries
+
+    def country_position(self, country: str) -> Optional[int]:
+        return self._country_positions.get(country)
+
+    def ports(self, country: str) -> List[str]:
+        ports = self._ports.get(country)
+        if ports is None:
+            i = self._country_positions.get(country)
+            ports = [] if i is None else self.names[self.offsets[i]:self.offsets[i + 1]].tolist()
+            self._ports[country] = ports
+        return ports
+
+    def port_position(self, country: str, port: str) -> Optional[int]:
+        positions = self._port_positions.get(country)
+        if positions is None:
+            positions = {name: i for i, name in enumerate(self.ports(country))}
+            self._port_positions[country] = positions
+        return positions.get(port)
+
+    def search_index(self, country: str) -> SearchIndex:
+        # Índice de búsqueda de los puertos de un país; se arma la primera vez que se pide
+        index = self._search_indexes.get(country)
+        if index is None:
+            index = SearchIndex(self.ports(country))
+            self._search_indexes[country] = index
+        return index
+
+    def lookup(self, code: str) -> Optional[Tuple[str, str]]:
+        # Código de puerto (p. ej. "COCTG") -> (país, nombre). El mapa se arma la primera vez
+        if self._codes is None:
+            codes = {}
+            if self.all_codes is not None:
+                for code_value, country_id, name in zip(self.all_codes, self.country_ids, self.all_names):
+                    if code_value is not None:
+                        codes[code_value] = (self._countries[country_id], name)
+            self._codes = codes
+        return self._codes.get(code)
+
+def option_index(position: Optional[int]) -> int:
+    # Índice para un selectbox cuyas opciones son [""] + lista
+    return position + 1 if position is not None else 0
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def snapshot_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.arrow")
+
+def build_snapshot(name: str) -> PortCatalog:
+    # Compila el CSV a Arrow IPC junto con el hash del CSV y lo que tardó construirlo
+    csv_path, country_column, name_column, code_column = CATALOGS[name]
+    source_hash = _file_hash(csv_path)
+    start = time.perf_counter()
+    catalog = PortCatalog.from_csv(csv_path, country_column, name_column, code_column)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    table = catalog.to_table().replace_schema_metadata({
+        SOURCE_HASH_KEY: source_hash.encode(),
+        BUILD_MS_KEY: f"{build_ms:.1f}".encode(),
+    })
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return catalog
+
+def _read_snapshot(name: str, source_hash: str) -> Optional[Tuple[PortCatalog, float]]:
+    path = snapshot_path(name)
+    try:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+    except FileNotFoundError:
+        return None
+    except (OSError, pa.ArrowException) as e:
+        print(f"⚠️ Snapshot ilegible para el catálogo '{name}', se reconstruye: {e}")
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(SOURCE_HASH_KEY, b"").decode() != source_hash:
+        return None
+    return PortCatalog.from_table(table), float(metadata.get(BUILD_MS_KEY, b"0"))
+
+def load_catalog(name: str) -> PortCatalog:
+    # Usa el snapshot si corresponde al CSV actual; si el CSV cambió (o no hay snapshot) lo reconstruye
+    csv_path = CATALOGS[name][0]
+    start = time.perf_counter()
+    snapshot = _read_snapshot(name, _file_hash(csv_path))
+    if snapshot is None:
+        catalog = build_snapshot(name)
+        print(f"⏱️ Catálogo '{name}': snapshot reconstruido desde {csv_path} en {(time.perf_counter() - start) * 1000:.0f} ms")
+        return catalog
+    catalog, build_ms = snapshot
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"⏱️ Catálogo '{name}': snapshot cargado en {load_ms:.0f} ms (desde el CSV: {build_ms:.0f} ms, ahorro {build_ms - load_ms:.0f} ms)")
+    return catalog
+
+@st.cache_resource
+def get_port_catalog() -> PortCatalog:
+    return load_catalog("ports")
+
+@st.cache_resource
+def get_city_catalog() -> PortCatalog:
+    return load_catalog("cities")
+
+if __name__ == "__main__":
+    # Paso de build (p. ej. en el deploy): python -m src.services.port_catalog
+    for catalog_name, (csv_path, *_) in CATALOGS.items():
+        if os.path.exists(csv_path):
+            build_snapshot(catalog_name)
+            print(f"✅ {csv_path} -> {snapshot_path(catalog_name)}")
+        else:
+            print(f"⚠️ No se encontró {csv_path}; el catálogo '{catalog_name}' no se compiló")
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, Tuple
+
+NUMERIC = "numeric"
+INCLUIDO = "INCLUIDO"
+PENDING = "pending"
+INVALID = "invalid"
+
+PRICE_STATUS = pd.CategoricalDtype([NUMERIC, INCLUIDO, PENDING, INVALID])
+
+PENDING_VALUES = ["", "PENDIENTE", "PENDING", "N/A", "NA", "-"]
+
+def price_columns(column: str) -> Tuple[str, str]:
+    return f"{column}_VALUE", f"{column}_STATUS"
+
+def parse_prices(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    # "$1.234,50" -> 1234.5 ; "INCLUIDO" -> 0.0 ; vacío/"Pendiente" -> pending ; resto -> invalid
+    # Se espera el texto de la celda: "." es separador de miles y "," decimal. Solo un número
+    # de verdad (int/float, no un string numérico) se toma tal cual
+    is_number = values.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool))
+    is_number = is_number.astype(bool) & values.notna()
+    numbers = pd.to_numeric(values.where(is_number), errors="coerce").astype("float64")
+    text = values.where(~is_number).astype("string").str.strip().str.upper()
+
+    cleaned = (
+        text.str.replace("$", "", regex=False)
+            .str.replace(" ", "", regex=False)
+            .str.replace(".", "", regex=False)
+            .str.replace(",", ".", regex=False)
+    )
+    parsed = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+
+    incluido = text.eq(INCLUIDO).fillna(False).to_numpy(dtype=bool)
+    pending = (values.isna() | text.isin(PENDING_VALUES).fillna(False)).to_numpy(dtype=bool) & ~is_number.to_numpy()
+    numeric = is_number.to_numpy() | (parsed.notna().to_numpy() & ~incluido & ~pending)
+
+    value = np.where(is_number, numbers, np.where(numeric, parsed, np.where(incluido, 0.0, np.nan)))
+    status = np.select([numeric, incluido, pending], [NUMERIC, INCLUIDO, PENDING], default=INVALID)
+
+    return (
+        pd.Series(value, index=values.index, dtype="float64"),
+        pd.Series(pd.Categorical(status, dtype=PRICE_STATUS), index=values.index),
+    )
+
+def normalize_prices(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    df = df.copy()
+    for column in columns:
+        if column not in df.columns:
+            continue
+        value_col, status_col = price_columns(column)
+        df[value_col], df[status_col] = parse_prices(df[column])
+    return df
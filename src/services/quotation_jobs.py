@@ -0,0 +1,153 @@
+import os
+import shutil
+import time
+import pandas as pd
+import streamlit as st
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.common.drive_upload import DONE, FAILED, SKIPPED, UploadProgress, upload_directory
+from src.common.spool_store import current_session_id, get_spool_store
+from src.common.write_queue import Job, WriteQueue
+from src.services.utils import (
+    PARENT_FOLDER_ID, all_quotes_columns, create_folder, log_time, new_drive_service,
+    new_write_batch, save_to_google_sheets, sheet_id, time_sheet_id, validate_shared_drive_folder,
+)
+
+KIND = "quotation"
+ATTACHMENTS_DIR = os.path.join(".cache", "write_queue_files")
+# Cotizaciones enviadas cuyo estado se muestra en la página
+MAX_TRACKED_JOBS = 10
+# Cada cuánto se guarda en el diario el avance de la subida de adjuntos, como mucho
+PROGRESS_SAVE_INTERVAL = 1.0
+
+def stage_attachments(request_id: str) -> str:
+    # Enlaces duros a los adjuntos de la sesión: la sesión se puede limpiar enseguida y el
+    # trabajo conserva sus archivos aunque la app se reinicie
+    target = os.path.join(ATTACHMENTS_DIR, request_id)
+    os.makedirs(target, exist_ok=True)
+    for path in get_spool_store().files(current_session_id()):
+        dest = os.path.join(target, os.path.basename(path))
+        if os.path.exists(dest):
+            continue
+        try:
+            os.link(path, dest)
+        except OSError:
+            shutil.copy2(path, dest)
+    return target
+
+def enqueue_quotation(queue: WriteQueue, request_id: str, record: Dict, start_time: datetime,
+                      end_time: datetime, new_client: Optional[str] = None,
+                      submitted_by: Optional[str] = None) -> bool:
+    payload = {
+        "request_id": request_id,
+        "submitted_by": submitted_by,
+        "record": record,
+        "start_time": start_time.isoformat(),
+        "end_time": end_time.isoformat(),
+        "new_client": new_client,
+        "attachments": stage_attachments(request_id),
+    }
+    return queue.enqueue(request_id, KIND, payload)
+
+def upload_progress_saver(queue: WriteQueue, job: Job):
+    # on_tick de upload_directory: deja en job.state cuántos archivos van subidos para que la
+    # página lo muestre. Solo escribe si el conteo cambió, y no más de una vez por intervalo
+    # salvo al terminar
+    last = {"counts": None, "at": float("-inf")}
+
+    def on_tick(progress: UploadProgress) -> None:
+        files = progress.snapshot().values()
+        counts = {"done": sum(1 for f in files if f["status"] in (DONE, SKIPPED)), "total": len(files)}
+        finished = all(f["status"] in (DONE, SKIPPED, FAILED) for f in files)
+        now = time.monotonic()
+        if counts == last["counts"] or (not finished and now - last["at"] < PROGRESS_SAVE_INTERVAL):
+            return
+        job.state["upload"] = counts
+        queue.save_state(job)
+        last["counts"], last["at"] = counts, now
+
+    return on_tick
+
+def _prepare(queue: WriteQueue, job: Job) -> None:
+    # Carpeta y adjuntos en Drive. Cada paso queda guardado en job.state, así que un reintento
+    # retoma desde donde quedó (upload_directory además salta los archivos que ya están)
+    request_id = job.payload["request_id"]
+    if not job.state.get("folder_id"):
+        if not validate_shared_drive_folder(PARENT_FOLDER_ID):
+            raise RuntimeError("La carpeta principal de Drive no existe o no es accesible")
+        folder_id = create_folder(request_id, PARENT_FOLDER_ID)
+        if not folder_id:
+            raise RuntimeError(f"No se pudo crear la carpeta de {request_id}")
+        job.state["folder_id"] = folder_id
+        queue.save_state(job)
+
+    directory = job.payload["attachments"]
+    if os.path.isdir(directory):
+        progress = upload_directory(new_drive_service, job.state["folder_id"], directory,
+                                    on_tick=upload_progress_saver(queue, job))
+        files = progress.snapshot()
+        if any(entry["status"] == DONE for entry in files.values()):
+            job.state["files_uploaded"] = True
+            queue.save_state(job)
+        failed = [name for name, entry in files.items() if entry["status"] == FAILED]
+        if failed:
+            raise RuntimeError(f"No se pudieron subir a Drive: {', '.join(failed)}")
+        shutil.rmtree(directory, ignore_errors=True)
+
+def _add_rows(job: Job, batch) -> None:
+    payload, state = job.payload, job.state
+    sent = set(state.get("sheets_sent", []))
+    request_id = payload["request_id"]
+
+    if sheet_id not in sent:
+        folder_link = f"https://drive.google.com/drive/folders/{state['folder_id']}"
+        link_label = "*" if state.get("files_uploaded") else ""
+        record = dict(payload["record"], request_id=f'=HYPERLINK("{folder_link}"; "{request_id} {link_label}")')
+        quote_df = pd.DataFrame([record]).reindex(columns=all_quotes_columns, fill_value="")
+        save_to_google_sheets(quote_df, sheet_id, batch=batch)
+
+    if time_sheet_id not in sent:
+        start_time = datetime.fromisoformat(payload["start_time"])
+        end_time = datetime.fromisoformat(payload["end_time"])
+        duration = (end_time - start_time).total_seconds()
+        log_time(start_time, end_time, duration, request_id, quotation_type="Requested Quotation", batch=batch)
+        if payload.get("new_client"):
+            batch.add(time_sheet_id, "clientes", [[payload["new_client"]]])
+
+def process_quotations(queue: WriteQueue, jobs: List[Job]) -> Dict[str, str]:
+    errors = {}
+    ready = []
+    for job in jobs:
+        try:
+            _prepare(queue, job)
+            ready.append(job)
+        except Exception as e:
+            errors[job.id] = str(e)
+    if not ready:
+        return errors
+
+    # Las filas de todas las cotizaciones tomadas en esta pasada van en un solo lote
+    batch = new_write_batch()
+    for job in ready:
+        _add_rows(job, batch)
+    try:
+        batch.flush()
+    except Exception as e:
+        for job in ready:
+            job.state["sheets_sent"] = sorted(set(job.state.get("sheets_sent", [])) | set(batch.sent))
+            queue.save_state(job)
+            errors[job.id] = str(e)
+    print(f"📊 Cola de escrituras: {len(ready)} cotizaciones en {batch.api_calls} llamadas a la API de Sheets")
+    return errors
+
+def failed_quotations(queue: WriteQueue, email: Optional[str] = None) -> List[Job]:
+    # Sin email se listan las de todos (admin)
+    return [job for job in queue.failed(KIND) if email is None or job.payload.get("submitted_by") == email]
+
+@st.cache_resource
+def get_write_queue() -> WriteQueue:
+    queue = WriteQueue()
+    queue.register(KIND, lambda jobs: process_quotations(queue, jobs))
+    queue.start()
+    return queue
@@ -0,0 +1,106 @@
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Table
+from typing import Dict, List, Optional, Tuple
+
+PAGE_TOP = letter[1] - 50
+PAGE_BOTTOM = 50
+SECTION_GAP = 15
+
+# Ancho de cada carácter por (fuente, tamaño): stringWidth suma anchos de glifos sin kerning,
+# así que el ancho de un texto es la suma de sus caracteres
+_glyph_widths: Dict[Tuple[str, float], Dict[str, float]] = {}
+
+def string_width(text: str, font_name: str, font_size: float) -> float:
+    widths = _glyph_widths.setdefault((font_name, font_size), {})
+    total = 0.0
+    for char in text:
+        width = widths.get(char)
+        if width is None:
+            width = widths[char] = stringWidth(char, font_name, font_size)
+        total += width
+    return total
+
+def wrap_items(items: List[str], separator: str, font_name: str, font_size: float, max_width: float) -> List[str]:
+    # Lineal en el largo del texto: cada palabra se mide una sola vez. Igual que antes, una
+    # palabra más ancha que max_width queda sola en su línea
+    separator_width = string_width(separator, font_name, font_size)
+    lines = []
+    current: List[str] = []
+    current_width = 0.0
+    for item in items:
+        item_width = string_width(item, font_name, font_size)
+        width = current_width + separator_width + item_width if current else item_width
+        if current and width > max_width:
+            lines.append(separator.join(current))
+            current, current_width = [item], item_width
+        else:
+            current.append(item)
+            current_width = width
+    if current:
+        lines.append(separator.join(current))
+    return lines
+
+def fit_table(c, table: Table, x: float, y: float, floor: float) -> Tuple[Optional[Table], float]:
+    # Dibuja las filas que caben entre y y floor. Devuelve el resto (None si cupo todo) y
+    # la y donde terminó lo dibujado
+    available_width = letter[0] - x
+    available = y - floor
+    _, height = table.wrapOn(c, available_width, available)
+    if height <= available:
+        table.drawOn(c, x, y - height)
+        return None, y - height
+    parts = table.splitOn(c, available_width, available)
+    if len(parts) < 2:
+        return table, y
+    first, rest = parts
+    _, first_height = first.wrapOn(c, available_width, available)
+    first.drawOn(c, x, y - first_height)
+    return rest, y - first_height
+
+def fit_lines(c, lines: List[str], x: float, y: float, floor: float, line_height: float) -> List[str]:
+    for index, line in enumerate(lines):
+        if y < floor:
+            return lines[index:]
+        c.drawString(x, y, line)
+        y -= line_height
+    return []
+
+class ContinuationPages:
+    # Páginas extra del overlay (van entre la primera página de la plantilla y el resto) para
+    # lo que no cupo en los recuadros de la primera. Se usan después de terminar la primera
+    # página, porque el canvas solo avanza hacia adelante
+
+    def __init__(self, c, title: str):
+        self.c = c
+        self.title = title
+        self.count = 0
+        self.y: Optional[float] = None
+
+    def new_page(self) -> float:
+        self.c.showPage()
+        self.count += 1
+        self.c.setFont("OpenSauceBold", 10)
+        self.c.drawString(88, PAGE_TOP, f"{self.title} (cont. {self.count})")
+        self.y = PAGE_TOP - 25
+        return self.y
+
+    def flow_table(self, table: Optional[Table], x: float) -> None:
+        while table is not None:
+            y = self.new_page()
+            rest, bottom = fit_table(self.c, table, x, y, PAGE_BOTTOM)
+            if rest is table:
+                # Ni una fila cabe en una página vacía: se dibuja tal cual
+                _, height = table.wrapOn(self.c, letter[0] - x, y - PAGE_BOTTOM)
+                table.drawOn(self.c, x, y - height)
+                rest, bottom = None, y - height
+            table = rest
+            self.y = bottom - SECTION_GAP
+
+    def flow_lines(self, lines: List[str], x: float, line_height: float, font_name: str, font_size: float) -> None:
+        # Las notas siguen debajo de la tabla si queda espacio en la última página
+        while lines:
+            y = self.y if self.y is not None and self.y >= PAGE_BOTTOM else self.new_page()
+            self.c.setFont(font_name, font_size)
+            lines = fit_lines(self.c, lines, x, y, PAGE_BOTTOM, line_height)
+            self.y = None
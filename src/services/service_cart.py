@@ -0,0 +1,191 @@
+import copy
+import json
+import os
+import sqlite3
+import time
+import uuid
+import streamlit as st
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+from src.common.spool_store import current_session_id
+
+CART_PATH = os.path.join(".cache", "service_carts.sqlite3")
+# Carritos guardados que nadie tocó en este tiempo se descartan
+CART_TTL = 24 * 3600
+SESSION_KEY = "service_cart"
+# Parámetro de la URL que identifica la pestaña; sobrevive a recargas y reinicios del servidor
+TAB_PARAM = "tab"
+
+@dataclass(frozen=True)
+class CartItem:
+    service: str
+    details: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"service": self.service, "details": self.details}
+
+@dataclass(frozen=True)
+class CartSnapshot:
+    items: Tuple[CartItem, ...] = ()
+    version: int = 0
+
+    def to_json(self) -> str:
+        return json.dumps([item.to_dict() for item in self.items], ensure_ascii=False, default=str)
+
+    @classmethod
+    def from_json(cls, text: str, version: int = 0) -> "CartSnapshot":
+        return cls(tuple(CartItem(entry["service"], entry["details"]) for entry in json.loads(text)), version)
+
+class CartStore:
+    # Copia durable de los carritos (SQLite en modo WAL) para recuperarlos si el proceso se
+    # reinicia a mitad de una cotización. Solo se escribe cuando el carrito cambia; en cada
+    # rerun se trabaja con la copia en memoria
+
+    def __init__(self, path: str = CART_PATH, ttl: float = CART_TTL):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS carts (
+                    key TEXT PRIMARY KEY,
+                    items TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("DELETE FROM carts WHERE updated_at < ?", (time.time() - ttl,))
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def save(self, key: str, snapshot: CartSnapshot) -> None:
+        conn = self._connect()
+        try:
+            if snapshot.items:
+                conn.execute(
+                    "INSERT OR REPLACE INTO carts (key, items, updated_at) VALUES (?, ?, ?)",
+                    (key, snapshot.to_json(), time.time()),
+                )
+            else:
+                conn.execute("DELETE FROM carts WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+    def load(self, key: str) -> Optional[CartSnapshot]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT items FROM carts WHERE key = ? AND updated_at >= ?", (key, time.time() - self.ttl)
+            ).fetchone()
+        finally:
+            conn.close()
+        return CartSnapshot.from_json(row[0]) if row else None
+
+class ServiceCart:
+    # Servicios de la cotización en curso, uno por sesión (vive en st.session_state). `version`
+    # sube con cada cambio y los valores derivados se guardan por versión, así los reruns no
+    # vuelven a recorrer los servicios si el carrito no cambió
+
+    def __init__(self, key: str, store: Optional[CartStore] = None):
+        self.key = key
+        self.store = store
+        self.version = 0
+        self._items: List[CartItem] = []
+        self._derived: Dict[str, Tuple[int, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[CartItem]:
+        return iter(list(self._items))
+
+    def __getitem__(self, index: int) -> CartItem:
+        return self._items[index]
+
+    def _changed(self) -> None:
+        self.version += 1
+        if self.store is not None:
+            try:
+                self.store.save(self.key, self.snapshot())
+            except Exception as e:
+                print(f"⚠️ No se pudo guardar el carrito de servicios: {e}")
+
+    def add(self, service: str, details: Dict[str, Any]) -> None:
+        self._items.append(CartItem(service, copy.deepcopy(details)))
+        self._changed()
+
+    def replace(self, index: int, service: str, details: Dict[str, Any]) -> None:
+        self._items[index] = CartItem(service, copy.deepcopy(details))
+        self._changed()
+
+    def remove(self, index: int) -> CartItem:
+        item = self._items.pop(index)
+        self._changed()
+        return item
+
+    def clear(self) -> None:
+        self._items = []
+        self._changed()
+
+    def snapshot(self) -> CartSnapshot:
+        return CartSnapshot(tuple(copy.deepcopy(self._items)), self.version)
+
+    def restore(self, snapshot: CartSnapshot) -> None:
+        self._items = list(copy.deepcopy(snapshot.items))
+        self._changed()
+
+    def recover(self) -> bool:
+        # Retoma el carrito guardado si el de la sesión está vacío (p. ej. tras un reinicio)
+        if self._items or self.store is None:
+            return False
+        try:
+            snapshot = self.store.load(self.key)
+        except Exception as e:
+            print(f"⚠️ No se pudo leer el carrito guardado: {e}")
+            return False
+        if not snapshot or not snapshot.items:
+            return False
+        self.restore(snapshot)
+        return True
+
+    def derived(self, name: str, compute: Callable[[List[CartItem]], Any]) -> Any:
+        # Valor calculado a partir de los servicios; se recalcula solo si el carrito cambió.
+        # Se devuelve una copia para que quien lo modifique no toque los servicios guardados
+        entry = self._derived.get(name)
+        if entry is None or entry[0] != self.version:
+            entry = (self.version, compute(self._items))
+            self._derived[name] = entry
+        return copy.deepcopy(entry[1])
+
+@st.cache_resource
+def get_cart_store() -> Optional[CartStore]:
+    if st.secrets["general"].get("cart_backend", "memory") == "sqlite":
+        return CartStore()
+    return None
+
+def tab_id(params: Optional[MutableMapping[str, str]] = None) -> str:
+    params = st.query_params if params is None else params
+    tab = params.get(TAB_PARAM)
+    if not tab:
+        tab = params[TAB_PARAM] = uuid.uuid4().hex[:12]
+    return tab
+
+def cart_key(params: Optional[MutableMapping[str, str]] = None) -> str:
+    # El usuario y la pestaña, no la sesión de Streamlit, que cambia si el servidor se reinicia.
+    # Con solo el email dos pestañas del mismo usuario compartirían el carrito y una pestaña
+    # nueva "recuperaría" los servicios de la otra
+    email = getattr(st.experimental_user, "email", None)
+    if not email:
+        return current_session_id()
+    return f"{email}#{tab_id(params)}"
+
+def get_service_cart() -> ServiceCart:
+    cart = st.session_state.get(SESSION_KEY)
+    if cart is None:
+        cart = st.session_state[SESSION_KEY] = ServiceCart(cart_key(), get_cart_store())
+    return cart
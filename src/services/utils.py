@@ -1,21 +1,26 @@
 import streamlit as st
-from google.oauth2.service_account import Credentials
 import gspread
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 import os
 import csv
 import pytz
 from datetime import datetime
-import json
 import os
 import pandas as pd
 import re
-import unidecode
 import unicodedata
-
-SERVICES_FILE = "services.json"
-TEMP_DIR = "temp_uploads"
+from src.common.clients import get_clients
+from src.common.id_allocator import IdAllocator, SheetReservationBackend, SqliteCounterBackend
+from src.common.sheet_batch import SheetWriteBatch
+from src.common.quota import limiter as quota_limiter
+from src.common.spool_store import SpoolQuotaExceeded, current_session_id, get_spool_store
+from src.common.search_index import SearchIndex, normalize
+from src.services.port_catalog import get_city_catalog, get_port_catalog, option_index
+from src.services.service_cart import get_service_cart
+
+# Coincidencias que se mandan al navegador en los selectbox con búsqueda
+SEARCH_LIMIT = 20
+EMPTY_INDEX = SearchIndex([])
 
 all_quotes_columns =[
     "request_id", "time", "commercial", "service", "client", "client_reference", "incoterm", "commodity", "hs_code", "transport_type", "modality", "routes_info", "ground_routes", "country_origin", "country_destination", "pickup_address", "zip_code_origin", "delivery_address", "zip_code_destination", "addresses",
@@ -28,34 +33,14 @@ DRIVE_ID = st.secrets["general"]["drive_id"]
 time_sheet_id = st.secrets["general"]["time_sheet_id"]
 PARENT_FOLDER_ID = st.secrets["general"]["parent_folder"]
 
-sheets_creds= Credentials.from_service_account_info(
-    st.secrets["google_sheets_credentials"],
-    scopes=[
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-)
-
-sheets_service = build('sheets', 'v4', credentials=sheets_creds)
-
-drive_creds = Credentials.from_service_account_info(
-    st.secrets["google_drive_credentials"],
-    scopes=["https://www.googleapis.com/auth/drive"]
-)
-
-drive_service = build('drive', 'v3', credentials=drive_creds)
-client_gcp = gspread.authorize(sheets_creds)
-
-def save_file_locally(file, temp_dir=TEMP_DIR):
+def save_file_locally(file):
     try:
-        os.makedirs(temp_dir, exist_ok=True)
-
-        temp_file_path = os.path.join(temp_dir, file.name)
+        store = get_spool_store()
+        return store.save(current_session_id(), file, file.name)
 
-        with open(temp_file_path, "wb") as temp_file:
-            temp_file.write(file.getbuffer())  
-
-        return temp_file_path
+    except SpoolQuotaExceeded as e:
+        st.error(f"⚠️ {e}")
+        return None
 
     except Exception as e:
         st.error(f"⚠️ Error al guardar el archivo: {e}")
@@ -72,16 +57,6 @@ def save_csv(file, new_client):
     with open(file, "a") as f:
         f.write(f"{new_client}\n")
 
-def folder(request_id):
-    if validate_shared_drive_folder(PARENT_FOLDER_ID):
-        folder_id = create_folder(request_id, PARENT_FOLDER_ID)
-        if not folder_id:
-            st.error("Failed to create folder for this request.")
-        else:
-            folder_link = f"https://drive.google.com/drive/folders/{folder_id}"
-
-    return folder_id, folder_link
-
 def cargo(service):
     temp_details = st.session_state.get("temp_details", {})
     transport_type = temp_details.get("transport_type", "")
@@ -516,32 +491,35 @@ def copy_route(index):
         route_to_copy = st.session_state["routes"][index].copy()
         st.session_state["routes"].append(route_to_copy)
 
+def search_select(label, index: SearchIndex, key, value="", fixed_options=("",), limit=SEARCH_LIMIT):
+    # Selectbox con búsqueda en el servidor: si la lista es larga, al navegador solo llegan las
+    # `limit` mejores coincidencias de lo escrito (más el valor ya elegido), no la lista completa
+    fixed_options = list(fixed_options)
+    if len(index) <= limit:
+        options = fixed_options + [item for item in index.items if item not in fixed_options]
+        return st.selectbox(label, options, key=key, index=options.index(value) if value in options else 0)
+
+    query = st.text_input(label, key=f"{key}_query", placeholder="Type to search...")
+    matches = index.search(query, limit) if query else []
+    options = fixed_options + [item for item in matches if item not in fixed_options]
+    if value in index and value not in options:
+        options.insert(len(fixed_options), value)
+    return st.selectbox(label, options, key=key, index=options.index(value) if value in options else 0,
+                        label_visibility="collapsed")
+
 def handle_routes(transport_type):
     initialize_routes()
     
-    if transport_type == "Air":
-        if "cities_csv" not in st.session_state or st.session_state["cities_csv"] is None:
-            try:
-                st.session_state["cities_csv"] = load_csv("cities_world.csv")
-            except Exception as e:
-                st.error(f"⚠️ Error cargando cities_world.csv: {e}")
-                return
-        csv_data = st.session_state["cities_csv"]
-        csv_data = st.session_state.get("cities_csv", {})
-        route_options = csv_data.get("Country", pd.Series()).dropna().astype(str).unique().tolist()
-
-    elif transport_type == "Maritime":
-        if "ports_csv" not in st.session_state or st.session_state["ports_csv"] is None:
-            try:
-                st.session_state["ports_csv"] = load_csv("output_port_world.csv")
-            except Exception as e:
-                st.error(f"⚠️ Error cargando output_port_world.csv: {e}")
-                return
-        csv_data = st.session_state["ports_csv"]
-        csv_data = st.session_state.get("ports_csv", {})
-        route_options = csv_data.get("country", pd.Series()).dropna().astype(str).unique().tolist()
-    else:
-        route_options = []
+    catalog = None
+    try:
+        if transport_type == "Air":
+            catalog = get_city_catalog()
+        elif transport_type == "Maritime":
+            catalog = get_port_catalog()
+    except Exception as e:
+        st.error(f"⚠️ Error cargando el catálogo de {'ciudades' if transport_type == 'Air' else 'puertos'}: {e}")
+        return
+    route_options = catalog.countries() if catalog else []
 
     for i in range(len(st.session_state["routes"])):
         route = st.session_state["routes"][i]
@@ -555,19 +533,16 @@ def handle_routes(transport_type):
                     "Country of Origin*",
                     options=[""] + route_options,
                     key=f"country_origin_{i}",
-                    index=(route_options.index(route["country_origin"]) + 1) if route["country_origin"] in route_options else 0,
+                    index=option_index(catalog.country_position(route["country_origin"])) if catalog else 0,
                 )
                 st.session_state["routes"][i]["country_origin"] = country_origin
             
             with col2:
-                filtered_ports = csv_data[csv_data["Country"] == country_origin]["City"].dropna().unique().tolist() if transport_type == "Air" and country_origin else []
-                if transport_type == "Maritime" and country_origin:
-                    filtered_ports = csv_data[csv_data["country"] == country_origin]["port name"].dropna().unique().tolist()
-                port_origin = st.selectbox(
+                port_origin = search_select(
                     "Port of Origin*",
-                    options=[""] + filtered_ports,
+                    catalog.search_index(country_origin) if catalog and country_origin else EMPTY_INDEX,
                     key=f"port_origin_{i}",
-                    index=(filtered_ports.index(route["port_origin"]) + 1) if route["port_origin"] in filtered_ports else 0,
+                    value=route["port_origin"],
                 )
                 st.session_state["routes"][i]["port_origin"] = port_origin
         
@@ -578,19 +553,16 @@ def handle_routes(transport_type):
                     "Country of Destination*",
                     options=[""] + route_options,
                     key=f"country_destination_{i}",
-                    index=(route_options.index(route["country_destination"]) + 1) if route["country_destination"] in route_options else 0,
+                    index=option_index(catalog.country_position(route["country_destination"])) if catalog else 0,
                 )
                 st.session_state["routes"][i]["country_destination"] = country_destination
             
             with col2:
-                filtered_ports = csv_data[csv_data["Country"] == country_destination]["City"].dropna().unique().tolist() if transport_type == "Air" and country_destination else []
-                if transport_type == "Maritime" and country_destination:
-                    filtered_ports = csv_data[csv_data["country"] == country_destination]["port name"].dropna().unique().tolist()
-                port_destination = st.selectbox(
+                port_destination = search_select(
                     "Port of Destination*",
-                    options=[""] + filtered_ports,
+                    catalog.search_index(country_destination) if catalog and country_destination else EMPTY_INDEX,
                     key=f"port_destination_{i}",
-                    index=(filtered_ports.index(route["port_destination"]) + 1) if route["port_destination"] in filtered_ports else 0,
+                    value=route["port_destination"],
                 )
                 st.session_state["routes"][i]["port_destination"] = port_destination
             
@@ -730,8 +702,8 @@ def remove_ground_route(index):
 def ground_transport():
     initialize_ground_routes()
     temp_details = st.session_state.get("temp_details", {})
-    data = st.session_state.get("cities_csv", [])
-    countries = data["Country"].dropna().unique().tolist()
+    cities = get_city_catalog()
+    countries = cities.countries()
     routes = [] 
 
     for i, route in enumerate(st.session_state["ground_routes"]):
@@ -741,19 +713,13 @@ def ground_transport():
         with col1:
             country_origin = st.selectbox(
                 f"Country of Origin*", options=[""] + countries, key=f"country_origin_{i}",
-                index=(countries.index(temp_details.get("country_origin", "")) + 1)
-                if temp_details.get("country_origin", "") in countries else 0,
+                index=option_index(cities.country_position(temp_details.get("country_origin", ""))),
             )
 
-        filtered_cities = []
-        if country_origin:
-            filtered_cities = (data[data["Country"] == country_origin]["City"].dropna().unique().tolist())
-
         with col2:
-            city_origin = st.selectbox(
-                f"City of Origin*", options=[""] + filtered_cities, key=f"city_origin_{i}",
-                index=(filtered_cities.index(temp_details.get("city_origin", "")) + 1)
-                if temp_details.get("city_origin", "") in filtered_cities else 0,
+            city_origin = search_select(
+                f"City of Origin*", cities.search_index(country_origin) if country_origin else EMPTY_INDEX,
+                key=f"city_origin_{i}", value=temp_details.get("city_origin", ""),
             )
         with col3:
             pickup_address = st.text_input(
@@ -766,19 +732,13 @@ def ground_transport():
         with col1:
             country_destination = st.selectbox(
                 f"Country of Destination*", options=[""] + countries, key=f"country_destination_{i}",
-                index=(countries.index(temp_details.get("country_destination", "")) + 1)
-                if temp_details.get("country_destination", "") in countries else 0,
+                index=option_index(cities.country_position(temp_details.get("country_destination", ""))),
             )
 
-        filtered_cities_destination = []
-        if country_destination:
-            filtered_cities_destination = (data[data["Country"] == country_destination]["City"].dropna().unique().tolist())
-
         with col2:
-            city_destination = st.selectbox(
-                f"City of Destination*", options=[""] + filtered_cities_destination, key=f"city_destination_{i}",
-                index=(filtered_cities_destination.index(temp_details.get("city_destination", "")) + 1)
-                if temp_details.get("city_destination", "") in filtered_cities_destination else 0,
+            city_destination = search_select(
+                f"City of Destination*", cities.search_index(country_destination) if country_destination else EMPTY_INDEX,
+                key=f"city_destination_{i}", value=temp_details.get("city_destination", ""),
             )
 
         with col3:
@@ -908,21 +868,19 @@ def lcl_questions(transport_type):
 
 def customs_questions(service, customs=False):
     temp_details = st.session_state.get("temp_details", {})
-    data = st.session_state.get("cities_csv", [])
-    countries = data["Country"].dropna().unique().tolist()
+    cities = get_city_catalog()
+    countries = cities.countries()
     customs_data = {}
     if not customs:
         col1, col2 = st.columns(2)
         with col1:
             country_origin = st.selectbox("Country of Origin*", options=[""] + countries, key="country_origin",
-                index=(countries.index(temp_details.get("country_origin", "")) + 1)
-                if temp_details.get("country_origin", "") in countries else 0,
+                index=option_index(cities.country_position(temp_details.get("country_origin", ""))),
             )
         with col2:
             country_destination = st.selectbox(
             "Country of Destination", options=[""] + countries, key="country_destination",
-            index=(countries.index(temp_details.get("country_destination", "")) + 1)
-            if temp_details.get("country_destination", "") in countries else 0,
+            index=option_index(cities.country_position(temp_details.get("country_destination", ""))),
         )
         commodity = st.text_input("Commodity*", key="commodity", value=temp_details.get("commodity", ""))
         hs_code = st.text_input("HS Code*", key="hs_code", value=temp_details.get("hs_code", ""))
@@ -1191,7 +1149,7 @@ def handle_add_service():
         st.error("Selecciona un servicio válido antes de continuar.")
         return
 
-    services = st.session_state.get("services", [])
+    cart = get_service_cart()
     edit_index = st.session_state.get("edit_index")
 
     temp_details = clean_service_data(temp_details)
@@ -1202,21 +1160,14 @@ def handle_add_service():
             st.error(error)
         return
 
-    if edit_index is not None and 0 <= edit_index < len(services):
-        st.session_state["services"][edit_index] = {
-            "service": service,
-            "details": temp_details
-        }
+    if edit_index is not None and 0 <= edit_index < len(cart):
+        cart.replace(edit_index, service, temp_details)
         st.success("Servicio succesfully edited.")
         del st.session_state["edit_index"]
     else:
-        st.session_state["services"].append({
-            "service": service,
-            "details": temp_details
-        })
+        cart.add(service, temp_details)
         st.success("Service succesfully added.")
 
-    save_services(st.session_state["services"])
     st.session_state["temp_details"] = {}
     change_page("requested_services")
 
@@ -1224,7 +1175,7 @@ def change_page(new_page):
     st.session_state["page"] = new_page
 
 def _clean(s: str) -> str:
-    return re.sub(r'\s+', ' ', unidecode.unidecode(str(s).strip())).lower()
+    return normalize(s)
 
 def _extract_country(route: str, which: str) -> str:
     if not isinstance(route, str):
@@ -1245,7 +1196,7 @@ def _extract_country(route: str, which: str) -> str:
 
     return _clean(m.group(1)) if m else ""
 
-def save_to_google_sheets(df: pd.DataFrame, sheet_id: str, max_attempts: int = 5):
+def save_to_google_sheets(df: pd.DataFrame, sheet_id: str, max_attempts: int = 5, batch=None):
 
     has_pickup   = df["pickup_address"].notna()   & df["pickup_address"].astype(str).str.strip().ne("")
     has_delivery = df["delivery_address"].notna() & df["delivery_address"].astype(str).str.strip().ne("")
@@ -1262,74 +1213,44 @@ def save_to_google_sheets(df: pd.DataFrame, sheet_id: str, max_attempts: int = 5
     contains_ground_srv = temp_service.str.contains(r"\bGround Transportation\b", case=False, na=False).any()
     multiple_services   = temp_service.str.contains(",", na=False).any()
 
-    attempts = 0
-    while attempts < max_attempts:
-        try:
-            if contains_ground_srv:
-                save_data_to_google_sheets(df, sheet_id, "Ground Quotations") #cambiar a Ground Quotations
-                if multiple_services:                   
-                    save_data_to_google_sheets(df, sheet_id, "All Quotes") #cambiar a All Quotes
-
-            elif route_ok:
-                save_data_to_google_sheets(df, sheet_id, "Ground Quotations") #cambiar a Ground Quotations
-                save_data_to_google_sheets(df, sheet_id, "All Quotes") #cambiar a All Quotes
-
-            else:
-                save_data_to_google_sheets(df, sheet_id, "All Quotes") #cambiar a All Quotes
-
-            return 
-
-        except Exception as e:
-            attempts += 1
-            st.error(f"Intento {attempts}/{max_attempts}: Error al guardar en Google Sheets: {e}")
-            if attempts == max_attempts:
-                st.error("Se alcanzó el máximo de intentos. No se pudo guardar la cotización.")
-                raise
-
-def save_data_to_google_sheets(dataframe, sheet_id, sheet_name, max_attempts=5):
-    attempts = 0
-    while attempts < max_attempts:
-        try:
-            sheet = client_gcp.open_by_key(sheet_id)
-
-            try:
-                worksheet = sheet.worksheet(sheet_name)
-                if worksheet.row_count == 0:
-                    worksheet.append_row([col.upper() for col in dataframe.columns])
-
-            except gspread.exceptions.WorksheetNotFound:
-                worksheet = sheet.add_worksheet(title=sheet_name, rows="10000", cols="50")
-                worksheet.append_row([col.upper() for col in dataframe.columns])
+    if contains_ground_srv:
+        sheet_names = ["Ground Quotations", "All Quotes"] if multiple_services else ["Ground Quotations"]
+    elif route_ok:
+        sheet_names = ["Ground Quotations", "All Quotes"]
+    else:
+        sheet_names = ["All Quotes"]
 
-            dataframe.columns = dataframe.columns.str.upper()
-            new_data = dataframe.fillna("").values.tolist()
-            worksheet.append_rows(new_data, table_range="A2")
+    own_batch = batch is None
+    if own_batch:
+        batch = new_write_batch(max_attempts)
+    for sheet_name in sheet_names:
+        add_dataframe_to_batch(batch, df, sheet_id, sheet_name)
+    if own_batch:
+        batch.flush()
 
-            return
+def add_dataframe_to_batch(batch, dataframe, sheet_id, sheet_name):
+    headers = [str(col).upper() for col in dataframe.columns]
+    batch.add(sheet_id, sheet_name, dataframe.fillna("").values.tolist(), headers=headers, new_sheet_rows=10000)
 
-        except Exception as e:
-            attempts += 1
-            st.error(f"Intento {attempts}/{max_attempts}: Error al guardar en Google Sheets ({sheet_name}): {e}")
-            if attempts == max_attempts:
-                st.error(f"Se alcanzó el máximo de intentos. No se pudo guardar la cotización en {sheet_name}.")
-                raise e
+def new_write_batch(max_attempts=5):
+    return SheetWriteBatch(get_clients().sheets, max_attempts=max_attempts)
 
 def validate_shared_drive_folder(parent_folder_id):
     try:
-        folder = drive_service.files().get(
+        folder = get_clients().drive.files().get(
             fileId=parent_folder_id,
             fields='id',
             supportsAllDrives=True
         ).execute()
         return folder is not None
     except Exception as e:
-        st.error(f"Parent folder not found or inaccessible: {e}")
+        print(f"⚠️ La carpeta principal de Drive no existe o no es accesible: {e}")
         return False
 
 def get_folder_id(folder_name, parent_folder_id):
     try:
         query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder' and '{parent_folder_id}' in parents and trashed = false"
-        response = drive_service.files().list(
+        response = get_clients().drive.files().list(
             q=query,
             spaces='drive',
             fields='files(id, name)',
@@ -1340,13 +1261,13 @@ def get_folder_id(folder_name, parent_folder_id):
             return files[0]['id']
         return None
     except Exception as e:
-        st.error(f"Failed to search for folder: {e}")
+        print(f"⚠️ Error buscando la carpeta '{folder_name}' en Drive: {e}")
         return None
 
 def create_folder(folder_name, parent_folder_id):
     existing_folder_id = get_folder_id(folder_name, parent_folder_id)
     if existing_folder_id:
-        st.info(f"Folder '{folder_name}' already exists with ID: {existing_folder_id}")
+        print(f"📁 La carpeta '{folder_name}' ya existe en Drive: {existing_folder_id}")
         return existing_folder_id
 
     try:
@@ -1355,7 +1276,7 @@ def create_folder(folder_name, parent_folder_id):
             'mimeType': 'application/vnd.google-apps.folder',
             'parents': [parent_folder_id]
         }
-        folder = drive_service.files().create(
+        folder = get_clients().drive.files().create(
             body=file_metadata,
             fields='id',
             supportsAllDrives=True
@@ -1366,51 +1287,28 @@ def create_folder(folder_name, parent_folder_id):
         return folder_id
     
     except Exception as e:
-        st.error(f"Failed to create folder: {e}")
-        return None, None
+        print(f"⚠️ No se pudo crear la carpeta '{folder_name}' en Drive: {e}")
+        return None
 
-def log_time(start_time, end_time, duration, request_id, quotation_type):
+def log_time(start_time, end_time, duration, request_id, quotation_type, batch=None):
     sheet_name = "Duration Time Quotation" #CAMBIAR A Duration Time Quotation
-    try:
-        sheet = client_gcp.open_by_key(time_sheet_id)
-        try:
-            worksheet = sheet.worksheet(sheet_name)
-            start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
-            end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
-            worksheet.append_row([request_id, quotation_type, start_time_str, end_time_str, duration])
-        
-        except gspread.exceptions.WorksheetNotFound:
-            worksheet = sheet.add_worksheet(title=sheet_name, rows="1000", cols="20")
-            worksheet.append_row(["request_id", "quotation_type", "Start Time", "End Time", "Duration (seconds)"])
-            start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
-            end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
-            worksheet.append_row([request_id, quotation_type, start_time_str, end_time_str, duration])
+    headers = ["request_id", "quotation_type", "Start Time", "End Time", "Duration (seconds)"]
+    start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
+    end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
+    row = [request_id, quotation_type, start_time_str, end_time_str, duration]
+
+    if batch is not None:
+        batch.add(time_sheet_id, sheet_name, [row], headers=headers)
+        return
 
+    try:
+        batch = new_write_batch(max_attempts=1)
+        batch.add(time_sheet_id, sheet_name, [row], headers=headers)
+        batch.flush()
     except Exception as e:
         st.error(f"Failed to save data to Google Sheets: {e}")
 
-def load_services():
-    if os.path.exists(SERVICES_FILE):
-        with open(SERVICES_FILE, "r") as file:
-            return json.load(file)
-    return []
-
-def save_services(services):
-    with open(SERVICES_FILE, "w") as file:
-        json.dump(services, file, indent=4)
-
-def reset_json():
-    if os.path.exists(SERVICES_FILE):
-        os.remove(SERVICES_FILE)
-    with open(SERVICES_FILE, "w") as file:
-        json.dump([], file)
-
-if not os.path.exists(TEMP_DIR):
-    os.makedirs(TEMP_DIR)
-
-def handle_file_uploads(file_uploader_key, label="Attach Files*", temp_dir=TEMP_DIR):
-    os.makedirs(temp_dir, exist_ok=True)
-
+def handle_file_uploads(file_uploader_key, label="Attach Files*"):
     if file_uploader_key not in st.session_state:
         st.session_state[file_uploader_key] = {}
 
@@ -1419,7 +1317,7 @@ def handle_file_uploads(file_uploader_key, label="Attach Files*", temp_dir=TEMP_
     if uploaded_files:
         for uploaded_file in uploaded_files:
             if uploaded_file.name not in st.session_state[file_uploader_key]:
-                file_path = save_file_locally(uploaded_file, temp_dir=temp_dir)
+                file_path = save_file_locally(uploaded_file)
                 if file_path:
                     st.session_state[file_uploader_key][uploaded_file.name] = file_path
 
@@ -1436,51 +1334,18 @@ def handle_file_uploads(file_uploader_key, label="Attach Files*", temp_dir=TEMP_
 
     return list(st.session_state[file_uploader_key].values())
 
-def upload_all_files_to_google_drive(folder_id, drive_service):
-    files_uploaded = False
+def new_drive_service():
+    # El servicio compartido va sobre la sesión de requests con pool de conexiones (no httplib2),
+    # así que todos los hilos de subida pueden usar el mismo
+    return get_clients().drive
 
-    try:
-        file_list = drive_service.files().list(
-            q=f"'{folder_id}' in parents",
-            fields="files(name)"
-        ).execute()
-        existing_files = {file['name'] for file in file_list.get('files', [])}
-
-        for root, _, files in os.walk(TEMP_DIR):
-            for file_name in files:
-                file_path = os.path.join(root, file_name)
-
-                if file_name not in existing_files:
-                    with open(file_path, "rb") as file:
-                        file_metadata = {'name': file_name, 'parents': [folder_id]}
-                        media = MediaFileUpload(file_path, resumable=True)
-
-                        drive_service.files().create(
-                            body=file_metadata,
-                            media_body=media,
-                            fields='id',
-                            supportsAllDrives=True
-                        ).execute()
-
-                        files_uploaded = True 
-
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        st.error(f"Error al eliminar {file_name}: {e}")
-                else:
-                    st.warning(f"El archivo {file_name} ya existe en Google Drive. No se subirá de nuevo.")
-
-    except Exception as e:
-        st.error(f"Ocurrió un error al subir los archivos: {e}")
-
-    return files_uploaded
-
-def load_existing_ids_from_sheets():
+def load_existing_ids_from_sheets(max_attempts=5):
+    # Los 429 y 5xx ya se reintentan con backoff en el transporte; aquí solo se reintenta
+    # lo demás, esperando entre intentos. Si la hoja o la pestaña no existen no tiene sentido insistir
     sheet_name = "Duration Time Quotation" 
-    while True: 
+    for attempt in range(max_attempts):
         try:
-            sheet = client_gcp.open_by_key(time_sheet_id)
+            sheet = get_clients().gspread.open_by_key(time_sheet_id)
 
             worksheet_list = [ws.title for ws in sheet.worksheets()]
             if sheet_name not in worksheet_list:
@@ -1491,35 +1356,43 @@ def load_existing_ids_from_sheets():
             return set(existing_ids[1:]) 
 
         except gspread.exceptions.SpreadsheetNotFound:
-            st.error("The spreadsheet with the provided ID was not found. Retrying...")
+            st.error("The spreadsheet with the provided ID was not found.")
+            break
 
         except gspread.exceptions.WorksheetNotFound:
-            st.error(f"The worksheet '{sheet_name}' was not found in the spreadsheet. Retrying...")
+            st.error(f"The worksheet '{sheet_name}' was not found in the spreadsheet.")
+            break
 
         except Exception as e:
             st.error(f"Error while loading IDs from Google Sheets: {e}. Retrying...")
+            if attempt + 1 < max_attempts:
+                quota_limiter.backoff("sheets_read", attempt)
 
-@st.cache_data(ttl=3600)
-def load_clients():
-    sheet_name = "clientes"
-    try:
-        sheet = client_gcp.open_by_key(time_sheet_id)
-        worksheet_list = [ws.title for ws in sheet.worksheets()]
-        if sheet_name not in worksheet_list:
-            return []
-        worksheet = sheet.worksheet(sheet_name)
-        clientes = worksheet.col_values(1)
-
-        return clientes[1:]
-
-    except gspread.exceptions.SpreadsheetNotFound:
-        st.error("No se encontró la hoja de cálculo con el ID proporcionado.")
-    except gspread.exceptions.WorksheetNotFound:
-        st.error(f"No se encontró la pestaña '{sheet_name}' en la hoja de cálculo.")
-    except Exception as e:
-        st.error(f"Error al cargar los clientes desde Google Sheets: {e}")
+    raise RuntimeError("No se pudieron cargar los IDs existentes desde Google Sheets.")
+
+def max_existing_request_id():
+    sequence_ids = [
+        int(id[1:]) for id in load_existing_ids_from_sheets()
+        if id.startswith('Q') and id[1:].isdigit()
+    ]
+    return max(sequence_ids) if sequence_ids else 0
 
-    return []
+@st.cache_resource
+def get_id_allocator():
+    if st.secrets["general"].get("id_backend", "sheet") == "sqlite":
+        backend = SqliteCounterBackend()
+    else:
+        backend = SheetReservationBackend("time_sheet_id")
+    return IdAllocator(backend, name="quotation", seed=max_existing_request_id)
+
+def generate_request_id():
+    if "generated_ids" not in st.session_state:
+        st.session_state["generated_ids"] = set()
+
+    unique_id = f"Q{get_id_allocator().next_id():04d}"
+
+    st.session_state["generated_ids"].add(unique_id)
+    return unique_id
 
 def go_back():
     navigation_flow = [
@@ -1535,17 +1408,16 @@ def go_back():
         if current_index > 0: 
             st.session_state["page"] = navigation_flow[current_index - 1]
 
-def load_shared_values_from_services():
-    services = load_services()
+def _shared_values(services):
     shared_values = {}
 
     priority_fields = ["country_origin", "country_destination"]
     field_values = {field: None for field in priority_fields}
 
     for service in services:
-        details = service.get("details", {})
+        details = service.details
 
-        if service["service"] == "International Freight" and "routes" in details:
+        if service.service == "International Freight" and "routes" in details:
             routes = details["routes"]
             if routes and len(routes) > 0:
                 if not field_values["country_origin"]:
@@ -1553,7 +1425,7 @@ def load_shared_values_from_services():
                 if not field_values["country_destination"]:
                     field_values["country_destination"] = routes[0].get("country_destination", "")
 
-        if service["service"] in ["Ground Transportation", "Customs Brokerage"]:
+        if service.service in ["Ground Transportation", "Customs Brokerage"]:
             for field in priority_fields:
                 if field_values[field] is None and details.get(field) not in [None, ""]:
                     field_values[field] = details[field]
@@ -1569,6 +1441,10 @@ def load_shared_values_from_services():
 
     return shared_values
 
+def load_shared_values_from_services():
+    # Se calcula una vez por cambio del carrito, no en cada rerun
+    return get_service_cart().derived("shared_values", _shared_values)
+
 def prefill_temp_details():
     shared_values = load_shared_values_from_services()
     temp_details = st.session_state.get("temp_details", {})
@@ -1577,11 +1453,10 @@ def prefill_temp_details():
         if key not in temp_details or not temp_details[key]:  
             temp_details[key] = value
 
-    services = load_services()
-    for service in services:
-        details = service.get("details", {})
+    for service in get_service_cart():
+        details = service.details
 
-        if service["service"] == "International Freight" and "routes" in details:
+        if service.service == "International Freight" and "routes" in details:
             routes = details["routes"]
             if routes and len(routes) > 0:
                 freight_country_origin = routes[0].get("country_origin", "")
@@ -4,41 +4,21 @@ import pandas as pd
 import streamlit as st
 import numpy as np
 from src.services.cotizacion import *
-from src.services.utils import load_existing_ids_from_sheets, log_time
+from src.services.utils import generate_request_id, log_time, new_write_batch
 import pytz
 from datetime import datetime
 import datetime as dt
-from src.services.utils import load_clients
-from src.common.google_sheets import (
-    open_spreadsheet,
-    get_or_create_worksheet,
-    load_all_records,
-)
-from src.common.config import SHEETS
+from src.services.utils import search_select
+from src.services.client_directory import DirectoryUnavailable, get_client_directory
+from src.services.contracts_index import load_contracts_index
+from src.services.contract_cards import prepare_contract_cards
+from src.services.prices import INCLUIDO, NUMERIC
 
 tz = pytz.timezone('America/Bogota')
 
 if "client" not in st.session_state:
     st.session_state["client"] = None
 
-if "clients_list" not in st.session_state:
-    st.session_state["clients_list"] = []
-
-def get_valid_value(primary, fallback):
-    if pd.notna(primary) and str(primary).strip(): 
-        return primary
-    elif pd.notna(fallback) and str(fallback).strip():
-        return fallback
-    else:
-        return "" 
-
-def parse_price(value):
-    if isinstance(value, str) and value.strip().upper() == "INCLUIDO":
-        return "INCLUIDO"
-    try:
-        return float(value.replace('$', '').replace('.', '').replace(',', '.'))
-    except ValueError:
-        return value 
 
 def validate_inputs(client, cargo_types, incoterm, cargo_value, selected_surcharges, surcharge_values):
     errors = []
@@ -61,30 +41,7 @@ def validate_inputs(client, cargo_types, incoterm, cargo_value, selected_surchar
 
     return errors
 
-def generate_request_id():
-    if "generated_ids" not in st.session_state:
-        st.session_state["generated_ids"] = set()
-
-    existing_ids = load_existing_ids_from_sheets()
-    new_sequence_ids = [
-        int(id[1:]) for id in existing_ids 
-        if id.startswith('Q') and id[1:].isdigit()
-    ]
-
-    if new_sequence_ids:
-        next_id = max(new_sequence_ids) + 1
-    else:
-        next_id = 1 
-
-    unique_id = f"Q{next_id:04d}"
-
-    st.session_state["generated_ids"].add(unique_id)
-    return unique_id
-
-
-def save_to_google_sheets(data, start_time):
-    
-    ss = open_spreadsheet("costs_sales_contracts")
+def save_to_google_sheets(data, start_time, batch):
     headers = [
         "REQUEST_ID","COMMERCIAL","TIME","CLIENT","CUSTOMER_NAME","INCOTERM",
         "VALIDITY","POL","POD","COMMODITY","CONTRATO_ID",
@@ -92,7 +49,6 @@ def save_to_google_sheets(data, start_time):
         "ADDITIONAL_SURCHARGES (Costos)","ADDITIONAL_SURCHARGES (Ventas)",
         "TOTAL_COST","TOTAL_SALE","TOTAL_PROFIT"
     ]
-    ws = get_or_create_worksheet(ss, "CONTRATOS", headers=headers)
 
     total_cost = total_sale = 0
     costs, sales = [], []
@@ -125,22 +81,20 @@ def save_to_google_sheets(data, start_time):
         "\n".join(additional_costs), "\n".join(additional_sales),
         f"${total_cost:.2f}", f"${total_sale:.2f}", f"${data['total_profit']:.2f}"
     ]
-    ws.append_row(row)
-    log_time(start_time, end_time, duration, data['request_id'], quotation_type="Contracts")
+    batch.add(st.secrets["general"]["costs_sales_contracts"], "CONTRATOS", [row], headers=headers)
+    log_time(start_time, end_time, duration, data['request_id'], quotation_type="Contracts", batch=batch)
 
 incoterm_op = ['CIF', 'CFR', 'FOB', 'CPT', 'DAP']
 
 @st.dialog("Generate Quotation", width="large")
-def select_options(role, contrato_id, available_cargo_types, tabla_pivot):
+def select_options(role, contrato_id, available_cargo_types, costos, estados):
     if role in ["commercial", "admin"]:
 
-        if "clients_list" not in st.session_state or not st.session_state["clients_list"]:
-            try:
-                client_data = load_clients()
-                st.session_state["clients_list"] = client_data if client_data else []
-            except Exception as e:
-                st.error(f"Error al cargar la lista de clientes: {e}")
-                st.session_state["clients_list"] = []
+        clients = get_client_directory()
+        try:
+            clients.load()
+        except Exception as e:
+            st.error(f"Error al cargar la lista de clientes: {e}")
 
         if st.session_state.get("start_time") is None:
             st.session_state["start_time"] = datetime.now(tz)
@@ -154,11 +108,10 @@ def select_options(role, contrato_id, available_cargo_types, tabla_pivot):
         with col2:
             validity = st.date_input('Quotation Validity', value="today", format="YYYY/MM/DD", key=f'validity_{contrato_id}')
 
-        clients_list = st.session_state.get("clients_list", [])
-
         col1, col2 = st.columns(2)
         with col1:
-            client = st.selectbox("Who is your client?*", [" "] + ["+ Add New"] + clients_list, key=f'client_{contrato_id}')
+            client = search_select("Who is your client?*", clients.search_index(), key=f'client_{contrato_id}',
+                                   value=st.session_state.get(f'client_{contrato_id}', " "), fixed_options=(" ", "+ Add New"))
 
             new_client_saved = st.session_state.get("new_client_saved", False)
 
@@ -167,22 +120,42 @@ def select_options(role, contrato_id, available_cargo_types, tabla_pivot):
                 new_client_name = st.text_input("Enter the client's name:", key=f"new_client_name_{contrato_id}")
 
                 if st.button("Save Client"):
-                    if new_client_name:
-                        if new_client_name not in st.session_state["clients_list"]:
-                            st.session_state["client"] = new_client_name
-                            st.session_state["new_client_saved"] = True
-                            client = new_client_name
-                            st.success(f"✅ Client '{new_client_name}' saved!")
-                        else:
-                            st.warning(f"⚠️ Client '{new_client_name}' already exists in the list.")
-                    else:
+                    if not new_client_name:
                         st.error("⚠️ Please enter a valid client name.")
+                    elif not clients.loaded:
+                        st.error("⚠️ The client list could not be loaded, so new clients can't be added right now. Please try again in a moment.")
+                    elif new_client_name not in clients:
+                        st.session_state["client"] = new_client_name
+                        st.session_state["new_client_saved"] = True
+                        client = new_client_name
+                        st.success(f"✅ Client '{new_client_name}' saved!")
+                    else:
+                        st.warning(f"⚠️ Client '{new_client_name}' already exists in the list.")
             else:
                 st.session_state["client"] = client
         
         with col2:
             customer_name = st.text_input("Enter the customer name:", key=f"customer_name_{contrato_id}")
 
+        # Misma cotización para otros clientes: cada uno recibe su propio request_id. Se buscan
+        # con search_select y en la sesión solo quedan los elegidos, no la lista de clientes
+        picks = st.session_state.setdefault(f"extra_clients_{contrato_id}", [])
+        pick = search_select("Also quote to other clients", clients.search_index(), key=f"extra_client_pick_{contrato_id}",
+                             value=" ", fixed_options=(" ",))
+        if pick.strip() and pick != client and pick not in picks:
+            st.button(f"Add {pick}", key=f"add_extra_client_{contrato_id}", on_click=picks.append, args=(pick,))
+        for extra_client in picks:
+            col1, col2 = st.columns([0.85, 0.15])
+            col1.write(extra_client)
+            col2.button("Remove", key=f"remove_extra_client_{contrato_id}_{extra_client}", on_click=picks.remove, args=(extra_client,))
+        extra_clients = [c for c in picks if c != client]
+        export_format = "zip"
+        if extra_clients:
+            export_format = st.radio(
+                "Download as", ["zip", "pdf"], horizontal=True, key=f'export_format_{contrato_id}',
+                format_func=lambda f: "ZIP (one PDF per client)" if f == "zip" else "Single merged PDF"
+            )
+
         cargo_types = st.multiselect('Select Cargo Type', available_cargo_types, key=f'cargo_{contrato_id}')
 
         cargo_value = 0.0
@@ -207,9 +180,8 @@ def select_options(role, contrato_id, available_cargo_types, tabla_pivot):
             st.warning('Please select a container to continue')
             return
 
-        available_surcharges = [s for s in tabla_pivot.index if s in ["Origin", "Freight", "Destination", "Hbl", "Switch"]]
+        available_surcharges = [s for s in costos.index if s in ["Origin", "Freight", "Destination", "Hbl", "Switch"]]
         selected_surcharges = st.multiselect('Select Surcharges', available_surcharges, key=f'surcharges_{contrato_id}')
-        tabla_pivot = tabla_pivot.map(parse_price)
 
         surcharge_values = {surcharge: {} for surcharge in selected_surcharges}
 
@@ -223,16 +195,15 @@ def select_options(role, contrato_id, available_cargo_types, tabla_pivot):
 
             for idx, cont in enumerate(cargo_types):
                 with cols[idx * 2]:
-                    if surcharge in tabla_pivot.index and cont in tabla_pivot.columns:
-                        cost_value = tabla_pivot.at[surcharge, cont]
-                        try:
-                            if isinstance(cost_value, str) and cost_value.upper() == "INCLUIDO":
-                                cost_display = "INCLUIDO"
-                                cost_value = 0.0
-                            else:
-                                cost_value = float(cost_value)
-                                cost_display = f"${cost_value:.2f}"
-                        except (KeyError, ValueError):
+                    if surcharge in costos.index and cont in costos.columns:
+                        estado = estados.at[surcharge, cont]
+                        if estado == INCLUIDO:
+                            cost_display = "INCLUIDO"
+                            cost_value = 0.0
+                        elif estado == NUMERIC:
+                            cost_value = float(costos.at[surcharge, cont])
+                            cost_display = f"${cost_value:.2f}"
+                        else:
                             cost_display = "Not Available"
                             cost_value = 0.0
                     else:
@@ -340,26 +311,52 @@ def select_options(role, contrato_id, available_cargo_types, tabla_pivot):
             }
             #st.write(quotation_data)
 
-            save_to_google_sheets(quotation_data, start_time)
+            batch_quotations = [
+                {**quotation_data, "client": extra_client, "request_id": generate_request_id()}
+                for extra_client in extra_clients
+            ]
 
-            st.success("Information succesfully saved!")
+            # CONTRATOS, el tiempo de duración y el cliente nuevo se envían en un solo lote
+            batch = new_write_batch()
+            for data in [quotation_data] + batch_quotations:
+                save_to_google_sheets(data, start_time, batch)
 
             client_normalized = st.session_state.get("client", client).strip().lower() if client else ""
 
             client_norm = st.session_state.get("client"," ").strip().lower()
-            if client_norm and all(c.lower()!=client_norm for c in st.session_state["clients_list"]):
-                ss_time = open_spreadsheet("time_sheet_id")
-                ws_cl = get_or_create_worksheet(ss_time, "clientes")
-                ws_cl.append_row([client_norm])
-                st.session_state["clients_list"].append(client_norm)
+            try:
+                new_client = client_norm and client_norm not in clients
+            except DirectoryUnavailable as e:
+                st.error(f"⚠️ {e}")
+                return
+            if new_client:
+                batch.add(st.secrets["general"]["time_sheet_id"], "clientes", [[client_norm]])
+
+            try:
+                api_calls = batch.flush()
+            except Exception as e:
+                st.error(f"Could not save the quotation to Google Sheets: {e}")
+                return
+            print(f"📊 Quotation {quotation_data['request_id']}: {api_calls} llamadas a la API de Sheets")
+            st.success("Information succesfully saved!")
+
+            if new_client:
+                clients.add(client_norm)
                 st.session_state["client"] = None
-                load_clients.clear()
                 st.rerun()
 
-            pdf_filename = generate_quotation(quotation_data)
+            if batch_quotations:
+                export = export_quotations([quotation_data] + batch_quotations, export_format)
+                with export:
+                    st.download_button(
+                        label=f"Download {len(batch_quotations) + 1} Quotations",
+                        data=export,
+                        file_name=f"quotations.{export_format}",
+                        mime="application/zip" if export_format == "zip" else "application/pdf"
+                    )
+                return
 
-            with open(pdf_filename, "rb") as f:
-                pdf_bytes = f.read()
+            pdf_bytes = generate_quotation(quotation_data)
 
             st.download_button(
                 label="Download Quotation",
@@ -372,30 +369,7 @@ def select_options(role, contrato_id, available_cargo_types, tabla_pivot):
         st.write('sjaafar@tradingsolutions.com')
 
 def show(role):
-    key, sheet = SHEETS["mejoras_q2"]
-    df1 = load_all_records(key, sheet)
-
-    key, sheet = SHEETS["tarifas_scrap_expo"]
-    df2 = load_all_records(key, sheet)
-
-    for df in (df1, df2):
-        df.columns = df.columns.str.strip()
-    contratos_df = df1.copy()
-    tarifas_scrap = df2.copy()
-
-    contratos_df["POL"] = contratos_df["POL"].astype(str)
-    contratos_df["POD"] = contratos_df["POD"].astype(str)
-    tarifas_scrap["POL"] = tarifas_scrap["POL"].astype(str)
-    tarifas_scrap["POD"] = tarifas_scrap["POD"].astype(str)
-
-    contratos_df['FECHA FIN FLETE'] = contratos_df['FECHA FIN FLETE'].str.strip() 
-    contratos_df['FECHA FIN FLETE'] = pd.to_datetime(contratos_df['FECHA FIN FLETE'], format='%d/%m/%Y', errors='coerce')
-    tarifas_scrap['FECHA FIN FLETE'] = pd.to_datetime(tarifas_scrap['FECHA FIN FLETE'], format='%d/%m/%Y', errors='coerce')
-
-    common_columns = list(set(contratos_df.columns) & set(tarifas_scrap.columns))
-
-    merged_df = pd.merge(contratos_df, tarifas_scrap, on=common_columns, how="outer")
-    commodity = merged_df['COMMODITIES'].dropna().unique()
+    contracts_index = load_contracts_index()
 
     st.header("Contracts Management")
 
@@ -407,7 +381,7 @@ def show(role):
     if "tipo_cont"  not in st.session_state: st.session_state.tipo_cont = []
 
     with col1:
-            opciones_origen = merged_df["POL"].unique().tolist()
+            opciones_origen = contracts_index.pols()
             opciones_origen.insert(0, "") 
             st.selectbox(
                 "**Port of Origin**",
@@ -418,7 +392,7 @@ def show(role):
 
     with col2:
         if st.session_state.get("p_origen"):
-            opciones_destino = merged_df[merged_df["POL"] == st.session_state.p_origen]["POD"].unique().tolist()
+            opciones_destino = contracts_index.pods(st.session_state.p_origen)
             opciones_destino.insert(0, "") 
 
             st.selectbox(
@@ -432,21 +406,18 @@ def show(role):
 
     with col1:
         if st.session_state.get("p_origen") and st.session_state.get("p_destino"):
-            filtered_commodities = merged_df[
-                (merged_df["POL"] == st.session_state.p_origen) & 
-                (merged_df["POD"] == st.session_state.p_destino)
-            ]["COMMODITIES"].dropna().unique()
+            filtered_commodities = contracts_index.commodities(st.session_state.p_origen, st.session_state.p_destino)
 
             st.session_state.commodity_contracts = st.multiselect("**Select Commodities**", 
             options=filtered_commodities, 
             default=list(filtered_commodities))
     with col2:
         if st.session_state.get("p_origen") and st.session_state.get("p_destino"):
-            filtered_cont = merged_df[
-                (merged_df["POL"] == st.session_state.p_origen) & 
-                (merged_df["POD"] == st.session_state.p_destino) &
-                (merged_df["COMMODITIES"].isin(st.session_state.commodity_contracts))
-            ]["TIPO CONT"].dropna().unique()
+            filtered_cont = contracts_index.container_types(
+                st.session_state.p_origen,
+                st.session_state.p_destino,
+                st.session_state.commodity_contracts
+            )
             st.session_state.tipo_cont = st.multiselect("**Select Container Type**", 
                                             options=filtered_cont, 
                                             default=list(filtered_cont))
@@ -457,41 +428,27 @@ def show(role):
         commodity = st.session_state.commodity_contracts
         tipo_cont = st.session_state.tipo_cont
 
-        contratos = merged_df[(merged_df["POL"] == p_origen) & (merged_df["POD"] == p_destino) & (merged_df["COMMODITIES"].isin(commodity)) & (merged_df["TIPO CONT"].isin(tipo_cont))]
+        contratos = contracts_index.select(p_origen, p_destino, commodity, tipo_cont)
 
         if not contratos.empty:
             hoy = dt.datetime.now()
-            contratos_vigentes = contratos[pd.to_datetime(contratos["FECHA FIN FLETE"]) > hoy]
+            contratos_vigentes = contratos[contratos["FECHA FIN FLETE"] > hoy]
 
             if not contratos_vigentes.empty:
-                contratos_agrupados = contratos_vigentes.groupby(["Línea", "No CONTRATO"])
+                contrato_list = prepare_contract_cards(contratos_vigentes)
                 num_columns = 3
-
-                contrato_list = list(contratos_agrupados) 
                 num_contratos = len(contrato_list)
 
                 for row_start in range(0, num_contratos, num_columns):
                     row_contracts = contrato_list[row_start:row_start + num_columns]  
                     columnas = st.columns(num_columns)
 
-                    for idx, ((linea, contrato_id), contrato_rows) in enumerate(row_contracts):
+                    for idx, card in enumerate(row_contracts):
+                        linea, contrato_id = card["linea"], card["contrato_id"]
                         with columnas[idx]:
                             with st.expander(f"🚢 **{linea} - {str(contrato_id).strip()}**", expanded=True):
-                                contrato_info = contrato_rows.iloc[0]
-                                fields = {
-                                    "Shipping Line": contrato_info.get("Línea", ""),
-                                    "Commodities": contrato_info.get("COMMODITIES", ""),
-                                    "HS Code": contrato_info.get("HS CODES", ""),
-                                    "Shipper": contrato_info.get("SHIPPER", ""),
-                                    "Free Days in Origin": get_valid_value(contrato_info.get("DÍAS ORIGEN", ""), contrato_info.get("FDO", "")),
-                                    "Free Days in Destination": get_valid_value(contrato_info.get("DÍAS DESTINO APROBADOS", ""), contrato_info.get("FDD", "")),
-                                    "Transit Time": contrato_info.get("TT", ""),
-                                    "Route": contrato_info.get("RUTA", ""),
-                                    "Suitable Food": contrato_info.get("APTO ALIMENTO", ""),
-                                    "Valid to": contrato_info.get("FECHA FIN FLETE", "").strftime("%Y-%m-%d") if pd.notnull(contrato_info.get("FECHA FIN FLETE", "")) else "",
-                                    "Registered": contrato_info.get("Estado", ""),
-                                    "Empty Pickup": contrato_info.get("EMPTY PICKUP", ""),
-                                }
+                                contrato_info = card["info"]
+                                fields = card["fields"]
 
                                 col3, col4 = st.columns(2)
                                 index = 0
@@ -521,66 +478,16 @@ def show(role):
                                     if dias_restantes <= 15:
                                         st.warning(f"⚠️ **This contract expires soon: {fecha_fin.date()}**")
 
-                                # 🔹 Generar la tabla de costos
-                                columnas_clave = ["ORIGEN", "FLETE", "DESTINO", "TOTAL FLETE Y ORIGEN", "HBL", "Switch", "TOTAL FLETE, ORIGEN Y DESTINO", "TOTAL FLETE, ORIGEN Y SWITCH O HBL"]
-
-                                traducciones = {
-                                    "ORIGEN": "ORIGIN",
-                                    "FLETE": "FREIGHT",
-                                    "DESTINO": "DESTINATION",
-                                    "TOTAL FLETE Y ORIGEN": "TOTAL FREIGHT AND ORIGIN",
-                                    "HBL": "HBL",
-                                    "Switch": "SWITCH",
-                                    "TOTAL FLETE, ORIGEN Y DESTINO": "TOTAL FREIGHT, ORIGIN AND DESTINATION",
-                                    "TOTAL FLETE, ORIGEN Y SWITCH O HBL": "TOTAL FREIGHT, ORIGIN AND SWITCH OR HBL"
-                                }
-
-                                contrato_rows_validos = contrato_rows.dropna(subset=columnas_clave, how="all")
-
-                                if not contrato_rows_validos.empty:
-                                    tabla_pivot = contrato_rows_validos.pivot_table(
-                                        index=[],
-                                        columns="TIPO CONT",
-                                        values=columnas_clave,
-                                        aggfunc=lambda x: x.iloc[0] if not x.empty else "Pendiente",
-                                        fill_value=pd.NA
-                                    )
-
-                                    if isinstance(tabla_pivot.columns, pd.MultiIndex):
-                                        available_cargo_types = tabla_pivot.columns.get_level_values(1).unique().tolist()
-                                    else:
-                                        available_cargo_types = tabla_pivot.columns.unique().tolist()
-
-                                    tabla_pivot.rename_axis("CONCEPT", inplace=True)
-                                    nuevo_orden =  ["ORIGEN", "FLETE", "TOTAL FLETE Y ORIGEN", "DESTINO", "HBL", "Switch", "TOTAL FLETE, ORIGEN Y DESTINO", "TOTAL FLETE, ORIGEN Y SWITCH O HBL"]
-                                    tabla_pivot = tabla_pivot.reindex(nuevo_orden)
-                                    tabla_pivot.index = tabla_pivot.index.map(lambda x: traducciones.get(x, x))
-                                    tabla_pivot.index = tabla_pivot.index.map(lambda x: x.capitalize() if isinstance(x, str) else x)
-                                    tabla_pivot.dropna(how="all", inplace=True)
-                                    tabla_pivot = tabla_pivot.astype(str)
-
-                                    tabla_pivot = tabla_pivot.loc[
-                                            ~(tabla_pivot
-                                            .apply(lambda x: x.astype(str).str.strip())
-                                            .eq("")
-                                            .all(axis=1))
-                                        ]
-
-                                    tabla_pivot.dropna(axis=1, how="all", inplace=True)
-
+                                # 🔹 Tabla de costos (preparada en bloque para todos los contratos)
+                                tabla_pivot = card["tabla_pivot"]
+                                available_cargo_types = card["available_cargo_types"]
+                                costos, estados = card["costos"], card["estados"]
+                                if tabla_pivot is not None:
                                     st.table(tabla_pivot)
+                                else:
+                                    costos = estados = pd.DataFrame()
 
-                                notas = contrato_info.get("NOTAS", "")
-
-                                def capitalizar_notas(notas):
-                                    lineas = notas.split("\n")
-                                    lineas_transformadas = [
-                                        linea.capitalize() if linea.isupper() else linea
-                                        for linea in lineas
-                                    ]
-                                    return "\n".join(lineas_transformadas)
-
-                                notas_formateadas = capitalizar_notas(notas).replace("\n", "  \n")  
+                                notas_formateadas = card["notas"]
                                 st.markdown(f"**Notes:**  \n{notas_formateadas}")
 
                                 if st.button('Select', key=f"select_{linea}_{contrato_id}"):
@@ -593,7 +500,7 @@ def show(role):
                                         "Details": fields,
                                         "Notes": notas_formateadas
                                     }
-                                    select_options(role, contrato_id, available_cargo_types, tabla_pivot)
+                                    select_options(role, contrato_id, available_cargo_types, costos, estados)
 
                     st.write("\n")
             else:
@@ -1,54 +1,67 @@
 import streamlit as st
 import pandas as pd
-from google.oauth2.service_account import Credentials
-import gspread
 from src.services.utils import *
-from googleapiclient.discovery import build
+from src.services.quotation_jobs import MAX_TRACKED_JOBS, enqueue_quotation, failed_quotations, get_write_queue
+from src.common.write_queue import DONE as JOB_DONE, FAILED as JOB_FAILED, QUEUED, RETRY, RUNNING
+from src.common.clients import get_clients
+from src.services.port_catalog import get_city_catalog, get_port_catalog
+from src.services.client_directory import DirectoryUnavailable, get_client_directory
+from src.services.service_cart import get_service_cart
+import copy
 import pytz
 from datetime import datetime
 import random
 import string
 import os
 
-def show(role):
-
-    sheet_id = st.secrets["general"]["quotations_requested"]
-    DRIVE_ID = st.secrets["general"]["drive_id"]
-    PARENT_FOLDER_ID = st.secrets["general"]["parent_folder"]
-    time_sheet_id = st.secrets["general"]["time_sheet_id"]
-
-    sheets_creds = Credentials.from_service_account_info(
-        st.secrets["google_sheets_credentials"],
-        scopes=[
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ]
-    )
-
-    sheets_service = build('sheets', 'v4', credentials=sheets_creds)
-
-    drive_creds = Credentials.from_service_account_info(
-        st.secrets["google_drive_credentials"],
-        scopes=["https://www.googleapis.com/auth/drive"]
-    )
+JOB_LABELS = {QUEUED: "⏳ Queued", RUNNING: "🔄 Saving", RETRY: "🔁 Retrying", JOB_DONE: "✅ Saved", JOB_FAILED: "❌ Failed"}
+
+@st.fragment(run_every=5)
+def show_submitted_jobs():
+    # Estado de las últimas cotizaciones enviadas a la cola de escrituras
+    queue = get_write_queue()
+    st.markdown("**Submitted quotations**")
+    for request_id in reversed(st.session_state.get("submitted_jobs", [])):
+        job = queue.get(request_id)
+        if job is None:
+            continue
+        status = JOB_LABELS.get(job.status, job.status)
+        upload = job.state.get("upload")
+        if upload and upload["total"] and job.status != JOB_DONE:
+            status += f" · {upload['done']}/{upload['total']} files uploaded"
+        st.caption(f"{request_id}: {status}")
+        if job.status in (RETRY, JOB_FAILED) and job.error:
+            st.caption(job.error)
+
+@st.fragment
+def show_failed_jobs(role):
+    # Las cotizaciones que agotaron sus reintentos quedan en la cola hasta que alguien las
+    # reintente, aunque la sesión que las envió ya no exista
+    queue = get_write_queue()
+    jobs = failed_quotations(queue, None if role == "admin" else st.experimental_user.email)
+    if not jobs:
+        return
+    st.markdown("**Failed quotations**")
+    for job in jobs:
+        st.caption(f"{job.id}: {job.error}")
+        if st.button("Retry", key=f"retry_job_{job.id}"):
+            if queue.requeue(job.id):
+                submitted_jobs = [r for r in st.session_state.get("submitted_jobs", []) if r != job.id] + [job.id]
+                st.session_state["submitted_jobs"] = submitted_jobs[-MAX_TRACKED_JOBS:]
+            st.rerun()
 
-    drive_service = build('drive', 'v3', credentials=drive_creds)
+def show(role):
 
-    client_gcp = gspread.authorize(sheets_creds)
     colombia_timezone = pytz.timezone('America/Bogota')
 
     #--------------------------------------UTILITY FUNCTIONS--------------------------------
-    @st.cache_data(ttl=3600)
     def clear_temp_directory():
-        for root, _, files in os.walk(TEMP_DIR):
-            for file_name in files:
-                os.remove(os.path.join(root, file_name))
+        get_spool_store().clear(current_session_id())
 
     def initialize_state():
         default_values = {
             "page": "client_name",
             "sales_rep": None,
-            "services": [],
             "client": None,
             "client_reference": None,
             "completed": True,
@@ -62,9 +75,6 @@ def show(role):
             "volume_num": "",
             "volume_frequency": "",
             "initialized": True,
-            "ports_csv": None,
-            "cities_csv": None,
-            "clients_list": []
         }
         for key, value in default_values.items():
             if key not in st.session_state:
@@ -72,28 +82,21 @@ def show(role):
 
         st.session_state["request_id"] = None
 
-        reset_json()
         clear_temp_directory()
+        if get_service_cart().recover():
+            st.info(f"Recovered {len(get_service_cart())} service(s) from your previous session.")
 
-        if "ports_csv" not in st.session_state or st.session_state["ports_csv"] is None:
+        # Los catálogos de puertos y ciudades se cargan una vez por proceso y se comparten
+        for load_catalog in (get_port_catalog, get_city_catalog):
             try:
-                st.session_state["ports_csv"] = load_csv("resources/data/output_port_world.csv")
+                load_catalog()
             except Exception as e:
                 st.error("Error loading CSV data. Please check the file path or format.")
 
-        if "cities_csv" not in st.session_state or st.session_state["cities_csv"] is None:
-            try:
-                st.session_state["cities_csv"] = load_csv("resources/data/cities_world.csv")
-            except Exception as e:
-                st.error("Error loading CSV data. Please check the file path or format.")
-
-        if "clients_list" not in st.session_state or not st.session_state["clients_list"]:
-            try:
-                client_data = load_clients()
-                st.session_state["clients_list"] = client_data if client_data else []
-            except Exception as e:
-                st.error(f"Error al cargar la lista de clientes: {e}")
-                st.session_state["clients_list"] = []
+        try:
+            get_client_directory().load()
+        except Exception as e:
+            st.error(f"Error al cargar la lista de clientes: {e}")
 
         if "uploaded_files" not in st.session_state:
             st.session_state.uploaded_files = []
@@ -101,29 +104,14 @@ def show(role):
         if "submitted" not in st.session_state:
             st.session_state["submitted"] = False
 
-    def generate_request_id():
-        if "generated_ids" not in st.session_state:
-            st.session_state["generated_ids"] = set()
-
-        existing_ids = load_existing_ids_from_sheets()
-        new_sequence_ids = [
-            int(id[1:]) for id in existing_ids 
-            if id.startswith('Q') and id[1:].isdigit()
-        ]
-
-        if new_sequence_ids:
-            next_id = max(new_sequence_ids) + 1
-        else:
-            next_id = 1 
-
-        unique_id = f"Q{next_id:04d}"
-
-        st.session_state["generated_ids"].add(unique_id)
-        return unique_id
-
     #------------------------------------APP------------------------------------
     col1, col2, col3 = st.columns([1, 2, 1])
 
+    with st.sidebar:
+        show_failed_jobs(role)
+        if st.session_state.get("submitted_jobs"):
+            show_submitted_jobs()
+
     if "initialized" not in st.session_state or not st.session_state["initialized"]:
         initialize_state()
 
@@ -144,18 +132,14 @@ def show(role):
             sales_rep = st.session_state.get("sales_rep", "-- Sales Representative --")
             #st.subheader(f"Hello, {sales_rep}!")
 
-            if "clients_list" not in st.session_state or not st.session_state["clients_list"]:
-                try:
-                    clients_list = load_clients() 
-                    st.session_state["clients_list"] = clients_list if clients_list else []
-                except Exception as e:
-                    st.error(f"⚠️ Error cargando la lista de clientes desde Google Sheets: {e}")
-                    st.session_state["clients_list"] = []
-
-
-            clients_list = st.session_state.get("clients_list", [])
+            clients = get_client_directory()
+            try:
+                clients.load()
+            except Exception as e:
+                st.error(f"⚠️ Error cargando la lista de clientes desde Google Sheets: {e}")
 
-            client = st.selectbox("Who is your client?*", [" "] + ["+ Add New"] + clients_list, key="client_input")
+            client = search_select("Who is your client?*", clients.search_index(), key="client_input",
+                                   value=st.session_state.get("client_input", " "), fixed_options=(" ", "+ Add New"))
             reference = st.text_input("Client reference", key="reference")
 
             new_client_saved = st.session_state.get("new_client_saved", False)
@@ -165,15 +149,16 @@ def show(role):
                 new_client_name = st.text_input("Enter the client's name:", key="new_client_name")
 
                 if st.button("Save Client"):
-                    if new_client_name:
-                        if new_client_name not in st.session_state["clients_list"]:
-                            st.session_state["client"] = new_client_name
-                            st.session_state["new_client_saved"] = True
-                            st.success(f"✅ Client '{new_client_name}' saved!")
-                        else:
-                            st.warning(f"⚠️ Client '{new_client_name}' already exists in the list.")
-                    else:
+                    if not new_client_name:
                         st.error("⚠️ Please enter a valid client name.")
+                    elif not clients.loaded:
+                        st.error("⚠️ The client list could not be loaded, so new clients can't be added right now. Please try again in a moment.")
+                    elif new_client_name not in clients:
+                        st.session_state["client"] = new_client_name
+                        st.session_state["new_client_saved"] = True
+                        st.success(f"✅ Client '{new_client_name}' saved!")
+                    else:
+                        st.warning(f"⚠️ Client '{new_client_name}' already exists in the list.")
 
             def handle_next_client():
                 selected_client = st.session_state.get("client_input", "").strip()
@@ -343,38 +328,30 @@ def show(role):
 
         elif st.session_state["page"] == "requested_services":
 
-            if st.session_state["services"]:
+            cart = get_service_cart()
+            if len(cart):
                 st.subheader("Requested Services")
-                services = st.session_state["services"]
 
                 def handle_edit(service_index):
                     st.session_state["edit_index"] = service_index
-                    service = services[service_index]
-                    st.session_state["temp_details"] = service["details"].copy()
-                    st.session_state["temp_details"]["service"] = service["service"]
-                    #save_services(updated_services)
+                    service = cart[service_index]
+                    st.session_state["temp_details"] = copy.deepcopy(service.details)
+                    st.session_state["temp_details"]["service"] = service.service
                     change_page("client_data")
 
                 def handle_delete(service_index):
-                    removed_service = st.session_state["services"].pop(service_index)
-                    services_json = load_services()
-
-                    updated_services = [
-                        s for s in services_json
-                        if s["details"] != removed_service["details"] or s["service"] != removed_service["service"]
-                    ]
-                    save_services(updated_services)
+                    cart.remove(service_index)
                     st.success(f"Service {service_index + 1} has been removed!")
-                    if not st.session_state["services"]:
+                    if not len(cart):
                         change_page("client_name")
 
                 def button(service):
                     if service:
                         handle_edit(i)
 
-                for i, service in enumerate(services):
+                for i, service in enumerate(cart):
                     col1, col2, col3 = st.columns([0.8, 0.1, 0.1]) 
-                    service_name = service.get("service", "Unknown Service")
+                    service_name = service.service or "Unknown Service"
 
                     with col1:
                         st.write(f"{i + 1}. {service_name}")
@@ -400,10 +377,8 @@ def show(role):
 
                 with col2:
                     with col2:
-                        if "df_all_quotes" not in st.session_state:
-                            st.session_state["df_all_quotes"] = pd.DataFrame()
-
                         if st.session_state.get("quotation_completed", False):
+                            cart.clear()
                             st.session_state.clear()
                             change_page("select_sales_rep")
                             st.stop()
@@ -418,68 +393,33 @@ def show(role):
 
                             request_id = st.session_state["request_id"]
 
-                            services = load_services()
+                            services = [item.to_dict() for item in cart]
                             if services:
                                 try:
-                                    if "folder_request_id" not in st.session_state:
-                                        st.session_state["folder_request_id"] = None
-
-                                    if "folder_id" not in st.session_state or st.session_state["folder_request_id"] != request_id:
-                                        if st.session_state["folder_request_id"] is None:
-                                            folder_id, folder_link = folder(request_id)
-                                            st.session_state["folder_id"] = folder_id
-                                            st.session_state["folder_link"] = folder_link
-                                            st.session_state["folder_request_id"] = request_id
-
-                                            st.session_state["end_time"] = datetime.now(colombia_timezone)
-                                            end_time = st.session_state.get("end_time", None)
-                                            if end_time is not None:
-                                                end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
-                                            else:
-                                                st.error("Error: 'end_time' no fue asignado correctamente.")
-                                                return
-
-                                            # ✅ Asegurar que 'start_time' existe antes de calcular la duración
-                                            start_time = st.session_state.get("start_time", None)
-                                            if start_time and end_time:
-                                                duration = (end_time - start_time).total_seconds()
-                                            else:
-                                                st.error("Error: 'start_time' o 'end_time' no están definidos. No se puede calcular la duración.")
-                                                return
+                                    end_time = datetime.now(colombia_timezone)
+                                    end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
 
-                                            log_time(st.session_state["start_time"], end_time, duration, st.session_state["request_id"], quotation_type="Requested Quotation")
-                                            st.session_state["submitted"] = True
-                                        else:
-                                            folder_id = st.session_state["folder_id"]
-                                            folder_link = st.session_state["folder_link"]
-
-                                    folder_id = st.session_state.get("folder_id", "No folder created")
-
-                                    if not folder_id:
-                                        st.error("Failed to create or retrieve folder. Aborting finalization.")
+                                    # ✅ Asegurar que 'start_time' existe antes de calcular la duración
+                                    start_time = st.session_state.get("start_time", None)
+                                    if not start_time:
+                                        st.error("Error: 'start_time' o 'end_time' no están definidos. No se puede calcular la duración.")
                                         return
 
                                     commercial = st.session_state.get("sales_rep", "Unknown")
                                     client = st.session_state["client"]
                                     client_reference = st.session_state.get("client_reference", "N/A")
-                                    folder_link = st.session_state.get("folder_link", "N/A")
-
-                                    if client and client not in st.session_state["clients_list"]:
-                                        sheet = client_gcp.open_by_key(time_sheet_id)
-                                        worksheet = sheet.worksheet("clientes")
-                                        worksheet.append_row([client])
-                                        st.session_state["clients_list"].append(client)
-                                        st.success(f"✅ Client '{client}' successfully saved")
-                                        load_clients.clear()
-                                    
-                                    files_uploaded = upload_all_files_to_google_drive(folder_id, drive_service)
-                                    link_label = ""
-                                    if files_uploaded:
-                                        link_label = "*"
+
+                                    try:
+                                        new_client = client if client and client not in get_client_directory() else None
+                                    except DirectoryUnavailable as e:
+                                        st.error(f"⚠️ {e}")
+                                        st.session_state["submitted"] = False
+                                        return
 
                                     grouped_record = {
                                         "time": end_time_str,
-                                        "request_id": f'=HYPERLINK("{folder_link}"; "{st.session_state["request_id"]} {link_label}")',
+                                        # El enlace a la carpeta lo pone la cola cuando la crea en Drive
+                                        "request_id": request_id,
                                         "commercial": commercial,
                                         "client": client,
                                         "client_reference": client_reference,
@@ -717,28 +657,27 @@ def show(role):
                                     for key, value_set in all_details.items():
                                         grouped_record[key] = "\n".join(sorted(value_set))
 
-                                    # **9️⃣ Crear DataFrame y guardar**
-                                    new_df = pd.DataFrame([grouped_record])
-
-                                    new_df = new_df.reindex(columns=all_quotes_columns, fill_value="")
-
-                                    st.session_state["df_all_quotes"] = pd.concat(
-                                        [st.session_state.get("df_all_quotes", pd.DataFrame()), new_df],
-                                        ignore_index=True
-                                    )
-
-                                    save_to_google_sheets(st.session_state["df_all_quotes"], sheet_id)
+                                    # **9️⃣ Carpeta, adjuntos y filas se guardan en segundo plano**: aquí solo se
+                                    # espera a que el trabajo quede escrito en el diario local
+                                    if not enqueue_quotation(get_write_queue(), request_id, grouped_record, start_time, end_time, new_client,
+                                                             submitted_by=st.experimental_user.email):
+                                        st.warning("This quotation has already been submitted.")
+                                        return
+                                    if new_client:
+                                        # Las demás sesiones lo ven ya, sin esperar a que la cola lo escriba en la hoja
+                                        get_client_directory().add(new_client)
+                                    submitted_jobs = st.session_state.get("submitted_jobs", []) + [request_id]
 
                                     del st.session_state["request_id"]
                                     clear_temp_directory()
-                                    reset_json()
-                                    st.session_state["services"] = []
+                                    cart.clear()
                                     st.session_state["start_time"] = None
                                     st.session_state["end_time"] = None
                                     st.session_state["quotation_completed"] = False
                                     st.session_state["page"] = "client_name"
                                     st.success(f"Quotation completed! Your request ID is {request_id}")
                                     st.session_state.clear()
+                                    st.session_state["submitted_jobs"] = submitted_jobs[-MAX_TRACKED_JOBS:]
                                     change_page("client_name")
 
                                 except Exception as e:
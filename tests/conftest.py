@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+APP_SECRETS = """
+[general]
+quotations_requested = "sheet"
+drive_id = "drive"
+time_sheet_id = "times"
+parent_folder = "folder"
+contratos_id = "contracts"
+"""
+
+@pytest.fixture
+def app_secrets(tmp_path):
+    # src.services.utils lee st.secrets al importarse
+    from streamlit import config
+    path = tmp_path / "secrets.toml"
+    path.write_text(APP_SECRETS)
+    previous = config.get_option("secrets.files")
+    config.set_option("secrets.files", [str(path)])
+    yield path
+    config.set_option("secrets.files", previous)
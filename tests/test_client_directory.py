@@ -0,0 +1,95 @@
+import threading
+
+import gspread
+import pytest
+
+from src.common.sheet_sync import SheetSnapshot
+from src.services import client_directory
+from src.services.client_directory import ClientDirectory, DirectoryUnavailable
+
+def test_adding_a_client_does_not_change_an_index_already_in_use():
+    directory = ClientDirectory(loader=lambda: ["Acme", "Bodega Central"])
+    before = directory.search_index()
+
+    assert directory.add("Acmé Andina")
+    after = directory.search_index()
+
+    assert after is not before
+    assert len(before) == 2 and "Acmé Andina" not in before
+    assert before.search("acme andina") == ["Acme"]
+    assert after.search("acme andina")[0] == "Acmé Andina"
+    assert directory.names() == ["Acme", "Bodega Central", "Acmé Andina"]
+
+def test_concurrent_adds_and_searches_see_consistent_indexes():
+    directory = ClientDirectory(loader=lambda: [f"Cliente {i}" for i in range(200)])
+    directory.load()
+    errors = []
+
+    def add(worker):
+        for i in range(50):
+            directory.add(f"Nuevo {worker}-{i}")
+
+    def search():
+        for _ in range(200):
+            index = directory.search_index()
+            try:
+                # Cada resultado es un nombre que el índice ya tenía al tomarlo
+                assert all(name in index for name in index.search("nuevo", 10))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=add, args=(w,)) for w in range(4)] + [threading.Thread(target=search) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    index = directory.search_index()
+    assert len(index) == 400
+    assert all(f"Nuevo {w}-{i}" in index for w in range(4) for i in range(50))
+
+def test_existing_clients_are_not_treated_as_new_before_the_first_load(monkeypatch):
+    monkeypatch.setattr(client_directory, "RETRY_AFTER", 60)
+    sheet = {"down": True}
+
+    def loader():
+        if sheet["down"]:
+            raise ConnectionError("Sheets no responde")
+        return ["Acme"]
+
+    directory = ClientDirectory(loader=loader)
+    with pytest.raises(ConnectionError):
+        directory.load()
+
+    # Mientras no se espera RETRY_AFTER no se vuelve a leer la hoja, pero tampoco se responde
+    # que el cliente no existe ni se agrega como nuevo
+    sheet["down"] = False
+    assert not directory.loaded
+    assert directory.names() == []
+    with pytest.raises(DirectoryUnavailable):
+        "Acme" in directory
+    with pytest.raises(DirectoryUnavailable):
+        directory.add("Acme")
+
+    monkeypatch.setattr(client_directory, "RETRY_AFTER", 0)
+    assert "Acme" in directory
+    assert directory.loaded
+    assert not directory.add("ACME ")
+
+def test_clients_come_from_the_local_sheet_snapshot(monkeypatch):
+    requested = []
+
+    def snapshot(secret_key, sheet_name):
+        requested.append((secret_key, sheet_name))
+        return SheetSnapshot(["cliente"], [["Acme"], [""], ["Bodega Central"]])
+
+    monkeypatch.setattr(client_directory, "get_snapshot", snapshot)
+    assert client_directory.fetch_clients() == ["Acme", "", "Bodega Central"]
+    assert requested == [("time_sheet_id", "clientes")]
+
+    def missing(secret_key, sheet_name):
+        raise gspread.exceptions.WorksheetNotFound(sheet_name)
+
+    monkeypatch.setattr(client_directory, "get_snapshot", missing)
+    assert client_directory.fetch_clients() == []
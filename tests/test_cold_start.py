@@ -0,0 +1,61 @@
+import ast
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SECRETS = """
+[general]
+quotations_requested = "sheet"
+drive_id = "drive"
+time_sheet_id = "times"
+parent_folder = "folder"
+contratos_id = "contracts"
+"""
+
+# Se ejecuta en un proceso aparte para partir de sys.modules vacío; el audit hook anota cada
+# archivo de fuentes, plantilla o logo que se abra
+PROBE = """
+import json, sys
+sys.path.insert(0, {root!r})
+opened = []
+sys.addaudithook(lambda event, args: opened.append(str(args[0])) if event == "open" and str(args[0]).endswith((".ttf", ".pdf", ".png")) else None)
+{body}
+from src.common.resources import registry
+print(json.dumps({{
+    "opened": opened,
+    "fonts_loaded": registry.loaded("fonts"),
+    "modules": sorted(m for m in sys.modules if m.startswith(("src.", "gspread", "googleapiclient", "reportlab"))),
+}}))
+"""
+
+def probe(tmp_path, body):
+    (tmp_path / ".streamlit").mkdir(exist_ok=True)
+    (tmp_path / ".streamlit" / "secrets.toml").write_text(SECRETS)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(root=ROOT, body=textwrap.dedent(body))],
+        cwd=tmp_path, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+@pytest.mark.parametrize("view", ["Contracts_Management", "New_Request", "Scrap_Rates"])
+def test_importing_a_view_does_not_load_the_fonts(tmp_path, view):
+    result = probe(tmp_path, f"import src.views.{view}")
+    assert result["opened"] == []
+    assert not result["fonts_loaded"]
+
+def test_home_top_level_imports_stay_light(tmp_path):
+    # Solo los import de nivel de módulo de Home.py: lo que se carga antes de pintar la página
+    with open(os.path.join(ROOT, "Home.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    imports = "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+    result = probe(tmp_path, imports)
+    assert result["opened"] == []
+    for heavy in ("src.services.utils", "src.services.quotation_jobs", "gspread", "googleapiclient", "reportlab"):
+        assert heavy not in result["modules"]
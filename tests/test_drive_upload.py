@@ -0,0 +1,101 @@
+import threading
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from src.common import drive_upload
+from src.common.drive_upload import DONE, FAILED, SKIPPED, upload_directory
+
+class Status:
+
+    def __init__(self, sent):
+        self.resumable_progress = sent
+
+class UploadRequest:
+    # Subida resumible en dos partes; los errores programados para el archivo salen antes de cada parte
+
+    def __init__(self, drive, name):
+        self.drive, self.name, self.parts = drive, name, 0
+
+    def next_chunk(self):
+        time.sleep(0.01)
+        errors = self.drive.errors.get(self.name)
+        if errors:
+            raise errors.pop(0)
+        self.parts += 1
+        if self.parts < 2:
+            return Status(1), None
+        with self.drive.lock:
+            self.drive.uploaded.append(self.name)
+            self.drive.threads.add(threading.get_ident())
+        return None, {"id": f"id-{self.name}"}
+
+class FakeDrive:
+
+    def __init__(self, existing=(), errors=None):
+        self.existing = list(existing)
+        self.errors = errors or {}
+        self.uploaded = []
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def list(self, **kwargs):
+        drive = self
+
+        class Listing:
+            def execute(self):
+                return {"files": [{"name": n} for n in drive.existing]}
+        return Listing()
+
+    def create(self, body, media_body, **kwargs):
+        return UploadRequest(self, body["name"])
+
+def http_error(status):
+    return HttpError(httplib2.Response({"status": status}), b"{}")
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(drive_upload.limiter, "backoff", lambda *args, **kwargs: None)
+
+@pytest.fixture
+def spool(tmp_path):
+    for i in range(8):
+        (tmp_path / f"file{i}.pdf").write_bytes(b"x" * (i + 1))
+    (tmp_path / ".hidden").write_bytes(b"x")
+    return tmp_path
+
+def test_uploads_in_parallel_skips_existing_and_removes_local_copies(spool):
+    drive = FakeDrive(existing=["file0.pdf"])
+    factory_calls = []
+
+    def factory():
+        factory_calls.append(threading.get_ident())
+        return drive
+
+    progress = upload_directory(factory, "folder", str(spool), service=drive, max_workers=4)
+    files = progress.snapshot()
+    assert files["file0.pdf"]["status"] == SKIPPED
+    assert sorted(drive.uploaded) == [f"file{i}.pdf" for i in range(1, 8)]
+    assert all(files[f"file{i}.pdf"]["status"] == DONE for i in range(1, 8))
+    assert progress.fraction() == 1.0
+    assert len(drive.threads) > 1
+    # Un servicio por hilo de subida, nunca uno por archivo
+    assert len(factory_calls) == len(set(factory_calls)) <= 4
+    assert sorted(p.name for p in spool.iterdir()) == [".hidden", "file0.pdf"]
+
+def test_transient_errors_resume_and_permanent_errors_keep_the_file(spool):
+    drive = FakeDrive(errors={
+        "file1.pdf": [http_error(503), ConnectionError("reset")],
+        "file2.pdf": [http_error(404)],
+    })
+    progress = upload_directory(lambda: drive, "folder", str(spool))
+    files = progress.snapshot()
+    assert files["file1.pdf"]["status"] == DONE
+    assert files["file2.pdf"]["status"] == FAILED and "404" in files["file2.pdf"]["error"]
+    assert "file2.pdf" not in drive.uploaded
+    assert (spool / "file2.pdf").exists() and not (spool / "file1.pdf").exists()
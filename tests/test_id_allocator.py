@@ -0,0 +1,113 @@
+import multiprocessing
+import random
+import re
+import threading
+import time
+
+from src.common.id_allocator import IdAllocator, SheetReservationBackend, SqliteCounterBackend
+
+THREADS = 16
+IDS_PER_THREAD = 40
+
+class FakeWorksheet:
+    # Hoja en memoria que, como la API de Sheets, serializa los append; las lecturas y los
+    # append se intercalan con pausas al azar para forzar carreras entre "procesos"
+
+    def __init__(self):
+        self.rows = [["name", "seed", "size", "token"]]
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _pause(self):
+        time.sleep(random.uniform(0, 0.002))
+
+    def col_values(self, col):
+        self.calls.append(("col_values", col))
+        self._pause()
+        with self._lock:
+            return [row[col - 1] if len(row) >= col else "" for row in self.rows]
+
+    def append_row(self, values, **kwargs):
+        self._pause()
+        with self._lock:
+            self.rows.append([str(v) for v in values])
+            row = len(self.rows)
+        self._pause()
+        return {"updates": {"updatedRange": f"id_reservations!A{row}:D{row}"}}
+
+    def get(self, range_name):
+        self.calls.append(("get", range_name))
+        self._pause()
+        first, last = map(int, re.fullmatch(r"A(\d+):C(\d+)", range_name).groups())
+        with self._lock:
+            return [list(row[:3]) for row in self.rows[first - 1:last]]
+
+def sheet_backend(ws):
+    backend = SheetReservationBackend()
+    backend._ws = ws
+    return backend
+
+def run_threads(allocators):
+    issued = []
+    lock = threading.Lock()
+
+    def work(allocator):
+        ids = [allocator.next_id() for _ in range(IDS_PER_THREAD)]
+        with lock:
+            issued.extend(ids)
+
+    threads = [threading.Thread(target=work, args=(a,)) for a in allocators]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return issued
+
+def test_sheet_backend_never_hands_out_an_id_twice():
+    ws = FakeWorksheet()
+    # Un allocator por hilo: cada uno se comporta como un proceso distinto con su propio bloque
+    allocators = [IdAllocator(sheet_backend(ws), block_size=3, seed=lambda: 100) for _ in range(THREADS)]
+    issued = run_threads(allocators)
+    assert len(issued) == THREADS * IDS_PER_THREAD
+    assert len(set(issued)) == len(issued)
+    assert min(issued) == 101
+
+def test_sheet_backend_first_seed_wins_and_block_size_can_change():
+    ws = FakeWorksheet()
+    first = IdAllocator(sheet_backend(ws), block_size=5, seed=lambda: 10)
+    assert [first.next_id() for _ in range(5)] == [11, 12, 13, 14, 15]
+    # Otra semilla y otro tamaño de bloque no pisan lo ya reservado
+    second = IdAllocator(sheet_backend(ws), block_size=2, seed=lambda: 0)
+    assert [second.next_id() for _ in range(3)] == [16, 17, 18]
+
+def test_sheet_backend_reads_only_the_rows_added_since_its_last_block():
+    ws = FakeWorksheet()
+    mine = IdAllocator(sheet_backend(ws), block_size=2, seed=lambda: 10)
+    other = IdAllocator(sheet_backend(ws), block_size=3, seed=lambda: 0)
+    assert [mine.next_id() for _ in range(2)] == [11, 12]
+    assert [other.next_id() for _ in range(3)] == [13, 14, 15]
+    ws.calls.clear()
+
+    assert [mine.next_id() for _ in range(2)] == [16, 17]
+    # El nombre ya se sembró y las filas 1-2 ya se leyeron: solo la reserva del otro y la propia
+    assert ws.calls == [("get", "A3:C4")]
+
+def _sqlite_worker(path, queue):
+    allocator = IdAllocator(SqliteCounterBackend(path), block_size=3, seed=lambda: 0)
+    queue.put([allocator.next_id() for _ in range(IDS_PER_THREAD)])
+
+def test_sqlite_backend_never_hands_out_an_id_twice_across_processes(tmp_path):
+    path = str(tmp_path / "counters.sqlite3")
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_sqlite_worker, args=(path, queue)) for _ in range(6)]
+    for w in workers:
+        w.start()
+    issued = [i for _ in workers for i in queue.get(timeout=60)]
+    for w in workers:
+        w.join()
+    assert len(set(issued)) == len(issued) == 6 * IDS_PER_THREAD
+
+def test_sqlite_backend_threads_share_one_allocator(tmp_path):
+    allocator = IdAllocator(SqliteCounterBackend(str(tmp_path / "c.sqlite3")), block_size=4, seed=lambda: 0)
+    issued = run_threads([allocator] * THREADS)
+    assert sorted(issued) == list(range(1, THREADS * IDS_PER_THREAD + 1))
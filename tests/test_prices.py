@@ -0,0 +1,32 @@
+import math
+
+import pandas as pd
+
+from src.common.sheet_sync import SheetSnapshot
+from src.services.prices import INCLUIDO, INVALID, NUMERIC, PENDING, normalize_prices, parse_prices
+
+def parsed(values):
+    value, status = parse_prices(pd.Series(values, dtype=object))
+    return value.tolist(), status.astype(str).tolist()
+
+def test_thousands_and_decimal_separators_follow_the_sheet_convention():
+    value, status = parsed(["1.234", "1.234,50", "$1.234", "2500", " $ 12.500,75 "])
+    assert value == [1234.0, 1234.5, 1234.0, 2500.0, 12500.75]
+    assert status == [NUMERIC] * 5
+
+def test_incluido_pending_and_invalid():
+    value, status = parsed(["Incluido", "", "Pendiente", "N/A", None, "consultar"])
+    assert value[0] == 0.0 and all(math.isnan(v) for v in value[1:])
+    assert status == [INCLUIDO, PENDING, PENDING, PENDING, PENDING, INVALID]
+
+def test_real_numbers_are_taken_as_is():
+    value, status = parsed([1234.5, 2500, True])
+    assert value[:2] == [1234.5, 2500.0]
+    assert status == [NUMERIC, NUMERIC, INVALID]
+
+def test_snapshot_keeps_price_columns_as_sheet_text():
+    # Sin raw_columns, numericise de gspread convierte "1.234,50" en 1.2345
+    snapshot = SheetSnapshot(["POL", " FLETE "], [["10", "1.234"], ["20", "1.234,50"], ["30", "$1.234"], ["40", "2500"]])
+    frame = normalize_prices(snapshot.to_frame(raw_columns=["FLETE"]).rename(columns=str.strip), ["FLETE"])
+    assert frame["POL"].tolist() == [10, 20, 30, 40]
+    assert frame["FLETE_VALUE"].tolist() == [1234.0, 1234.5, 1234.0, 2500.0]
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+import requests
+from google.auth.credentials import AnonymousCredentials
+from requests.adapters import BaseAdapter
+
+from src.common import quota
+from src.common.clients import QuotaSession
+from src.common.quota import QuotaLimiter, QuotaWaitTooLong
+
+class RateLimitedAdapter(BaseAdapter):
+    # Responde siempre 429 con un Retry-After largo, como Sheets cuando se agota la cuota
+
+    def __init__(self, retry_after="120"):
+        super().__init__()
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = 429
+        response.headers["Retry-After"] = self.retry_after
+        response.request = request
+        response._content = b"{}"
+        return response
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(quota.time, "sleep", recorded.append)
+    return recorded
+
+def test_long_retry_after_is_not_waited_on_the_script_thread(monkeypatch, sleeps):
+    monkeypatch.setattr(quota, "on_script_thread", lambda: True)
+    limiter = QuotaLimiter()
+    with pytest.raises(QuotaWaitTooLong) as error:
+        limiter.backoff("sheets_read", 0, 429, retry_after=120)
+    assert error.value.delay == 120
+    assert sleeps == []
+    # Un reintento corto sí se espera
+    limiter.backoff("sheets_read", 0, 429, retry_after=2)
+    assert sleeps == [2]
+
+def test_background_threads_still_honor_retry_after(monkeypatch, sleeps):
+    monkeypatch.setattr(quota, "on_script_thread", lambda: False)
+    QuotaLimiter().backoff("sheets_write", 0, 429, retry_after=120)
+    assert sleeps == [120]
+
+def test_session_on_the_script_thread_gives_up_after_one_request(monkeypatch, sleeps):
+    monkeypatch.setattr(quota, "on_script_thread", lambda: True)
+    adapter = RateLimitedAdapter()
+    session = QuotaSession(AnonymousCredentials(), QuotaLimiter())
+    session.mount("https://", adapter)
+    start = time.monotonic()
+    with pytest.raises(QuotaWaitTooLong):
+        session.get("https://sheets.googleapis.com/v4/spreadsheets/abc")
+    assert adapter.calls == 1
+    assert sleeps == [] and time.monotonic() - start < 1
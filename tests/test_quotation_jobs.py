@@ -0,0 +1,42 @@
+import importlib
+
+import pytest
+
+from src.common.drive_upload import DONE, FAILED, SKIPPED, UploadProgress
+from src.common.write_queue import Job
+
+class RecordingQueue:
+
+    def __init__(self):
+        self.saved = []
+
+    def save_state(self, job):
+        self.saved.append(dict(job.state.get("upload", {})))
+
+@pytest.fixture
+def quotation_jobs(app_secrets):
+    return importlib.import_module("src.services.quotation_jobs")
+
+def test_upload_progress_is_saved_when_it_changes_and_at_the_end(quotation_jobs, monkeypatch):
+    monkeypatch.setattr(quotation_jobs, "PROGRESS_SAVE_INTERVAL", 3600)
+    queue = RecordingQueue()
+    job = Job("Q0001", "quotation", {}, {}, "running", 1, None, 0.0, 0.0)
+    on_tick = quotation_jobs.upload_progress_saver(queue, job)
+
+    progress = UploadProgress()
+    progress.register("a.pdf", 10)
+    progress.register("b.pdf", 10)
+    progress.register("c.pdf", 10, SKIPPED)
+    on_tick(progress)
+    on_tick(progress)
+
+    # Dentro del intervalo no se escribe aunque avance
+    progress.update("a.pdf", status=DONE)
+    on_tick(progress)
+
+    progress.update("b.pdf", status=FAILED, error="Drive no responde")
+    on_tick(progress)
+    on_tick(progress)
+
+    assert queue.saved == [{"done": 1, "total": 3}, {"done": 2, "total": 3}]
+    assert job.state["upload"] == {"done": 2, "total": 3}
@@ -0,0 +1,58 @@
+import io
+import re
+
+import PyPDF2
+
+from src.common.resources import registry
+from src.services import cotizacion
+from src.services.cotizacion import render_quotation
+
+COMMERCIAL = {"name": "Ana", "position": "Commercial", "tel": "123", "email": "ana@example.com"}
+
+def quotation(request_id="Q0200", rows=200, notes=150):
+    return {
+        "request_id": request_id, "validity": "31/01/2027", "customer_name": "Compras", "incoterm": "FOB",
+        "pol": "Shanghai", "pod": "Cartagena", "client": "Acme",
+        "surcharges": {f"Concept {i:03d}": {"20' Dry": {"sale": float(i)}} for i in range(rows)},
+        "additional_surcharges": [],
+        "insurance_sale": 0,
+        "Notes": "\n".join(f"Note {i:03d}, subject to space and carrier confirmation" for i in range(notes)),
+        "Details": {"Transit Time": "32", "Route": "Direct"},
+    }
+
+def page_texts(pdf_bytes):
+    return [page.extract_text() for page in PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages]
+
+def test_long_table_and_notes_flow_onto_continuation_pages():
+    template_pages = len(registry.get("template").pages)
+    pages = page_texts(render_quotation(quotation(), COMMERCIAL))
+
+    # Primera página de la plantilla, páginas de continuación y el resto de la plantilla
+    trailing = template_pages - 1
+    continuations = [re.search(r"Quotation Q0200 \(cont\. (\d+)\)", text) for text in pages[1:len(pages) - trailing]]
+    assert all(continuations)
+    assert [int(m.group(1)) for m in continuations] == list(range(1, len(continuations) + 1))
+    assert len(pages) == template_pages + len(continuations)
+
+    text = "\n".join(pages)
+    # Cada fila de la tabla y cada nota aparece una sola vez y en orden
+    concepts = re.findall(r"Concept (\d{3})", text)
+    assert concepts == [f"{i:03d}" for i in range(200)]
+    notes = re.findall(r"Note (\d{3})", text)
+    assert notes == [f"{i:03d}" for i in range(150)]
+    # La tabla termina antes de que empiecen las notas que no cupieron en la primera página
+    last_row_page = max(i for i, p in enumerate(pages) if "Concept 199" in p)
+    last_note_page = max(i for i, p in enumerate(pages) if "Note 149" in p)
+    assert last_row_page <= last_note_page < len(pages) - trailing
+
+def test_short_quotation_stays_on_the_template_pages():
+    template_pages = len(registry.get("template").pages)
+    pages = page_texts(render_quotation(quotation(rows=3, notes=2), COMMERCIAL))
+    assert len(pages) == template_pages
+    assert "(cont." not in "".join(pages)
+
+def test_process_pool_keeps_each_quotation_in_order(monkeypatch):
+    monkeypatch.setattr(cotizacion, "user_data", lambda: COMMERCIAL)
+    ids = [f"Q{i:04d}" for i in range(6)]
+    outputs = cotizacion.generate_quotations([quotation(request_id, rows=40, notes=5) for request_id in ids])
+    assert [re.search(r"Q\d{4}", page_texts(pdf)[0]).group(0) for pdf in outputs] == ids
@@ -0,0 +1,30 @@
+import streamlit as st
+
+from src.services import service_cart
+from src.services.service_cart import CartStore, ServiceCart, cart_key
+
+class User:
+    email = "ana@example.com"
+
+def test_each_tab_gets_its_own_key_and_keeps_it_across_reloads(monkeypatch):
+    monkeypatch.setattr(st, "experimental_user", User())
+    first, second = {}, {}
+
+    key = cart_key(first)
+    assert key.startswith("ana@example.com#") and first[service_cart.TAB_PARAM]
+    # Recargar la pestaña conserva la URL y por lo tanto el carrito
+    assert cart_key(first) == key
+    assert cart_key(second) != key
+
+def test_a_new_tab_does_not_recover_another_tabs_services(tmp_path, monkeypatch):
+    monkeypatch.setattr(st, "experimental_user", User())
+    store = CartStore(str(tmp_path / "carts.sqlite3"))
+    first_tab = {}
+    cart = ServiceCart(cart_key(first_tab), store)
+    cart.add("Maritime", {"pol": "Shanghai"})
+
+    assert not ServiceCart(cart_key({}), store).recover()
+
+    reloaded = ServiceCart(cart_key(first_tab), store)
+    assert reloaded.recover()
+    assert [item.service for item in reloaded] == ["Maritime"]
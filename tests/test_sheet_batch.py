@@ -0,0 +1,89 @@
+import pytest
+
+from src.common import sheet_batch
+from src.common.sheet_batch import SheetWriteBatch
+
+class Request:
+
+    def __init__(self, service, kind, kwargs):
+        self.service, self.kind, self.kwargs = service, kind, kwargs
+
+    def execute(self):
+        self.service.calls.append((self.kind, self.kwargs))
+        if self.kind == "batchUpdate" and self.service.failures:
+            self.service.failures -= 1
+            raise RuntimeError("backend error")
+        if self.kind == "get":
+            tabs = self.service.tabs[self.kwargs["spreadsheetId"]]
+            return {"sheets": [{"properties": {"title": t, "sheetId": i}} for i, t in enumerate(tabs)]}
+        return {}
+
+class RecordingSheets:
+    # Imita service.spreadsheets().get/batchUpdate y anota cada llamada que llega a la API
+
+    def __init__(self, tabs, failures=0):
+        self.tabs = tabs
+        self.failures = failures
+        self.calls = []
+
+    def spreadsheets(self):
+        return self
+
+    def get(self, **kwargs):
+        return Request(self, "get", kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return Request(self, "batchUpdate", kwargs)
+
+@pytest.fixture(autouse=True)
+def fresh_sheet_ids(monkeypatch):
+    monkeypatch.setattr(sheet_batch, "_sheet_ids", {})
+    monkeypatch.setattr(sheet_batch.limiter, "backoff", lambda *args, **kwargs: None)
+
+def updates(service):
+    return [kwargs for kind, kwargs in service.calls if kind == "batchUpdate"]
+
+def test_one_batch_update_per_spreadsheet():
+    service = RecordingSheets({"quotes": ["All Quotes", "Ground Quotations"], "times": ["Duration Time Quotation"]})
+    batch = SheetWriteBatch(service)
+    batch.add("quotes", "All Quotes", [["Q-1", 10]])
+    batch.add("quotes", "Ground Quotations", [["Q-1", 10]])
+    batch.add("times", "Duration Time Quotation", [["Q-1", 3.5]])
+    batch.add("quotes", "All Quotes", [["Q-2", 20]])
+    batch.add("times", "clientes", [["acme"]], headers=["cliente"])
+
+    assert batch.flush() == 4
+    sent = updates(service)
+    assert [u["spreadsheetId"] for u in sent] == ["quotes", "times"]
+    quotes, times = (u["body"]["requests"] for u in sent)
+    assert [list(r) for r in quotes] == [["appendCells"], ["appendCells"]]
+    assert len(quotes[0]["appendCells"]["rows"]) == 2
+    # La pestaña nueva se crea y se llena en la misma llamada, con el encabezado primero
+    assert [list(r) for r in times] == [["appendCells"], ["addSheet"], ["appendCells"]]
+    new_id = times[1]["addSheet"]["properties"]["sheetId"]
+    assert times[2]["appendCells"]["sheetId"] == new_id
+    assert times[2]["appendCells"]["rows"][0]["values"][0]["userEnteredValue"] == {"stringValue": "cliente"}
+    assert batch.sent == ["quotes", "times"] and not batch.pending
+
+def test_sheet_ids_are_fetched_once_per_process():
+    service = RecordingSheets({"quotes": ["All Quotes"]})
+    for request_id in ("Q-1", "Q-2"):
+        batch = SheetWriteBatch(service)
+        batch.add("quotes", "All Quotes", [[request_id]])
+        batch.flush()
+    assert [kind for kind, _ in service.calls] == ["get", "batchUpdate", "batchUpdate"]
+
+def test_failed_flush_retries_and_finally_raises_without_streamlit(capsys):
+    service = RecordingSheets({"quotes": ["All Quotes"]}, failures=1)
+    batch = SheetWriteBatch(service, max_attempts=3)
+    batch.add("quotes", "All Quotes", [["Q-1"]])
+    batch.flush()
+    assert len(updates(service)) == 2
+
+    service.failures = 5
+    batch = SheetWriteBatch(service, max_attempts=2)
+    batch.add("quotes", "All Quotes", [["Q-2"]])
+    with pytest.raises(RuntimeError):
+        batch.flush()
+    assert batch.pending and batch.sent == []
+    assert "No se pudo guardar en All Quotes" in capsys.readouterr().out
@@ -0,0 +1,165 @@
+import re
+import threading
+import time
+
+import pytest
+
+from src.common import sheet_sync
+from src.common.sheet_sync import SheetSnapshot, delta_sync, full_sync, read_snapshot, write_snapshot
+
+BLOCK = 4
+
+class FakeWorksheet:
+    # Hoja en memoria con la misma forma de respuesta que gspread: filas sin las celdas vacías
+    # del final y rangos que se cortan en la última fila con datos
+
+    def __init__(self, rows):
+        self.rows = [list(row) for row in rows]
+        self.full_reads = 0
+
+    @property
+    def row_count(self):
+        return len(self.rows) + 50
+
+    def get_all_values(self):
+        self.full_reads += 1
+        return [list(row) for row in self.rows]
+
+    def _read(self, range_name):
+        match = re.fullmatch(r"([A-Z]*)(\d+):([A-Z]*)(\d+)", range_name)
+        column, first, _, last = match.groups()
+        rows = self.rows[int(first) - 1:int(last)]
+        if column:
+            index = ord(column) - ord("A")
+            rows = [[row[index]] if len(row) > index and row[index] != "" else [] for row in rows]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        return [list(row) for row in rows]
+
+    def batch_get(self, ranges):
+        return [self._read(r) for r in ranges]
+
+def make_rows(n, line="MSC"):
+    # La columna A se repite a propósito: una clave que no es única no debe bastar
+    return [["Línea", "POL", "FLETE"]] + [[line, f"POL{i}", str(i * 100)] for i in range(n)]
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(sheet_sync, "BLOCK_ROWS", BLOCK)
+
+def sync_until_stable(ws, snapshot, times=6):
+    for _ in range(times):
+        snapshot = delta_sync(ws, snapshot)
+    return snapshot
+
+def test_appends_are_read_without_a_full_download():
+    ws = FakeWorksheet(make_rows(10))
+    snapshot = full_sync(ws)
+    ws.rows.append(["MSC", "POL10", "1000"])
+    snapshot = delta_sync(ws, snapshot)
+    assert ws.full_reads == 1
+    assert snapshot.rows == [row for row in ws.rows[1:]]
+
+@pytest.mark.parametrize("change", ["insert", "delete"])
+def test_rows_shifted_before_the_tail_trigger_a_full_sync(change):
+    ws = FakeWorksheet(make_rows(13))
+    snapshot = full_sync(ws)
+    if change == "insert":
+        ws.rows.insert(3, ["MSC", "NUEVO", "1"])
+    else:
+        del ws.rows[3]
+    snapshot = delta_sync(ws, snapshot)
+    assert ws.full_reads == 2
+    assert snapshot.rows == ws.rows[1:]
+
+def test_key_column_mismatch_triggers_a_full_sync():
+    ws = FakeWorksheet([["Línea", "POL", "FLETE"]] + [[f"L{i}", "X", "1"] for i in range(13)])
+    snapshot = full_sync(ws)
+    # Que la revisión rotativa caiga en el último bloque: solo queda la columna clave
+    snapshot.cursor = 3
+    # Se borra una fila y más abajo se agrega otra: la fila anterior al último bloque vuelve
+    # a su lugar, pero las claves intermedias quedan corridas
+    del ws.rows[2]
+    ws.rows.insert(10, ["L9", "X", "1"])
+    snapshot = delta_sync(ws, snapshot)
+    assert ws.full_reads == 2
+    assert snapshot.rows == ws.rows[1:]
+
+def test_same_length_shift_across_old_blocks_is_not_pasted():
+    ws = FakeWorksheet(make_rows(13))
+    snapshot = full_sync(ws)
+    # Se borra una fila del primer bloque y se agrega otra en el segundo: los bloques no
+    # cambian de largo, las claves son iguales y la fila anterior al último bloque tampoco se
+    # mueve, pero el segundo bloque quedó corrido
+    del ws.rows[1]
+    ws.rows.insert(6, ["MSC", "NUEVO", "1"])
+    snapshot = delta_sync(ws, snapshot)
+    assert snapshot.rows == ws.rows[1:]
+
+def test_edits_in_old_blocks_are_picked_up():
+    ws = FakeWorksheet(make_rows(13))
+    snapshot = full_sync(ws)
+    ws.rows[2][2] = "1.234,50"
+    snapshot = sync_until_stable(ws, snapshot)
+    assert snapshot.rows == ws.rows[1:]
+
+def unique_rows(n):
+    return [["ID", "POL", "FLETE"]] + [[f"C{i:03d}", f"POL{i}", str(i * 100)] for i in range(n)]
+
+def test_edits_in_old_blocks_with_unique_keys_are_merged_without_a_full_download():
+    ws = FakeWorksheet(unique_rows(13))
+    snapshot = full_sync(ws)
+    ws.rows[2][2] = "1.234,50"
+    ws.rows[6][1] = "CARTAGENA"
+    snapshot = sync_until_stable(ws, snapshot)
+    assert ws.full_reads == 1
+    assert snapshot.rows == ws.rows[1:]
+
+def test_a_merged_block_keeps_its_empty_rows():
+    rows = unique_rows(13)
+    # El final del segundo bloque queda vacío: Sheets no devuelve esas filas
+    rows[7] = rows[8] = ["", "", ""]
+    ws = FakeWorksheet(rows)
+    snapshot = full_sync(ws)
+    snapshot.cursor = 1
+    ws.rows[5][2] = "999"
+    snapshot = delta_sync(ws, snapshot)
+    assert ws.full_reads == 1
+    assert snapshot.rows == ws.rows[1:]
+
+def test_snapshot_round_trips_through_arrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_sync, "SNAPSHOT_DIR", str(tmp_path))
+    snapshot = SheetSnapshot(["POL", "", "POL"], [["a", "", "1.234"], ["b", "x", ""]], 3, 10.0, 5.0)
+    write_snapshot("secret", "Hoja 1", snapshot)
+    loaded = read_snapshot("secret", "Hoja 1")
+    assert (loaded.header, loaded.rows, loaded.cursor) == (snapshot.header, snapshot.rows, 3)
+    assert loaded.revision == snapshot.revision
+
+    write_snapshot("secret", "vacía", SheetSnapshot(["A", "B"], []))
+    assert read_snapshot("secret", "vacía").rows == []
+
+def test_stale_snapshot_is_served_while_one_sync_refreshes_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_sync, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(sheet_sync, "_snapshots", sheet_sync.StaleWhileRevalidate(ttl=300))
+    stale = SheetSnapshot(["POL"], [["viejo"]], synced_at=time.time() - 3600)
+    write_snapshot("secret", "Hoja", stale)
+
+    calls = []
+    release = threading.Event()
+
+    def slow_sync(secret_key, sheet_name):
+        calls.append(sheet_name)
+        release.wait(5)
+        return SheetSnapshot(["POL"], [["nuevo"]], synced_at=time.time())
+
+    monkeypatch.setattr(sheet_sync, "sync_sheet", slow_sync)
+    seen = [sheet_sync.get_snapshot("secret", "Hoja").rows for _ in range(20)]
+    assert seen == [[["viejo"]]] * 20
+    assert calls == ["Hoja"]
+
+    release.set()
+    deadline = time.time() + 5
+    while sheet_sync.get_snapshot("secret", "Hoja").rows != [["nuevo"]] and time.time() < deadline:
+        time.sleep(0.01)
+    assert sheet_sync.get_snapshot("secret", "Hoja").rows == [["nuevo"]]
+    assert calls == ["Hoja"]
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from src.common import write_queue
+from src.common.write_queue import DONE, FAILED, QUEUED, WriteQueue
+
+def test_heartbeat_keeps_a_long_job_from_being_reclaimed(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_queue, "LEASE_SECONDS", 0.3)
+    monkeypatch.setattr(write_queue, "HEARTBEAT_SECONDS", 0.05)
+    path = str(tmp_path / "queue.sqlite3")
+    worker = WriteQueue(path)
+    # Otro proceso sobre el mismo diario, que recogería trabajos abandonados
+    other = WriteQueue(path)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow(jobs):
+        calls.append([job.id for job in jobs])
+        started.set()
+        release.wait(5)
+        return {}
+
+    worker.register("quotation", slow)
+    worker.enqueue("Q0001", "quotation", {})
+    drain = threading.Thread(target=worker.drain)
+    drain.start()
+    assert started.wait(5)
+
+    # Varias veces la concesión: sin renovarla, el otro proceso la tomaría como abandonada
+    stolen = []
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline:
+        stolen += other._claim()
+        time.sleep(0.05)
+    release.set()
+    drain.join(5)
+
+    assert stolen == []
+    assert calls == [["Q0001"]]
+    job = worker.get("Q0001")
+    assert job.status == DONE and job.attempts == 1
+
+def test_failed_jobs_are_listed_and_can_be_requeued(tmp_path):
+    queue = WriteQueue(str(tmp_path / "queue.sqlite3"), max_attempts=1)
+    outcomes = iter([{"Q0001": "Drive no responde"}, {}])
+    queue.register("quotation", lambda jobs: next(outcomes))
+    queue.enqueue("Q0001", "quotation", {"submitted_by": "ana@example.com"})
+
+    queue.drain()
+    [job] = queue.failed("quotation")
+    assert (job.id, job.status, job.error) == ("Q0001", FAILED, "Drive no responde")
+
+    job.state["folder_id"] = "abc"
+    queue.save_state(job)
+    assert queue.requeue("Q0001")
+    # Solo se reencolan trabajos fallidos
+    assert not queue.requeue("Q0001")
+    assert queue.get("Q0001").status == QUEUED
+    assert queue.failed("quotation") == []
+
+    queue.drain()
+    job = queue.get("Q0001")
+    assert job.status == DONE and job.error is None
+    assert job.state == {"folder_id": "abc"}